@@ -1,7 +1,9 @@
 import click
-from .modes.vision import vision as vision_function
+from .modes.vision import VisionOptions, vision as vision_function
 from .config import get_config, set_config, print_config
 from gptparse.models.model_interface import PROVIDER_MODELS
+from gptparse.models.router import ROUTER_PROVIDER
+from collections import Counter
 import re
 import os
 import sys
@@ -63,6 +65,155 @@ def format_authentication_error(error_message, provider):
     ).strip()
 
 
+def echo_target_counts(pages):
+    """Print how many pages each router target converted."""
+    counts = Counter(page.served_by for page in pages if page.served_by)
+    click.echo("Pages by Target:")
+    for target, count in counts.most_common():
+        click.echo(f"  {target}: {count}")
+
+
+# Options shared by the vision, hybrid and auto commands, each setting the
+# VisionOptions field of the same name
+VISION_OPTIONS = [
+    click.option(
+        "--render_workers",
+        type=int,
+        help="Number of workers that render PDF pages at once (defaults to CPU count).",
+    ),
+    click.option(
+        "--render_executor",
+        type=click.Choice(["thread", "process"]),
+        default=VisionOptions.render_executor,
+        help="Render PDF pages on a thread pool or a shared process pool.",
+    ),
+    click.option(
+        "--rasterizer",
+        type=click.Choice(["auto", "pymupdf", "pdf2image"]),
+        default=VisionOptions.rasterizer,
+        help="Backend used to render PDF pages (auto prefers PyMuPDF).",
+    ),
+    click.option(
+        "--cache_dir",
+        help="Directory for the on-disk page image cache. Caching is disabled if not set.",
+    ),
+    click.option(
+        "--encode_workers",
+        type=int,
+        help="Number of workers that resize and encode page images (defaults to CPU count).",
+    ),
+    click.option(
+        "--encode_executor",
+        type=click.Choice(["thread", "process"]),
+        default=VisionOptions.encode_executor,
+        help="Run image encoding on a thread pool or a process pool.",
+    ),
+    click.option(
+        "--image_format",
+        type=click.Choice(["png", "jpeg", "webp"]),
+        default=VisionOptions.image_format,
+        help="Format used to encode page images sent to the model.",
+    ),
+    click.option(
+        "--image_quality",
+        type=click.IntRange(1, 100),
+        default=VisionOptions.image_quality,
+        help="Quality for JPEG and WebP page images.",
+    ),
+    click.option(
+        "--grayscale",
+        type=click.Choice(["auto", "always", "never"]),
+        default=VisionOptions.grayscale,
+        help="Send pages as grayscale: auto-detect monochrome pages, always or never.",
+    ),
+    click.option(
+        "--max_image_bytes",
+        type=int,
+        help="Per-page byte budget for encoded images; quality and size are reduced to fit.",
+    ),
+    click.option(
+        "--skip_blank_pages/--keep_blank_pages",
+        default=VisionOptions.skip_blank_pages,
+        help="Skip blank pages instead of sending them to the model.",
+    ),
+    click.option(
+        "--dedupe_pages",
+        is_flag=True,
+        help="Reuse the model output for near-identical pages within a document.",
+    ),
+    click.option(
+        "--response_cache/--no_response_cache",
+        default=VisionOptions.response_cache,
+        help="Reuse cached model responses for identical page requests (needs --cache_dir).",
+    ),
+    click.option(
+        "--requests_per_minute",
+        type=int,
+        help="Requests-per-minute budget for the model (default: from response headers).",
+    ),
+    click.option(
+        "--tokens_per_minute",
+        type=int,
+        help="Tokens-per-minute budget for the model (default: from response headers).",
+    ),
+    click.option(
+        "--page_retries",
+        default=VisionOptions.page_retries,
+        help="Retries for a page whose model request fails, with exponential backoff.",
+    ),
+    click.option(
+        "--fail_fast",
+        is_flag=True,
+        help="Stop at the first page that fails instead of returning partial output.",
+    ),
+    click.option(
+        "--resume",
+        is_flag=True,
+        help="Journal completed pages and reuse those of an interrupted run with the "
+        "same settings.",
+    ),
+    click.option(
+        "--journal_dir",
+        help="Journal completed pages to this directory, so that the run can be "
+        "resumed (default with --resume: ~/.gptparse/journals).",
+    ),
+    click.option(
+        "--pages_per_request",
+        default=VisionOptions.pages_per_request,
+        help="Pack up to this many pages into one model request (for sparse pages).",
+    ),
+    click.option(
+        "--hedge_percentile",
+        type=click.FloatRange(0, 100, min_open=True, max_open=True),
+        help="Send a duplicate request for pages slower than this latency percentile.",
+    ),
+    click.option(
+        "--hedge_model",
+        help="Send duplicate requests to this provider[/model] instead.",
+    ),
+    click.option(
+        "--longest_first",
+        is_flag=True,
+        help="Send the pages expected to take longest first, to shorten large runs.",
+    ),
+]
+
+
+def vision_options(command):
+    """Add the ``VISION_OPTIONS`` to a command."""
+    for option in reversed(VISION_OPTIONS):
+        command = option(command)
+    return command
+
+
+def build_vision_options(config: dict, **options) -> VisionOptions:
+    """Build ``VisionOptions`` from the command-line values and the config file."""
+    options["cache_dir"] = options["cache_dir"] or config.get("cache_dir")
+    for budget in ("requests_per_minute", "tokens_per_minute"):
+        options[budget] = options[budget] or config.get(budget)
+    return VisionOptions(**options)
+
+
 @click.group()
 def main():
     """GPTParse: Convert PDF documents to Markdown using OCR and vision language models."""
@@ -72,7 +223,11 @@ def main():
 @main.command()
 @click.option("--concurrency", default=10, help="Number of concurrent processes.")
 @click.argument("file_path", type=click.Path(exists=True, resolve_path=True))
-@click.option("--model", help="Vision language model to use.")
+@click.option(
+    "--model",
+    help="Vision language model to use. With --provider router, the targets to "
+    "spread pages across (e.g., 'openai/gpt-4o=2,anthropic=1').",
+)
 @click.option(
     "--output_file",
     help="Output file name (with .md or .txt extension). If not specified, output will be printed.",
@@ -84,7 +239,11 @@ def main():
     "--select_pages",
     help="Pages to process (e.g., '1,3-5,10'). Only applicable for PDFs.",
 )
-@click.option("--provider", help="AI provider to use (openai, anthropic, or google).")
+@click.option(
+    "--provider",
+    help="AI provider to use (openai, anthropic, google, or router for several).",
+)
+@vision_options
 @click.option(
     "--stats", is_flag=True, help="Display detailed statistics after processing."
 )
@@ -97,6 +256,7 @@ def vision(
     select_pages,
     provider,
     stats,
+    **options,
 ):
     """Convert PDF or image files to Markdown using vision language models."""
     config = get_config()
@@ -133,8 +293,20 @@ def vision(
             custom_system_prompt=custom_system_prompt,
             select_pages=select_pages,
             provider=provider,
+            options=build_vision_options(config, **options),
         )
 
+        failed_pages = [page.page for page in result.pages if page.error]
+        if failed_pages:
+            click.echo(
+                click.style(
+                    f"Warning: {len(failed_pages)} pages failed and are empty in the "
+                    f"output: {', '.join(map(str, failed_pages))}",
+                    fg="yellow",
+                ),
+                err=True,
+            )
+
         if result.error:
             raise Exception(result.error)
 
@@ -162,8 +334,14 @@ def vision(
             click.echo(f"Completion Time: {result.completion_time:.2f} seconds")
             click.echo(f"Total Pages Processed: {len(result.pages)}")
             click.echo(f"Total Input Tokens: {result.input_tokens}")
+            click.echo(f"Cached Input Tokens: {result.cached_input_tokens}")
             click.echo(f"Total Output Tokens: {result.output_tokens}")
             click.echo(f"Total Tokens: {result.input_tokens + result.output_tokens}")
+            if result.accepted_prediction_tokens or result.rejected_prediction_tokens:
+                click.echo(
+                    f"Prediction Tokens: {result.accepted_prediction_tokens} accepted, "
+                    f"{result.rejected_prediction_tokens} rejected"
+                )
 
             avg_tokens_per_page = (
                 (result.input_tokens + result.output_tokens) / len(result.pages)
@@ -171,10 +349,43 @@ def vision(
                 else 0
             )
             click.echo(f"Average Tokens per Page: {avg_tokens_per_page:.2f}")
+            click.echo(
+                f"Blank Pages Skipped: {sum(page.skipped for page in result.pages)}"
+            )
+            click.echo(
+                "Duplicate Pages Reused: "
+                f"{sum(page.duplicate_of is not None for page in result.pages)}"
+            )
+            click.echo(
+                f"Cached Responses Reused: {sum(page.cached for page in result.pages)}"
+            )
+            click.echo(
+                f"Failed Pages: {sum(page.error is not None for page in result.pages)}"
+            )
+            if options["hedge_percentile"] is not None:
+                click.echo(f"Hedged Requests: {result.hedged_requests}")
+            if result.provider == ROUTER_PROVIDER:
+                echo_target_counts(result.pages)
 
             click.echo("\nPage-wise Statistics:")
             for page in result.pages:
-                click.echo(f"  Page {page.page}: {page.output_tokens} tokens")
+                if page.error:
+                    click.echo(f"  Page {page.page}: failed ({page.error})")
+                elif page.skipped:
+                    click.echo(f"  Page {page.page}: skipped (blank)")
+                elif page.duplicate_of is not None:
+                    click.echo(
+                        f"  Page {page.page}: reused output of page {page.duplicate_of}"
+                    )
+                elif page.cached:
+                    click.echo(f"  Page {page.page}: reused cached response")
+                elif result.provider == ROUTER_PROVIDER:
+                    click.echo(
+                        f"  Page {page.page}: {page.output_tokens} tokens "
+                        f"({page.served_by})"
+                    )
+                else:
+                    click.echo(f"  Page {page.page}: {page.output_tokens} tokens")
 
     except Exception as e:
         error_message = str(e)
@@ -309,7 +520,11 @@ def fast(
 @main.command()
 @click.option("--concurrency", default=10, help="Number of concurrent processes.")
 @click.argument("file_path", type=click.Path(exists=True, resolve_path=True))
-@click.option("--model", help="Vision language model to use.")
+@click.option(
+    "--model",
+    help="Vision language model to use. With --provider router, the targets to "
+    "spread pages across (e.g., 'openai/gpt-4o=2,anthropic=1').",
+)
 @click.option(
     "--output_file",
     help="Output file name (with .md or .txt extension). If not specified, output will be printed.",
@@ -321,7 +536,11 @@ def fast(
     "--select_pages",
     help="Pages to process (e.g., '1,3-5,10'). Only applicable for PDFs.",
 )
-@click.option("--provider", help="AI provider to use (openai, anthropic, or google).")
+@click.option(
+    "--provider",
+    help="AI provider to use (openai, anthropic, google, or router for several).",
+)
+@vision_options
 @click.option(
     "--stats", is_flag=True, help="Display detailed statistics after processing."
 )
@@ -334,8 +553,11 @@ def hybrid(
     select_pages,
     provider,
     stats,
+    **options,
 ):
     """Convert PDF files using fast local processing followed by AI enhancement."""
+    config = get_config()
+
     if output_file:
         _, ext = os.path.splitext(output_file)
         if ext.lower() not in (".md", ".txt"):
@@ -366,8 +588,20 @@ def hybrid(
             custom_system_prompt=custom_system_prompt,
             select_pages=select_pages,
             provider=provider,
+            options=build_vision_options(config, **options),
         )
 
+        failed_pages = [page.page for page in result.pages if page.error]
+        if failed_pages:
+            click.echo(
+                click.style(
+                    f"Warning: {len(failed_pages)} pages failed and are empty in the "
+                    f"output: {', '.join(map(str, failed_pages))}",
+                    fg="yellow",
+                ),
+                err=True,
+            )
+
         if result.error:
             raise Exception(result.error)
 
@@ -395,8 +629,139 @@ def hybrid(
             click.echo(f"Completion Time: {result.completion_time:.2f} seconds")
             click.echo(f"Total Pages Processed: {len(result.pages)}")
             click.echo(f"Total Input Tokens: {result.input_tokens}")
+            click.echo(f"Cached Input Tokens: {result.cached_input_tokens}")
             click.echo(f"Total Output Tokens: {result.output_tokens}")
             click.echo(f"Total Tokens: {result.input_tokens + result.output_tokens}")
+            if result.accepted_prediction_tokens or result.rejected_prediction_tokens:
+                click.echo(
+                    f"Prediction Tokens: {result.accepted_prediction_tokens} accepted, "
+                    f"{result.rejected_prediction_tokens} rejected"
+                )
+            if options["hedge_percentile"] is not None:
+                click.echo(f"Hedged Requests: {result.hedged_requests}")
+            if result.provider == ROUTER_PROVIDER:
+                echo_target_counts(result.pages)
+
+    except Exception as e:
+        error_message = str(e)
+        if "authentication error" in error_message.lower():
+            error_message = format_authentication_error(error_message, provider)
+        click.echo(click.style(f"Error: {error_message}", fg="red"))
+        sys.exit(1)
+
+
+@main.command()
+@click.option("--concurrency", default=10, help="Number of concurrent processes.")
+@click.argument("file_path", type=click.Path(exists=True, resolve_path=True))
+@click.option(
+    "--model",
+    help="Vision language model to use. With --provider router, the targets to "
+    "spread pages across (e.g., 'openai/gpt-4o=2,anthropic=1').",
+)
+@click.option(
+    "--output_file",
+    help="Output file name (with .md or .txt extension). If not specified, output will be printed.",
+)
+@click.option(
+    "--custom_system_prompt", help="Custom system prompt for the language model."
+)
+@click.option("--select_pages", help="Pages to process (e.g., '1,3-5,10')")
+@click.option(
+    "--provider",
+    help="AI provider to use (openai, anthropic, google, or router for several).",
+)
+@vision_options
+@click.option(
+    "--stats", is_flag=True, help="Display detailed statistics after processing."
+)
+def auto(
+    concurrency,
+    file_path,
+    model,
+    output_file,
+    custom_system_prompt,
+    select_pages,
+    provider,
+    stats,
+    **options,
+):
+    """Convert PDF files, sending only pages without a usable text layer to AI."""
+    config = get_config()
+    provider = provider or config.get("provider", "openai")
+    model = model or config.get("model")
+
+    if output_file:
+        _, ext = os.path.splitext(output_file)
+        if ext.lower() not in (".md", ".txt"):
+            click.echo(
+                click.style(
+                    "Error: Output file must have a .md or .txt extension", fg="red"
+                )
+            )
+            sys.exit(1)
+
+    _, input_ext = os.path.splitext(file_path)
+    if input_ext.lower() != ".pdf":
+        click.echo(click.style("Error: Input file must be a PDF file", fg="red"))
+        sys.exit(1)
+
+    try:
+        from .modes.auto import auto as auto_function
+
+        result = auto_function(
+            concurrency=concurrency,
+            file_path=file_path,
+            model=model,
+            output_file=output_file,
+            custom_system_prompt=custom_system_prompt,
+            select_pages=select_pages,
+            provider=provider,
+            options=build_vision_options(config, **options),
+        )
+
+        if result.error:
+            raise Exception(result.error)
+
+        if output_file:
+            click.echo(f"Output saved to {output_file}")
+        else:
+            multiple_pages = len(result.pages) > 1
+            for page in result.pages:
+                if multiple_pages:
+                    click.echo(
+                        click.style(
+                            f"---Page {page.page} Start---", fg="cyan", bold=True
+                        )
+                    )
+                click.echo(pretty_print_markdown(page.content))
+                if multiple_pages:
+                    click.echo(
+                        click.style(f"---Page {page.page} End---", fg="cyan", bold=True)
+                    )
+                click.echo("\n")
+
+        if stats:
+            vision_pages = [page for page in result.pages if page.engine == "vision"]
+            click.echo(click.style("Processing Statistics:", fg="blue", bold=True))
+            click.echo(f"File Path: {file_path}")
+            click.echo(f"Completion Time: {result.completion_time:.2f} seconds")
+            click.echo(f"Total Pages Processed: {len(result.pages)}")
+            click.echo(f"Pages From Text Layer: {len(result.pages) - len(vision_pages)}")
+            click.echo(f"Pages Sent to {result.provider}: {len(vision_pages)}")
+            click.echo(f"Total Input Tokens: {result.input_tokens}")
+            click.echo(f"Cached Input Tokens: {result.cached_input_tokens}")
+            click.echo(f"Total Output Tokens: {result.output_tokens}")
+            if result.accepted_prediction_tokens or result.rejected_prediction_tokens:
+                click.echo(
+                    f"Prediction Tokens: {result.accepted_prediction_tokens} accepted, "
+                    f"{result.rejected_prediction_tokens} rejected"
+                )
+            if options["hedge_percentile"] is not None:
+                click.echo(f"Hedged Requests: {result.hedged_requests}")
+
+            click.echo("\nPage-wise Statistics:")
+            for page in result.pages:
+                click.echo(f"  Page {page.page}: {page.engine}")
 
     except Exception as e:
         error_message = str(e)
@@ -406,6 +771,154 @@ def hybrid(
         sys.exit(1)
 
 
+@main.group()
+def batch():
+    """Convert large backlogs offline through provider batch APIs."""
+    pass
+
+
+@batch.command("submit")
+@click.argument(
+    "file_paths", nargs=-1, required=True, type=click.Path(exists=True, resolve_path=True)
+)
+@click.option(
+    "--job_dir",
+    required=True,
+    help="Directory where the job manifest (submitted job IDs) is saved.",
+)
+@click.option("--output_dir", help="Directory for one Markdown file per document.")
+@click.option(
+    "--mode",
+    type=click.Choice(["vision", "hybrid"]),
+    default="vision",
+    help="Build page requests as in vision or hybrid mode.",
+)
+@click.option("--model", help="Vision language model to use.")
+@click.option(
+    "--provider",
+    help="Batch provider to use (openai, anthropic, or local for an offline stand-in).",
+)
+@click.option(
+    "--custom_system_prompt", help="Custom system prompt for the language model."
+)
+@click.option("--select_pages", help="Pages to process (e.g., '1,3-5,10')")
+@click.option("--cache_dir", help="Directory for the on-disk rendered page cache.")
+@click.option(
+    "--image_format",
+    type=click.Choice(["png", "jpeg", "webp"]),
+    default=VisionOptions.image_format,
+    help="Encoding for page images sent to the model.",
+)
+@click.option(
+    "--image_quality",
+    type=click.IntRange(1, 100),
+    default=VisionOptions.image_quality,
+    help="Quality for JPEG and WebP page images.",
+)
+@click.option(
+    "--grayscale",
+    type=click.Choice(["auto", "always", "never"]),
+    default=VisionOptions.grayscale,
+    help="Send pages as grayscale; 'auto' converts pages without color content.",
+)
+@click.option(
+    "--max_image_bytes",
+    type=int,
+    help="Per-page byte budget for encoded images; quality and size are reduced to fit.",
+)
+@click.option(
+    "--skip_blank_pages/--keep_blank_pages",
+    default=VisionOptions.skip_blank_pages,
+    help="Skip blank pages instead of sending them to the model.",
+)
+@click.option(
+    "--dedupe_pages",
+    is_flag=True,
+    help="Reuse the model output for near-identical pages within a document.",
+)
+def batch_submit(
+    file_paths,
+    job_dir,
+    output_dir,
+    mode,
+    model,
+    provider,
+    custom_system_prompt,
+    select_pages,
+    cache_dir,
+    image_format,
+    image_quality,
+    grayscale,
+    max_image_bytes,
+    skip_blank_pages,
+    dedupe_pages,
+):
+    """Prepare pages of FILE_PATHS and submit them as batch jobs."""
+    config = get_config()
+    provider = provider or config.get("provider", "openai")
+    model = model or (config.get("model") if provider == config.get("provider") else None)
+
+    try:
+        from .modes.batch import submit_batch
+
+        manifest = submit_batch(
+            file_paths=list(file_paths),
+            job_dir=job_dir,
+            model=model,
+            provider=provider,
+            mode=mode,
+            custom_system_prompt=custom_system_prompt,
+            select_pages=select_pages,
+            output_dir=output_dir,
+            options=VisionOptions(
+                cache_dir=cache_dir or config.get("cache_dir"),
+                image_format=image_format,
+                image_quality=image_quality,
+                grayscale=grayscale,
+                max_image_bytes=max_image_bytes,
+                skip_blank_pages=skip_blank_pages,
+                dedupe_pages=dedupe_pages,
+            ),
+        )
+        click.echo(
+            f"Submitted {len(manifest.documents)} documents in "
+            f"{len(manifest.jobs)} jobs: {', '.join(manifest.jobs)}"
+        )
+        click.echo(f"Collect the results with: gptparse batch collect {job_dir}")
+    except Exception as e:
+        click.echo(click.style(f"Error: {str(e)}", fg="red"))
+        sys.exit(1)
+
+
+@batch.command("collect")
+@click.argument("job_dir", type=click.Path(exists=True, file_okay=False))
+@click.option("--wait", is_flag=True, help="Poll until every job has finished.")
+@click.option(
+    "--poll_interval", default=60, help="Seconds between status checks with --wait."
+)
+def batch_collect(job_dir, wait, poll_interval):
+    """Write the results of the batch jobs recorded in JOB_DIR."""
+    try:
+        from .modes.batch import batch_status, collect_batch
+
+        outputs = collect_batch(job_dir, wait=wait, poll_interval=poll_interval)
+        if outputs is None:
+            for job_id, status in batch_status(job_dir).items():
+                click.echo(f"{job_id}: {status}")
+            click.echo("Jobs are still running; try again later or use --wait.")
+            return
+
+        for output in outputs:
+            message = f"{output.file_path}: {len(output.pages)} pages"
+            if output.error:
+                click.echo(click.style(f"{message} ({output.error})", fg="yellow"))
+            else:
+                click.echo(message)
+    except Exception as e:
+        click.echo(click.style(f"Error: {str(e)}", fg="red"))
+        sys.exit(1)
+
+
 @main.command()
 @click.argument("file_path", type=click.Path(exists=True, resolve_path=True))
 @click.option("--output_file", help="Output file name (with .md or .txt extension)")
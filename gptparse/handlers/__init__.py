@@ -1,15 +1,18 @@
-from typing import Type
-from .base import FileHandler
+from typing import List, Optional, Type
+from .base import FileHandler, RenderConfig
 from .pdf_handler import PDFHandler
 from .image_handler import ImageHandler
 
 
-def get_handler(file_path: str) -> FileHandler:
+def get_handler(
+    file_path: str, render_config: Optional[RenderConfig] = None
+) -> FileHandler:
     """
     Factory function to get the appropriate handler for a file.
     
     Args:
         file_path: Path to the file to be processed
+        render_config: Optional rasterization settings passed to the handler
         
     Returns:
         An instance of the appropriate FileHandler
@@ -20,7 +23,7 @@ def get_handler(file_path: str) -> FileHandler:
     handlers: List[Type[FileHandler]] = [PDFHandler, ImageHandler]
     
     for handler_class in handlers:
-        handler = handler_class(file_path)
+        handler = handler_class(file_path, render_config)
         if handler.supports_file():
             return handler
             
@@ -29,4 +32,4 @@ def get_handler(file_path: str) -> FileHandler:
     )
 
 
-__all__ = ['FileHandler', 'PDFHandler', 'ImageHandler', 'get_handler']
+__all__ = ['FileHandler', 'RenderConfig', 'PDFHandler', 'ImageHandler', 'get_handler']
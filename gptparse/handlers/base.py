@@ -1,13 +1,50 @@
 from abc import ABC, abstractmethod
-from typing import List
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Sequence
 from PIL import Image
+from .rasterizers import Rasterizer, get_rasterizer
+from ..utils.cache import (
+    DEFAULT_CACHE_MAX_BYTES,
+    PageImageCache,
+    file_digest,
+    make_key,
+)
+
+
+@dataclass
+class RenderConfig:
+    """Configuration for page rasterization"""
+
+    dpi: int = 300
+    workers: Optional[int] = None  # None uses one worker per CPU core
+    executor: str = "thread"  # thread, or process for the shared process pool
+    chunk_size: int = 10
+    rasterizer: str = "auto"  # auto, pymupdf or pdf2image
+    max_size: Optional[int] = None  # render at this longest edge, capped by dpi
+    cache_dir: Optional[str] = None  # on-disk page image cache; None disables it
+    cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES
+    render_ahead: Optional[int] = None  # rendered pages held ahead of the consumer
 
 
 class FileHandler(ABC):
     """Base class for file handlers that convert different file types to images."""
 
-    def __init__(self, file_path: str):
+    # Whether rendered pages are worth keeping in the on-disk page cache
+    cache_pages: bool = False
+
+    def __init__(self, file_path: str, render_config: Optional[RenderConfig] = None):
         self.file_path = file_path
+        self.render_config = render_config or RenderConfig()
+        self._rasterizer: Optional[Rasterizer] = None
+        self._page_cache: Optional[PageImageCache] = None
+        self._document_hash: Optional[str] = None
+
+    @property
+    def rasterizer(self) -> Rasterizer:
+        """Backend used to render document pages, resolved on first use."""
+        if self._rasterizer is None:
+            self._rasterizer = get_rasterizer(self.render_config.rasterizer)
+        return self._rasterizer
 
     @abstractmethod
     def get_images(self) -> List[Image.Image]:
@@ -23,3 +60,80 @@ class FileHandler(ABC):
     def is_multi_page(self) -> bool:
         """Return True if the file type supports multiple pages."""
         return False
+
+    @property
+    def page_count(self) -> int:
+        """Return the number of pages without rendering them, where possible."""
+        return len(self.get_images())
+
+    def get_image(self, index: int) -> Image.Image:
+        """Render a single page (0-based index) of the input file."""
+        return next(self.iter_images([index]))
+
+    def iter_images(self, pages: Optional[Sequence[int]] = None) -> Iterator[Image.Image]:
+        """Lazily yield images for the given 0-based pages, in the order given.
+
+        When ``pages`` is None every page is yielded. Pages found in the page
+        cache are loaded from disk; only the rest are rendered.
+        """
+        if pages is None:
+            pages = range(self.page_count)
+
+        cache = self.page_cache
+        if cache is None:
+            yield from self._render_pages(pages)
+            return
+
+        hits = {}
+        for index in pages:
+            if index not in hits:
+                hits[index] = cache.contains(self.cache_key(index))
+        rendered = self._render_pages([index for index, hit in hits.items() if not hit])
+
+        for index in pages:
+            key = self.cache_key(index)
+            image = cache.get(key) if hits[index] else None
+            if image is None:
+                if hits[index]:
+                    # Evicted since we checked; render it on its own
+                    image = next(self._render_pages([index]))
+                else:
+                    image = next(rendered)
+                    hits[index] = True
+                cache.put(key, image)
+            yield image
+
+    def _render_pages(self, pages: Sequence[int]) -> Iterator[Image.Image]:
+        """Render the given 0-based pages, in order, bypassing the page cache."""
+        images = self.get_images()
+        for index in pages:
+            yield images[index]
+
+    @property
+    def page_cache(self) -> Optional[PageImageCache]:
+        """The on-disk page cache, or None if caching is disabled."""
+        if not self.cache_pages or not self.render_config.cache_dir:
+            return None
+        if self._page_cache is None:
+            self._page_cache = PageImageCache(
+                self.render_config.cache_dir, self.render_config.cache_max_bytes
+            )
+        return self._page_cache
+
+    @property
+    def document_hash(self) -> str:
+        """SHA-256 digest of the input file's contents."""
+        if self._document_hash is None:
+            self._document_hash = file_digest(self.file_path)
+        return self._document_hash
+
+    def cache_key(self, index: int) -> str:
+        """Cache key for a page: document content, page and render settings."""
+        config = self.render_config
+        return make_key(
+            self.document_hash,
+            index,
+            self.rasterizer.name,
+            config.dpi,
+            config.max_size,
+        )
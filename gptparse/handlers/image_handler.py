@@ -19,8 +19,13 @@ class ImageHandler(FileHandler):
         if not os.path.exists(self.file_path):
             raise FileNotFoundError(f"Image file not found: {self.file_path}")
 
+        max_size = self.render_config.max_size or 4096
+
         try:
             image = Image.open(self.file_path)
+            # Let JPEG decoding downscale on the fly instead of decoding
+            # every pixel only to throw most of them away in the resize below
+            image.draft('RGB', (max_size, max_size))
             
             # Convert RGBA to RGB if necessary
             if image.mode == 'RGBA':
@@ -31,7 +36,7 @@ class ImageHandler(FileHandler):
                 image = image.convert('RGB')
 
             # Resize if the image is too large
-            image = resize_image(image, max_size=4096)
+            image = resize_image(image, max_size=max_size)
             
             return [image]
         except Exception as e:
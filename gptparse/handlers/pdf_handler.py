@@ -1,39 +1,110 @@
-from typing import List
+from typing import Iterator, List, Optional, Sequence, Tuple
 import os
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
-from pdf2image import convert_from_bytes
-from .base import FileHandler
-from ..utils.pdf_utils import split_pdf_into_chunks
+from .base import FileHandler, RenderConfig
+from ..utils.parallel import ordered_map, shared_process_pool
+from ..utils.pdf_utils import group_page_runs
 
 
 class PDFHandler(FileHandler):
     """Handler for PDF files."""
 
+    cache_pages = True
+
+    def __init__(self, file_path: str, render_config: Optional[RenderConfig] = None):
+        super().__init__(file_path, render_config)
+        self._page_count: Optional[int] = None
+
     def supports_file(self) -> bool:
         """Check if the file is a PDF."""
         return self.file_path.lower().endswith('.pdf')
 
-    def get_images(self) -> List[Image.Image]:
-        """Convert PDF pages to images."""
+    def _check_exists(self):
         if not os.path.exists(self.file_path):
             raise FileNotFoundError(f"PDF file not found: {self.file_path}")
 
-        images = []
-        pdf_chunks = split_pdf_into_chunks(self.file_path)
-        
-        for chunk in pdf_chunks:
-            # Convert each chunk to images with reasonable DPI for OCR
-            chunk_images = convert_from_bytes(
-                chunk,
-                thread_count=4,
-                dpi=300,
-                fmt='PNG',
-                grayscale=False,
-                size=(None, None)  # Maintain original size
-            )
-            images.extend(chunk_images)
-        
-        return images
+    @property
+    def page_count(self) -> int:
+        """Read the page count from the PDF structure without rendering."""
+        if self._page_count is None:
+            self._check_exists()
+            self._page_count = self.rasterizer.page_count(self.file_path)
+        return self._page_count
+
+    @property
+    def workers(self) -> int:
+        """Number of chunks to render at once."""
+        return max(1, self.render_config.workers or os.cpu_count() or 1)
+
+    def get_images(self) -> List[Image.Image]:
+        """Convert PDF pages to images."""
+        return list(self.iter_images())
+
+    def get_image(self, index: int) -> Image.Image:
+        """Render a single page (0-based index)."""
+        if not 0 <= index < self.page_count:
+            raise IndexError(f"Page index out of range: {index}")
+        return super().get_image(index)
+
+    def iter_images(self, pages: Optional[Sequence[int]] = None) -> Iterator[Image.Image]:
+        """Render only the requested pages, using the page cache when enabled."""
+        self._check_exists()
+        return super().iter_images(pages)
+
+    def _render_pages(self, pages: Sequence[int]) -> Iterator[Image.Image]:
+        """Render pages in chunks of consecutive pages.
+
+        With more than one chunk and more than one worker, chunks are rendered
+        in parallel and yielded back in page order: on a thread pool (PyMuPDF
+        and pdftoppm run outside the GIL), or with ``executor="process"`` on
+        the process pool shared by all documents. Up to two chunks per worker are rendered ahead of
+        the consumer, or, with ``render_ahead``, smaller chunks and fewer
+        workers keep the rendered pages not yet consumed within that many.
+        """
+        chunk_size = self.render_config.chunk_size
+        window = self.workers * 2
+        render_ahead = self.render_config.render_ahead
+        if render_ahead:
+            chunk_size = max(1, min(chunk_size, render_ahead // self.workers))
+            window = max(1, min(window, render_ahead // chunk_size))
+        runs = group_page_runs(pages, chunk_size)
+        workers = min(self.workers, len(runs), window)
+
+        if workers <= 1:
+            for run in runs:
+                yield from self._render_range(run)
+            return
+
+        # Each worker already owns a core, so don't fan out pdftoppm further
+        render = partial(
+            self.rasterizer.render_range,
+            self.file_path,
+            dpi=self.render_config.dpi,
+            thread_count=1,
+            max_size=self.render_config.max_size,
+        )
+        if self.render_config.executor == "process":
+            for images in ordered_map(shared_process_pool(), render, runs, window=window):
+                yield from images
+            return
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for images in ordered_map(executor, render, runs, window=window):
+                yield from images
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _render_range(self, run: Tuple[int, int]) -> List[Image.Image]:
+        return self.rasterizer.render_range(
+            self.file_path,
+            run,
+            dpi=self.render_config.dpi,
+            thread_count=4,
+            max_size=self.render_config.max_size,
+        )
 
     @property
     def is_multi_page(self) -> bool:
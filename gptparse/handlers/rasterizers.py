@@ -0,0 +1,175 @@
+from abc import ABC, abstractmethod
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple, Type
+from PIL import Image
+from PyPDF2 import PdfReader
+from pdf2image import convert_from_path
+from ..utils.image_utils import fit_dpi
+
+try:
+    import pymupdf
+except ImportError:  # pragma: no cover - pymupdf ships with pymupdf4llm
+    pymupdf = None
+
+
+class Rasterizer(ABC):
+    """Base class for backends that render PDF pages to PIL Images.
+
+    Rasterizers are stateless so they can be shipped to worker processes.
+    """
+
+    name: str = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Return True if the backend's dependencies are installed."""
+        return True
+
+    @abstractmethod
+    def page_count(self, file_path: str) -> int:
+        """Return the number of pages in the document without rendering."""
+        pass
+
+    @abstractmethod
+    def render_range(
+        self,
+        file_path: str,
+        run: Tuple[int, int],
+        dpi: int,
+        thread_count: int = 1,
+        max_size: Optional[int] = None,
+    ) -> List[Image.Image]:
+        """Render the inclusive 0-based page range ``run``.
+
+        When ``max_size`` is given each page is rendered so its longest edge is
+        ``max_size`` pixels, with ``dpi`` as an upper bound on the resolution.
+        """
+        pass
+
+
+class Pdf2ImageRasterizer(Rasterizer):
+    """Render pages with poppler's pdftoppm through pdf2image."""
+
+    name = "pdf2image"
+
+    def page_count(self, file_path: str) -> int:
+        return len(PdfReader(file_path).pages)
+
+    def render_range(
+        self,
+        file_path: str,
+        run: Tuple[int, int],
+        dpi: int,
+        thread_count: int = 1,
+        max_size: Optional[int] = None,
+    ) -> List[Image.Image]:
+        first, last = run
+        if not max_size:
+            return self._convert(file_path, first, last, thread_count, dpi=dpi)
+
+        # pdftoppm takes one resolution per call, so batch consecutive pages
+        # that need the same one. Pages that would exceed ``dpi`` are capped,
+        # the rest are scaled so their longest edge lands exactly on max_size.
+        reader = PdfReader(file_path)
+        capped = [
+            fit_dpi(*self._page_size(reader.pages[index]), max_size, dpi) >= dpi
+            for index in range(first, last + 1)
+        ]
+
+        images = []
+        index = first
+        for is_capped, group in groupby(capped):
+            count = len(list(group))
+            if is_capped:
+                options = {"dpi": dpi}
+            else:
+                options = {"size": max_size}
+            images.extend(
+                self._convert(
+                    file_path, index, index + count - 1, thread_count, **options
+                )
+            )
+            index += count
+        return images
+
+    @staticmethod
+    def _page_size(page) -> Tuple[float, float]:
+        box = page.cropbox
+        return float(box.width), float(box.height)
+
+    @staticmethod
+    def _convert(
+        file_path: str, first: int, last: int, thread_count: int, **options
+    ) -> List[Image.Image]:
+        return convert_from_path(
+            file_path,
+            first_page=first + 1,
+            last_page=last + 1,
+            thread_count=thread_count,
+            fmt="PNG",
+            grayscale=False,
+            **options,
+        )
+
+
+class PyMuPDFRasterizer(Rasterizer):
+    """Render pages in-process with PyMuPDF, straight from the original file."""
+
+    name = "pymupdf"
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return pymupdf is not None
+
+    def page_count(self, file_path: str) -> int:
+        with pymupdf.open(file_path) as doc:
+            return doc.page_count
+
+    def render_range(
+        self,
+        file_path: str,
+        run: Tuple[int, int],
+        dpi: int,
+        thread_count: int = 1,
+        max_size: Optional[int] = None,
+    ) -> List[Image.Image]:
+        first, last = run
+        images = []
+        with pymupdf.open(file_path) as doc:
+            for index in range(first, last + 1):
+                page = doc[index]
+                zoom = fit_dpi(page.rect.width, page.rect.height, max_size, dpi) / 72
+                pixmap = page.get_pixmap(
+                    matrix=pymupdf.Matrix(zoom, zoom), alpha=False
+                )
+                images.append(
+                    Image.frombytes(
+                        "RGB", (pixmap.width, pixmap.height), pixmap.samples
+                    )
+                )
+        return images
+
+
+RASTERIZERS: Dict[str, Type[Rasterizer]] = {
+    PyMuPDFRasterizer.name: PyMuPDFRasterizer,
+    Pdf2ImageRasterizer.name: Pdf2ImageRasterizer,
+}
+
+
+def get_rasterizer(name: str = "auto") -> Rasterizer:
+    """Return a rasterizer by name; ``auto`` prefers PyMuPDF, then pdf2image."""
+    if name == "auto":
+        for rasterizer_class in RASTERIZERS.values():
+            if rasterizer_class.is_available():
+                return rasterizer_class()
+
+    if name not in RASTERIZERS:
+        raise ValueError(
+            f"Unsupported rasterizer: {name}. "
+            f"Choose from: auto, {', '.join(RASTERIZERS)}"
+        )
+
+    rasterizer_class = RASTERIZERS[name]
+    if not rasterizer_class.is_available():
+        raise ValueError(f"The {name} rasterizer is not installed.")
+    return rasterizer_class()
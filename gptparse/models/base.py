@@ -3,8 +3,10 @@ from typing import Dict, Any, Optional, List, TypeVar
 import asyncio
 import random
 import functools
+import weakref
 from dataclasses import dataclass
-from .types import LLMResponse
+import httpx
+from .types import LLMResponse, Message
 
 T = TypeVar("T")
 
@@ -29,6 +31,37 @@ class RetryConfig:
     jitter: bool = True
 
 
+# Pooled HTTP clients per event loop, shared by every provider instance so
+# connections (and TLS sessions) are reused across requests and documents.
+# Each loop holds one client per timeout, the only client setting a
+# SessionConfig controls, so providers configured differently never share one
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_http_client(session_config: Optional[SessionConfig] = None) -> httpx.AsyncClient:
+    """Return the shared HTTP client for the running event loop and timeout."""
+    session_config = session_config or SessionConfig()
+    clients = _http_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(session_config.timeout)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(session_config.timeout),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=100),
+            follow_redirects=True,
+        )
+        clients[session_config.timeout] = client
+    return client
+
+
+async def close_http_client():
+    """Close the shared HTTP clients of the running event loop, if any."""
+    clients = _http_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
 class RateLimitError(Exception):
     """Raised when API rate limit is exceeded"""
 
@@ -96,6 +129,59 @@ class LLMProvider(ABC):
         self.session_config = session_config or SessionConfig()
         self.retry_config = retry_config or RetryConfig()
         self.extra_kwargs = kwargs
+        self._client = None
+        self._client_http: Optional[httpx.AsyncClient] = None
+
+    @abstractmethod
+    def _create_client(self, http_client: httpx.AsyncClient) -> Any:
+        """Build the provider's async SDK client on top of ``http_client``."""
+        pass
+
+    @property
+    def client(self) -> Any:
+        """Async SDK client bound to the running loop's shared HTTP client."""
+        http_client = get_http_client(self.session_config)
+        if self._client is None or self._client_http is not http_client:
+            self._client = self._create_client(http_client)
+            self._client_http = http_client
+        return self._client
+
+    async def _fetch_images(self, messages: List[Message]) -> Dict[str, httpx.Response]:
+        """Download every URL image in ``messages`` concurrently, keyed by URL."""
+        urls = {
+            part["source"]["data"]
+            for message in messages
+            if not isinstance(message["content"], str)
+            for part in message["content"]
+            if part["type"] == "image"
+            and isinstance(part["source"], dict)
+            and part["source"]["type"] == "url"
+        }
+        if not urls:
+            return {}
+
+        http_client = get_http_client(self.session_config)
+
+        async def fetch(url: str) -> httpx.Response:
+            response = await http_client.get(url)
+            response.raise_for_status()
+            return response
+
+        urls = list(urls)
+        responses = await asyncio.gather(*(fetch(url) for url in urls))
+        return dict(zip(urls, responses))
+
+    def _image_response(
+        self, url: str, images: Optional[Dict[str, httpx.Response]] = None
+    ) -> httpx.Response:
+        """Return a URL image prefetched by ``_fetch_images()``, or download it."""
+        if images and url in images:
+            return images[url]
+        response = httpx.get(
+            url, timeout=self.session_config.timeout, follow_redirects=True
+        )
+        response.raise_for_status()
+        return response
 
     @abstractmethod
     def _convert_messages(self, messages: List[Dict[str, Any]]) -> Any:
@@ -0,0 +1,336 @@
+import io
+import json
+import os
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+from langchain_core.messages import BaseMessage
+from .model_interface import check_api_key
+
+# Generation settings matching the interactive models in model_interface
+BATCH_TEMPERATURE = 0.01
+BATCH_MAX_TOKENS = 4096
+
+# Chat roles by langchain message type
+MESSAGE_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one request in a batch job."""
+
+    content: str = ""
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_input_tokens: int = 0
+    error: Optional[str] = None
+
+
+def split_data_url(url: str):
+    """Split a ``data:<media type>;base64,<data>`` URL into its two parts."""
+    header, data = url.split(",", 1)
+    return header[len("data:") :].split(";", 1)[0], data
+
+
+class BatchBackend(ABC):
+    """Submits page requests to a provider's asynchronous batch API.
+
+    Jobs are identified by the string returned from ``submit``; backends keep
+    no other state, so jobs can be polled from a later process.
+    """
+
+    name: str = None
+    # Provider limits on a single job
+    max_requests: int = 50_000
+    max_bytes: int = 100 << 20
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @abstractmethod
+    def build_request(self, custom_id: str, messages: List[BaseMessage]) -> dict:
+        """Convert one page's messages into the provider's batch request format."""
+        pass
+
+    @abstractmethod
+    def submit(self, requests: List[dict]) -> str:
+        """Submit requests as a new job and return its ID."""
+        pass
+
+    @abstractmethod
+    def status(self, job_id: str) -> str:
+        """Return "in_progress", "completed" or "failed"."""
+        pass
+
+    @abstractmethod
+    def results(self, job_id: str) -> Dict[str, BatchResult]:
+        """Return results of a completed job, keyed by custom ID."""
+        pass
+
+    @staticmethod
+    def _content_parts(message: BaseMessage):
+        if isinstance(message.content, str):
+            yield {"type": "text", "text": message.content}
+        else:
+            yield from message.content
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """OpenAI Batch API over /v1/chat/completions."""
+
+    name = "openai"
+    max_bytes = 200 << 20
+
+    def __init__(self, model: str):
+        super().__init__(model)
+        from openai import OpenAI
+
+        check_api_key("openai")
+        self.client = OpenAI()
+
+    def build_request(self, custom_id: str, messages: List[BaseMessage]) -> dict:
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": self.model,
+                "temperature": BATCH_TEMPERATURE,
+                "max_tokens": BATCH_MAX_TOKENS,
+                "messages": [
+                    {
+                        "role": MESSAGE_ROLES[message.type],
+                        "content": list(self._content_parts(message)),
+                    }
+                    for message in messages
+                ],
+            },
+        }
+
+    def submit(self, requests: List[dict]) -> str:
+        payload = "".join(json.dumps(request) + "\n" for request in requests)
+        input_file = self.client.files.create(
+            file=("requests.jsonl", io.BytesIO(payload.encode("utf-8"))),
+            purpose="batch",
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    def status(self, job_id: str) -> str:
+        status = self.client.batches.retrieve(job_id).status
+        if status == "completed":
+            return "completed"
+        if status in ("failed", "expired", "cancelled"):
+            return "failed"
+        return "in_progress"
+
+    def results(self, job_id: str) -> Dict[str, BatchResult]:
+        batch = self.client.batches.retrieve(job_id)
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                body = response.get("body") or {}
+                if record.get("error") or response.get("status_code") != 200:
+                    error = record.get("error") or body.get("error")
+                    results[record["custom_id"]] = BatchResult(error=str(error))
+                    continue
+                usage = body.get("usage") or {}
+                results[record["custom_id"]] = BatchResult(
+                    content=body["choices"][0]["message"]["content"] or "",
+                    input_tokens=usage.get("prompt_tokens", 0),
+                    output_tokens=usage.get("completion_tokens", 0),
+                    cached_input_tokens=(usage.get("prompt_tokens_details") or {}).get(
+                        "cached_tokens", 0
+                    ),
+                )
+        return results
+
+
+class AnthropicBatchBackend(BatchBackend):
+    """Anthropic Message Batches API."""
+
+    name = "anthropic"
+    max_requests = 100_000
+    max_bytes = 256 << 20
+
+    def __init__(self, model: str):
+        super().__init__(model)
+        from anthropic import Anthropic
+
+        check_api_key("anthropic")
+        self.client = Anthropic()
+
+    def build_request(self, custom_id: str, messages: List[BaseMessage]) -> dict:
+        # System messages, with any cache_control breakpoints, become the
+        # system prompt; everything else is sent as one user turn
+        system = [
+            part
+            for message in messages
+            if message.type == "system"
+            for part in self._content_parts(message)
+        ]
+        content = []
+        for message in messages:
+            if message.type == "system":
+                continue
+            for part in self._content_parts(message):
+                if part["type"] == "image_url":
+                    media_type, data = split_data_url(part["image_url"]["url"])
+                    content.append(
+                        {
+                            "type": "image",
+                            "source": {
+                                "type": "base64",
+                                "media_type": media_type,
+                                "data": data,
+                            },
+                        }
+                    )
+                else:
+                    content.append(part)
+        params = {
+            "model": self.model,
+            "temperature": BATCH_TEMPERATURE,
+            "max_tokens": BATCH_MAX_TOKENS,
+            "messages": [{"role": "user", "content": content}],
+        }
+        if system:
+            params["system"] = system
+        return {"custom_id": custom_id, "params": params}
+
+    def submit(self, requests: List[dict]) -> str:
+        return self.client.messages.batches.create(requests=requests).id
+
+    def status(self, job_id: str) -> str:
+        batch = self.client.messages.batches.retrieve(job_id)
+        if batch.processing_status != "ended":
+            return "in_progress"
+        return "completed"
+
+    def results(self, job_id: str) -> Dict[str, BatchResult]:
+        results = {}
+        for entry in self.client.messages.batches.results(job_id):
+            result = entry.result
+            if result.type != "succeeded":
+                error = getattr(result, "error", None) or result.type
+                results[entry.custom_id] = BatchResult(error=str(error))
+                continue
+            message = result.message
+            results[entry.custom_id] = BatchResult(
+                content="".join(
+                    block.text for block in message.content if block.type == "text"
+                ),
+                input_tokens=message.usage.input_tokens,
+                output_tokens=message.usage.output_tokens,
+                cached_input_tokens=message.usage.cache_read_input_tokens or 0,
+            )
+        return results
+
+
+def placeholder_response(request: dict) -> BatchResult:
+    """Default responder of the local backend: no model, empty page markers."""
+    return BatchResult(content=f"<!-- {request['custom_id']} -->")
+
+
+class LocalBatchBackend(BatchBackend):
+    """File-based stand-in for a batch API, for offline runs and tests.
+
+    Jobs are directories under ``root`` holding ``requests.jsonl``. A job is
+    answered by ``responder`` the first time its status is checked, and the
+    answers are written to ``results.jsonl``.
+    """
+
+    name = "local"
+    max_requests = 1_000_000
+    max_bytes = 1 << 40
+
+    def __init__(
+        self,
+        model: str = "local",
+        root: Optional[str] = None,
+        responder: Callable[[dict], BatchResult] = placeholder_response,
+    ):
+        super().__init__(model)
+        self.root = os.path.expanduser(root or os.path.join("~", ".gptparse", "batches"))
+        self.responder = responder
+
+    def build_request(self, custom_id: str, messages: List[BaseMessage]) -> dict:
+        return {
+            "custom_id": custom_id,
+            "model": self.model,
+            "messages": [
+                {
+                    "role": MESSAGE_ROLES[message.type],
+                    "content": list(self._content_parts(message)),
+                }
+                for message in messages
+            ],
+        }
+
+    def _path(self, job_id: str, name: str) -> str:
+        return os.path.join(self.root, job_id, name)
+
+    def submit(self, requests: List[dict]) -> str:
+        job_id = f"local-{uuid.uuid4().hex}"
+        os.makedirs(os.path.join(self.root, job_id))
+        with open(self._path(job_id, "requests.jsonl"), "w", encoding="utf-8") as f:
+            for request in requests:
+                f.write(json.dumps(request) + "\n")
+        return job_id
+
+    def status(self, job_id: str) -> str:
+        if not os.path.exists(self._path(job_id, "requests.jsonl")):
+            return "failed"
+        if not os.path.exists(self._path(job_id, "results.jsonl")):
+            self._process(job_id)
+        return "completed"
+
+    def _process(self, job_id: str):
+        tmp_path = self._path(job_id, "results.jsonl.tmp")
+        with open(self._path(job_id, "requests.jsonl"), encoding="utf-8") as requests:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for line in requests:
+                    request = json.loads(line)
+                    result = self.responder(request)
+                    f.write(
+                        json.dumps({"custom_id": request["custom_id"], **vars(result)})
+                        + "\n"
+                    )
+        os.replace(tmp_path, self._path(job_id, "results.jsonl"))
+
+    def results(self, job_id: str) -> Dict[str, BatchResult]:
+        results = {}
+        with open(self._path(job_id, "results.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                custom_id = record.pop("custom_id")
+                results[custom_id] = BatchResult(**record)
+        return results
+
+
+BATCH_BACKENDS = {
+    OpenAIBatchBackend.name: OpenAIBatchBackend,
+    AnthropicBatchBackend.name: AnthropicBatchBackend,
+    LocalBatchBackend.name: LocalBatchBackend,
+}
+
+
+def get_batch_backend(provider: str, model: str, **kwargs) -> BatchBackend:
+    """Return the batch backend for a provider."""
+    if provider not in BATCH_BACKENDS:
+        raise ValueError(
+            f"Batch mode is not supported for {provider}. "
+            f"Choose from: {', '.join(BATCH_BACKENDS)}"
+        )
+    return BATCH_BACKENDS[provider](model, **kwargs)
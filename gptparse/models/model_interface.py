@@ -1,8 +1,21 @@
+import asyncio
+import json
 import os
+import threading
+import weakref
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain_google_genai import ChatGoogleGenerativeAI
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+except ImportError:
+    h2 = None
+
+# Connections per HTTP client when no concurrency is given
+DEFAULT_POOL_SIZE = 100
 
 PROVIDER_MODELS = {
     "openai": {
@@ -41,24 +54,81 @@ def check_api_key(provider: str):
         )
 
 
-def get_model(provider: str, model: str = None, **kwargs: Dict[str, Any]):
-    if provider not in PROVIDER_MODELS:
-        raise ValueError(f"Unsupported provider: {provider}")
+def _http_limits(pool_size: int) -> httpx.Limits:
+    return httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
 
-    check_api_key(provider)
 
-    if model is None:
-        model = PROVIDER_MODELS[provider]["default"]
-    elif model not in PROVIDER_MODELS[provider]["options"]:
-        raise ValueError(f"Unsupported model for {provider}: {model}")
+# Model clients built by get_model(), keyed by provider, model and settings.
+# Sync clients are shared by the whole process; async clients are bound to
+# the event loop they run on, so those are kept per loop.
+_models: Dict[Tuple, Any] = {}
+_loop_models: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+_loop_closers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = (
+    weakref.WeakKeyDictionary()
+)
+_http_clients: Dict[int, httpx.Client] = {}
+_models_lock = threading.Lock()
+
+
+async def _close_loop_clients(models: Dict[Tuple, Any]):
+    """Close the async HTTP clients of a loop's models when the loop shuts down.
+
+    A suspended async generator is finalized by ``loop.shutdown_asyncgens()``,
+    which ``asyncio.run()`` calls while the loop can still run ``aclose()``.
+    """
+    try:
+        yield
+    finally:
+        for model in list(models.values()):
+            client = getattr(model, "http_async_client", None)
+            if client is not None:
+                await client.aclose()
+        models.clear()
+
+
+def _close_with_loop(event_loop: asyncio.AbstractEventLoop, models: Dict[Tuple, Any]):
+    closer = _close_loop_clients(models)
+
+    async def start():
+        await closer.__anext__()
+
+    # Start it in a task on the loop, so the loop tracks it for shutdown
+    _loop_closers[event_loop] = closer
+    asyncio.run_coroutine_threadsafe(start(), event_loop)
 
+
+def _build_model(
+    provider: str,
+    model: str,
+    pool_size: int,
+    event_loop: Optional[asyncio.AbstractEventLoop],
+    **kwargs: Dict[str, Any],
+):
     if provider == "openai":
+        # One keep-alive pool per pool size, shared by every OpenAI model
+        http_client = _http_clients.get(pool_size)
+        if http_client is None:
+            http_client = httpx.Client(
+                limits=_http_limits(pool_size), http2=h2 is not None
+            )
+            _http_clients[pool_size] = http_client
+        http_async_client = (
+            httpx.AsyncClient(limits=_http_limits(pool_size), http2=h2 is not None)
+            if event_loop is not None
+            else None
+        )
         return ChatOpenAI(
             model=model,
             temperature=0.01,
             max_tokens=4096,
             timeout=None,
             max_retries=2,
+            # Rate limit headers let the limiter track the account's quota
+            include_response_headers=True,
+            http_client=http_client,
+            http_async_client=http_async_client,
             **kwargs,
         )
     elif provider == "anthropic":
@@ -76,6 +146,54 @@ def get_model(provider: str, model: str = None, **kwargs: Dict[str, Any]):
         )
 
 
+def get_model(
+    provider: str,
+    model: str = None,
+    pool_size: Optional[int] = None,
+    event_loop: Optional[asyncio.AbstractEventLoop] = None,
+    **kwargs: Dict[str, Any],
+):
+    """Return the chat model client for a provider and model.
+
+    Clients are built once per provider, model, API key and settings and then
+    reused, so their connections (and TLS sessions) are kept alive across
+    documents. ``pool_size`` caps the open connections, usually at the
+    caller's concurrency. Clients for async calls are separate for every
+    ``event_loop`` and are closed when the loop shuts down through
+    ``shutdown_asyncgens()``, as ``asyncio.run()`` does. Safe to call from
+    several threads.
+    """
+    if provider not in PROVIDER_MODELS:
+        raise ValueError(f"Unsupported provider: {provider}")
+
+    check_api_key(provider)
+
+    if model is None:
+        model = PROVIDER_MODELS[provider]["default"]
+    elif model not in PROVIDER_MODELS[provider]["options"]:
+        raise ValueError(f"Unsupported model for {provider}: {model}")
+
+    pool_size = max(1, pool_size or DEFAULT_POOL_SIZE)
+    key = (
+        provider,
+        model,
+        pool_size,
+        os.getenv(PROVIDER_MODELS[provider]["env_var"]),
+        json.dumps(kwargs, default=str, sort_keys=True),
+    )
+    with _models_lock:
+        if event_loop is None:
+            models = _models
+        else:
+            models = _loop_models.get(event_loop)
+            if models is None:
+                models = _loop_models[event_loop] = {}
+                _close_with_loop(event_loop, models)
+        if key not in models:
+            models[key] = _build_model(provider, model, pool_size, event_loop, **kwargs)
+        return models[key]
+
+
 def list_available_models(provider: str = None):
     if provider:
         if provider not in PROVIDER_MODELS:
@@ -1,6 +1,7 @@
-from typing import List, Any
-from anthropic import Anthropic
+from typing import Dict, List, Any, Optional
+from anthropic import AsyncAnthropic
 import base64
+import httpx
 from ..types import Message, LLMResponse, TokenUsage, MessageContent
 from ..base import LLMProvider, retry_with_backoff
 
@@ -17,10 +18,16 @@ class AnthropicProvider(LLMProvider):
         **kwargs
     ):
         super().__init__(model, temperature, max_tokens, **kwargs)
-        self.client = Anthropic()
         self.system = system
 
-    def _convert_messages(self, messages: List[Message]) -> List[dict]:
+    def _create_client(self, http_client: httpx.AsyncClient) -> AsyncAnthropic:
+        return AsyncAnthropic(http_client=http_client)
+
+    def _convert_messages(
+        self,
+        messages: List[Message],
+        images: Optional[Dict[str, httpx.Response]] = None,
+    ) -> List[dict]:
         converted_messages = []
 
         for message in messages:
@@ -47,17 +54,21 @@ class AnthropicProvider(LLMProvider):
                                 }
                             )
                         elif image_source["type"] == "url":
-                            # Convert URL to base64 for Anthropic
-                            import requests
-
-                            response = requests.get(image_source["data"])
+                            # Anthropic takes inline images; complete() fetches
+                            # URLs up front, concurrently
+                            response = self._image_response(
+                                image_source["data"], images
+                            )
                             image_data = base64.b64encode(response.content).decode()
+                            media_type = response.headers.get(
+                                "content-type", "image/jpeg"
+                            ).split(";")[0]
                             content_parts.append(
                                 {
                                     "type": "image",
                                     "source": {
                                         "type": "base64",
-                                        "media_type": "image/jpeg",
+                                        "media_type": media_type,
                                         "data": image_data,
                                     },
                                 }
@@ -74,14 +85,24 @@ class AnthropicProvider(LLMProvider):
             "model": self.model,
             "max_tokens": self.max_tokens,
             "temperature": self.temperature,
-            "messages": self._convert_messages(messages),
+            "messages": self._convert_messages(
+                messages, await self._fetch_images(messages)
+            ),
             **kwargs,
         }
 
         if self.system:
-            request_params["system"] = self.system
+            # Mark the system prompt as a cache breakpoint so repeated
+            # requests read it from Anthropic's prompt cache
+            request_params["system"] = [
+                {
+                    "type": "text",
+                    "text": self.system,
+                    "cache_control": {"type": "ephemeral"},
+                }
+            ]
 
-        response = self.client.messages.create(**request_params)
+        response = await self.client.messages.create(**request_params)
 
         return LLMResponse(
             content=response.content[0].text if response.content else "",
@@ -91,5 +112,7 @@ class AnthropicProvider(LLMProvider):
                 completion_tokens=response.usage.output_tokens,
                 total_tokens=response.usage.input_tokens + response.usage.output_tokens,
                 prediction_tokens=0,
+                cached_tokens=getattr(response.usage, "cache_read_input_tokens", 0)
+                or 0,
             ),
         )
@@ -1,5 +1,7 @@
-from typing import List, Union, Any
+from io import BytesIO
+from typing import Dict, List, Optional, Union, Any
 import google.generativeai as genai
+import httpx
 from PIL import Image
 from ..types import Message, LLMResponse, TokenUsage
 from ..base import LLMProvider, retry_with_backoff
@@ -21,8 +23,15 @@ class GoogleProvider(LLMProvider):
             ),
         )
 
+    def _create_client(self, http_client: httpx.AsyncClient) -> genai.GenerativeModel:
+        # The genai SDK manages its own transport; the shared HTTP client is
+        # only used to fetch URL images
+        return self.model
+
     def _convert_messages(
-        self, messages: List[Message]
+        self,
+        messages: List[Message],
+        images: Optional[Dict[str, httpx.Response]] = None,
     ) -> Union[str, List[Union[str, Image.Image]]]:
         if len(messages) == 1 and isinstance(messages[0]["content"], str):
             return messages[0]["content"]
@@ -42,20 +51,20 @@ class GoogleProvider(LLMProvider):
                             converted.append(image_source)
                         elif isinstance(image_source, dict):
                             if image_source["type"] == "url":
-                                import requests
-                                from io import BytesIO
-
-                                response = requests.get(image_source["data"])
+                                # complete() fetches URLs up front, concurrently
+                                response = self._image_response(
+                                    image_source["data"], images
+                                )
                                 converted.append(Image.open(BytesIO(response.content)))
 
         return converted if len(converted) > 1 else converted[0]
 
     @retry_with_backoff()
     async def complete(self, messages: List[Message], **kwargs) -> LLMResponse:
-        prompt = self._convert_messages(messages)
-        prompt_tokens = self.model.count_tokens(prompt)
+        prompt = self._convert_messages(messages, await self._fetch_images(messages))
 
-        response = self.model.generate_content(prompt, **kwargs)
+        # Token usage comes back with the response, so no count_tokens round-trip
+        response = await self.model.generate_content_async(prompt, **kwargs)
 
         return LLMResponse(
             content=response.text,
@@ -65,5 +74,9 @@ class GoogleProvider(LLMProvider):
                 completion_tokens=response.usage_metadata.candidates_token_count,
                 total_tokens=response.usage_metadata.total_token_count,
                 prediction_tokens=0,
+                cached_tokens=getattr(
+                    response.usage_metadata, "cached_content_token_count", 0
+                )
+                or 0,
             ),
         )
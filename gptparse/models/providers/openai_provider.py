@@ -1,5 +1,6 @@
 from typing import List, Optional
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI
 from ..types import Message, LLMResponse, TokenUsage
 from ..base import LLMProvider, retry_with_backoff
 
@@ -11,7 +12,9 @@ class OpenAIProvider(LLMProvider):
         self, model: str, temperature: float = None, max_tokens: int = None, **kwargs
     ):
         super().__init__(model, temperature, max_tokens, **kwargs)
-        self.client = OpenAI()
+
+    def _create_client(self, http_client: httpx.AsyncClient) -> AsyncOpenAI:
+        return AsyncOpenAI(http_client=http_client)
 
     def _convert_messages(self, messages: List[Message]) -> List[dict]:
         converted_messages = []
@@ -58,7 +61,7 @@ class OpenAIProvider(LLMProvider):
         if prediction:
             completion_kwargs["prediction"] = prediction
 
-        completion = self.client.chat.completions.create(**completion_kwargs)
+        completion = await self.client.chat.completions.create(**completion_kwargs)
 
         prediction_tokens = (
             completion.usage.completion_tokens_details.accepted_prediction_tokens
@@ -74,5 +77,11 @@ class OpenAIProvider(LLMProvider):
                 completion_tokens=completion.usage.completion_tokens,
                 total_tokens=completion.usage.total_tokens,
                 prediction_tokens=prediction_tokens,
+                cached_tokens=getattr(
+                    getattr(completion.usage, "prompt_tokens_details", None),
+                    "cached_tokens",
+                    0,
+                )
+                or 0,
             ),
         )
@@ -0,0 +1,216 @@
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Collection, List, Optional, Tuple
+from . import model_interface
+from .model_interface import PROVIDER_MODELS
+from ..utils.ratelimit import RateLimiter, get_rate_limiter, is_rate_limit_error
+
+# Pseudo-provider that spreads requests across several provider/model targets
+ROUTER_PROVIDER = "router"
+
+# Weight of the newest call in a target's latency and error rate averages
+ROUTER_SMOOTHING = 0.2
+
+# Seconds a target is passed over after a rate limit or server error
+FAILOVER_COOLDOWN_SECONDS = 30.0
+
+# Share of its weight a target keeps however slow or failing it is, so it
+# still gets the odd request and can recover
+MIN_SCORE_SHARE = 0.05
+
+# Exception types of transient failures in the provider SDKs
+_TRANSIENT_ERRORS = (
+    "APIConnectionError",
+    "APITimeoutError",
+    "InternalServerError",
+    "OverloadedError",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+)
+
+
+def parse_targets(spec: str) -> List[Tuple[str, str, float]]:
+    """Parse a comma-separated ``provider[/model][=weight]`` list of targets.
+
+    Targets without a model use the provider's default model, and targets
+    without a weight get a weight of one.
+    """
+    targets = []
+    for entry in filter(None, (entry.strip() for entry in (spec or "").split(","))):
+        name, _, weight = entry.partition("=")
+        provider, _, model = name.strip().partition("/")
+        if provider not in PROVIDER_MODELS:
+            raise ValueError(
+                f"Unsupported provider in router target {entry!r}. "
+                f"Choose from: {', '.join(PROVIDER_MODELS)}"
+            )
+        try:
+            weight = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid weight in router target {entry!r}")
+        if weight <= 0:
+            raise ValueError(f"Router target weights must be positive: {entry!r}")
+        targets.append(
+            (provider, model or PROVIDER_MODELS[provider]["default"], weight)
+        )
+    if not targets:
+        raise ValueError(
+            "The router provider needs its targets as the model, "
+            "e.g. 'openai/gpt-4o=2,anthropic=1'"
+        )
+    return targets
+
+
+def format_targets(targets: List[Tuple[str, str, float]]) -> str:
+    """Inverse of ``parse_targets()``, with every model and weight spelled out."""
+    return ",".join(
+        f"{provider}/{model}={weight:g}" for provider, model, weight in targets
+    )
+
+
+def is_failover_error(error: BaseException) -> bool:
+    """Return True for failures another provider is unlikely to share.
+
+    These are rate limit errors, server errors (HTTP 5xx) and connection
+    problems, as opposed to errors caused by the request itself.
+    """
+    status = getattr(error, "status_code", None) or getattr(
+        getattr(error, "response", None), "status_code", None
+    )
+    return (
+        is_rate_limit_error(error)
+        or (isinstance(status, int) and status >= 500)
+        or type(error).__name__ in _TRANSIENT_ERRORS
+    )
+
+
+@dataclass
+class RouteTarget:
+    """A provider/model that requests can be sent to, with its live health."""
+
+    provider: str
+    model: str
+    ai_model: Any
+    rate_limiter: RateLimiter
+    weight: float = 1.0
+    latency: Optional[float] = None  # smoothed seconds per successful call
+    error_rate: float = 0.0  # smoothed share of failed calls
+    cooldown_until: float = 0.0  # monotonic time until which to avoid it
+
+    @property
+    def name(self) -> str:
+        return f"{self.provider}/{self.model}"
+
+
+class ModelRouter:
+    """Spreads model calls across provider/model targets.
+
+    Each call goes to a target picked at random in proportion to its weight,
+    scaled down by its smoothed latency relative to the other targets and by
+    its error rate. Targets that just failed with a rate limit or server error
+    are passed over for a while, unless no other target is left. A single
+    target router simply always picks that target.
+    """
+
+    def __init__(self, targets: List[RouteTarget]):
+        if not targets:
+            raise ValueError("A router needs at least one target")
+        self.targets = targets
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> RouteTarget:
+        """The first target, whose settings are used for up-front estimates."""
+        return self.targets[0]
+
+    def _score(self, target: RouteTarget, latency: float) -> float:
+        score = target.weight * (1 - target.error_rate)
+        if target.latency:
+            score *= latency / target.latency
+        return max(score, target.weight * MIN_SCORE_SHARE)
+
+    def choose(self, exclude: Collection[RouteTarget] = ()) -> RouteTarget:
+        """Pick the target for the next call, avoiding those in ``exclude``."""
+        with self._lock:
+            candidates = [
+                target
+                for target in self.targets
+                if not any(target is excluded for excluded in exclude)
+            ] or self.targets
+            if len(candidates) == 1:
+                return candidates[0]
+            now = time.monotonic()
+            candidates = [
+                target for target in candidates if target.cooldown_until <= now
+            ] or candidates
+
+            # Latencies are compared to the mean, so only relative speed counts
+            latencies = [target.latency for target in candidates if target.latency]
+            latency = sum(latencies) / len(latencies) if latencies else 0.0
+            scores = [self._score(target, latency) for target in candidates]
+            return random.choices(candidates, weights=scores)[0]
+
+    def record(
+        self,
+        target: RouteTarget,
+        latency: Optional[float] = None,
+        error: Optional[BaseException] = None,
+    ):
+        """Feed back the outcome of a call to ``target``."""
+        with self._lock:
+            failed = error is not None
+            target.error_rate += ROUTER_SMOOTHING * (failed - target.error_rate)
+            if latency is not None:
+                target.latency = (
+                    latency
+                    if target.latency is None
+                    else target.latency + ROUTER_SMOOTHING * (latency - target.latency)
+                )
+            if failed and is_failover_error(error):
+                target.cooldown_until = time.monotonic() + FAILOVER_COOLDOWN_SECONDS
+
+
+def get_router(
+    provider: str,
+    model: str,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    pool_size: Optional[int] = None,
+    event_loop: Optional[asyncio.AbstractEventLoop] = None,
+) -> ModelRouter:
+    """Build the router for a provider and model.
+
+    For the router provider ``model`` lists the targets (see
+    ``parse_targets()``), and the rate limits apply to each of them; any
+    other provider gets a router with that single target. ``pool_size`` and
+    ``event_loop`` are passed on to ``model_interface.get_model()``.
+    """
+    if provider == ROUTER_PROVIDER:
+        targets = parse_targets(model)
+    else:
+        targets = [(provider, model, 1.0)]
+    return ModelRouter(
+        [
+            RouteTarget(
+                provider=target_provider,
+                model=target_model,
+                ai_model=model_interface.get_model(
+                    target_provider,
+                    target_model,
+                    pool_size=pool_size,
+                    event_loop=event_loop,
+                ),
+                rate_limiter=get_rate_limiter(
+                    target_provider,
+                    target_model,
+                    requests_per_minute,
+                    tokens_per_minute,
+                ),
+                weight=weight,
+            )
+            for target_provider, target_model, weight in targets
+        ]
+    )
@@ -21,6 +21,7 @@ class TokenUsage:
     completion_tokens: int
     total_tokens: int
     prediction_tokens: int = 0
+    cached_tokens: int = 0  # prompt tokens read from the provider's cache
 
     def to_dict(self):
         return asdict(self)
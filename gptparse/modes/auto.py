@@ -0,0 +1,135 @@
+import os
+import time
+import logging
+from typing import Any, List, Optional
+from ..config import setup_logging
+from ..handlers import get_handler
+from ..outputs import GPTParseOutput, Page, write_markdown
+from ..utils.pdf_utils import PageProfile, profile_pages
+from .fast import fast
+from .vision import VisionOptions, parse_page_selection, vision, vision_options
+
+setup_logging()
+
+
+def format_page_selection(pages: List[int]) -> str:
+    """Format 0-based page indices as a 1-based ``select_pages`` string."""
+    return ",".join(str(page + 1) for page in pages)
+
+
+def route_pages(profiles: List[PageProfile]) -> List[int]:
+    """Return the 0-based pages whose text layer is not good enough on its own."""
+    return [profile.page for profile in profiles if profile.needs_vision()]
+
+
+def auto(
+    concurrency: int,
+    file_path: str,
+    model: Optional[str] = None,
+    output_file: Optional[str] = None,
+    custom_system_prompt: Optional[str] = None,
+    select_pages: Optional[str] = None,
+    provider: str = "openai",
+    options: Optional[VisionOptions] = None,
+    **overrides: Any,
+) -> GPTParseOutput:
+    """Convert PDF to Markdown, using vision only for pages that need it.
+
+    Each page is profiled from the PDF structure (text, image coverage and
+    vector drawing density). Pages with a usable text layer go through fast
+    mode; scanned, image-heavy or table/chart-heavy pages go through vision
+    mode, with ``options`` (and any ``VisionOptions`` fields passed as
+    keyword arguments).
+    """
+    options = vision_options(options, **overrides)
+    try:
+        start_time = time.time()
+
+        if not file_path.lower().endswith(".pdf"):
+            raise ValueError("Auto mode only supports PDF files")
+
+        total_pages = get_handler(file_path).page_count
+        selected = (
+            parse_page_selection(select_pages, total_pages) if select_pages else []
+        ) or list(range(total_pages))
+
+        vision_pages = set(route_pages(profile_pages(file_path, selected)))
+        fast_pages = [index for index in selected if index not in vision_pages]
+        logging.info(
+            f"Auto mode: {len(fast_pages)} pages from the text layer, "
+            f"{len(vision_pages)} pages with vision"
+        )
+
+        pages: List[Page] = []
+        input_tokens = 0
+        output_tokens = 0
+        cached_input_tokens = 0
+        accepted_prediction_tokens = 0
+        rejected_prediction_tokens = 0
+        hedged_requests = 0
+
+        if fast_pages:
+            fast_result = fast(
+                file_path=file_path,
+                select_pages=format_page_selection(fast_pages),
+            )
+            if fast_result.error:
+                raise Exception(f"Fast mode error: {fast_result.error}")
+            pages.extend(fast_result.pages)
+
+        if vision_pages:
+            vision_result = vision(
+                concurrency=concurrency,
+                file_path=file_path,
+                model=model,
+                custom_system_prompt=custom_system_prompt,
+                select_pages=format_page_selection(sorted(vision_pages)),
+                provider=provider,
+                options=options,
+            )
+            if vision_result.error:
+                raise Exception(f"Vision mode error: {vision_result.error}")
+            pages.extend(vision_result.pages)
+            provider = vision_result.provider
+            model = vision_result.model
+            input_tokens = vision_result.input_tokens
+            output_tokens = vision_result.output_tokens
+            cached_input_tokens = vision_result.cached_input_tokens
+            accepted_prediction_tokens = vision_result.accepted_prediction_tokens
+            rejected_prediction_tokens = vision_result.rejected_prediction_tokens
+            hedged_requests = vision_result.hedged_requests
+
+        order = {index + 1: position for position, index in enumerate(selected)}
+        pages.sort(key=lambda page: order.get(page.page, len(order)))
+
+        result = GPTParseOutput(
+            file_path=os.path.abspath(file_path),
+            provider=provider,
+            model=model,
+            completion_time=time.time() - start_time,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cached_input_tokens=cached_input_tokens,
+            accepted_prediction_tokens=accepted_prediction_tokens,
+            rejected_prediction_tokens=rejected_prediction_tokens,
+            hedged_requests=hedged_requests,
+            pages=pages,
+        )
+
+        if output_file:
+            write_markdown(result.pages, output_file)
+
+        return result
+
+    except Exception as e:
+        logging.error(f"Error in auto mode: {str(e)}")
+        return GPTParseOutput(
+            file_path=os.path.abspath(file_path),
+            provider=provider,
+            model=model,
+            completion_time=0,
+            input_tokens=0,
+            output_tokens=0,
+            pages=[],
+            error=str(e),
+        )
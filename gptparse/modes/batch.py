@@ -0,0 +1,303 @@
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+from langchain_core.messages import AIMessage
+from ..config import setup_logging
+from ..handlers import get_handler
+from ..models.batch import BatchBackend, LocalBatchBackend, get_batch_backend
+from ..models.model_interface import PROVIDER_MODELS
+from ..outputs import GPTParseOutput, write_markdown
+from ..utils.pdf_utils import text_layer_pages
+from .fast import fast
+from .hybrid import reference_inputs
+from .vision import (
+    PROMPT_CACHE_PROVIDERS,
+    VISION_PROMPT,
+    PageAssembler,
+    PageFailure,
+    PageFilter,
+    PageShortcut,
+    VisionOptions,
+    failure_summary,
+    parse_page_selection,
+    prepare_page,
+    vision_options,
+)
+
+setup_logging()
+
+MANIFEST_FILE = "manifest.json"
+
+
+@dataclass
+class BatchDocument:
+    """A document submitted as part of a batch job."""
+
+    file_path: str
+    pages: List[int]  # 0-based pages, in document order
+    output_file: Optional[str] = None
+    # Pages answered without a request: {"<index>": {"skipped", "duplicate_of"}}
+    shortcuts: Dict[str, dict] = field(default_factory=dict)
+
+
+@dataclass
+class BatchManifest:
+    """What was submitted, persisted so results can be collected later."""
+
+    provider: str
+    model: str
+    mode: str
+    created: float
+    jobs: List[str] = field(default_factory=list)
+    documents: List[BatchDocument] = field(default_factory=list)
+
+    def save(self, job_dir: str):
+        os.makedirs(job_dir, exist_ok=True)
+        tmp_path = os.path.join(job_dir, MANIFEST_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, indent=2)
+        os.replace(tmp_path, os.path.join(job_dir, MANIFEST_FILE))
+
+    @classmethod
+    def load(cls, job_dir: str) -> "BatchManifest":
+        with open(os.path.join(job_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            data = json.load(f)
+        data["documents"] = [BatchDocument(**doc) for doc in data["documents"]]
+        return cls(**data)
+
+
+def _backend(
+    provider: str, model: str, job_dir: str, backend: Optional[BatchBackend]
+) -> BatchBackend:
+    if backend is not None:
+        return backend
+    if provider == LocalBatchBackend.name:
+        return LocalBatchBackend(model, root=os.path.join(job_dir, "local"))
+    return get_batch_backend(provider, model)
+
+
+class _JobBuilder:
+    """Collects requests into jobs within the backend's count and size limits.
+
+    A job is submitted as soon as the next request would push it over a
+    limit, and the manifest is saved after every submission, so only one
+    job's requests are held in memory and a failure part way still records
+    the jobs submitted before it.
+    """
+
+    def __init__(self, backend: BatchBackend, manifest: BatchManifest, job_dir: str):
+        self.backend = backend
+        self.manifest = manifest
+        self.job_dir = job_dir
+        self.submitted = 0
+        self._requests: List[dict] = []
+        self._size = 0
+
+    def add(self, request: dict):
+        request_size = len(json.dumps(request)) + 1
+        if self._requests and (
+            len(self._requests) >= self.backend.max_requests
+            or self._size + request_size > self.backend.max_bytes
+        ):
+            self.flush()
+        self._requests.append(request)
+        self._size += request_size
+
+    def flush(self):
+        """Submit the requests collected so far as one job."""
+        if not self._requests:
+            return
+        self.manifest.jobs.append(self.backend.submit(self._requests))
+        self.manifest.save(self.job_dir)
+        self.submitted += len(self._requests)
+        self._requests, self._size = [], 0
+
+
+def submit_batch(
+    file_paths: List[str],
+    job_dir: str,
+    model: Optional[str] = None,
+    provider: str = "openai",
+    mode: str = "vision",
+    custom_system_prompt: Optional[str] = None,
+    select_pages: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    backend: Optional[BatchBackend] = None,
+    options: Optional[VisionOptions] = None,
+    **overrides: Any,
+) -> BatchManifest:
+    """Prepare every page of the given documents and submit them as batch jobs.
+
+    Pages are rendered and encoded exactly as in vision (or hybrid) mode and
+    submitted to the provider's batch API, a job at a time as each fills up
+    to the API's limits. The job IDs are saved to ``job_dir`` for
+    ``collect_batch`` after every submission; if preparation fails part way,
+    the pages of jobs that weren't submitted are reported as failed there.
+    Use ``provider="local"`` for a file-based stand-in that needs no API.
+    Rendering and encoding take the ``VisionOptions`` of the other modes;
+    options that only apply to live requests are ignored.
+    """
+    options = vision_options(options, **overrides)
+    if mode not in ("vision", "hybrid"):
+        raise ValueError(f"Unsupported batch mode: {mode}. Choose from: vision, hybrid")
+    if provider != LocalBatchBackend.name:
+        # Fail before anything is uploaded, as get_model() does for live calls
+        if provider not in PROVIDER_MODELS:
+            raise ValueError(f"Unsupported provider: {provider}")
+        model = model or PROVIDER_MODELS[provider]["default"]
+        if model not in PROVIDER_MODELS[provider]["options"]:
+            raise ValueError(f"Unsupported model for {provider}: {model}")
+    model = model or LocalBatchBackend.name
+    backend = _backend(provider, model, job_dir, backend)
+
+    manifest = BatchManifest(
+        provider=provider, model=model, mode=mode, created=time.time()
+    )
+    encoding = options.encode_config()
+
+    jobs = _JobBuilder(backend, manifest, job_dir)
+    for number, file_path in enumerate(file_paths):
+        handler = get_handler(file_path, options.render_config())
+        total_pages = handler.page_count
+        pages = (
+            parse_page_selection(select_pages, total_pages)
+            if select_pages and handler.is_multi_page
+            else []
+        ) or list(range(total_pages))
+
+        prompt = custom_system_prompt or VISION_PROMPT
+        references = {}
+        if mode == "hybrid":
+            fast_result = fast(file_path=file_path, select_pages=select_pages)
+            if fast_result.error:
+                raise Exception(f"Fast mode error: {fast_result.error}")
+            prompt, references, _ = reference_inputs(
+                fast_result.pages, custom_system_prompt, provider, model
+            )
+
+        output_file = None
+        if output_dir:
+            name = os.path.splitext(os.path.basename(file_path))[0]
+            output_file = os.path.join(output_dir, f"{number:05d}-{name}.md")
+        document = BatchDocument(
+            file_path=os.path.abspath(file_path), pages=pages, output_file=output_file
+        )
+        manifest.documents.append(document)
+
+        text_pages = (
+            text_layer_pages(file_path, pages)
+            if options.skip_blank_pages and handler.is_multi_page
+            else set()
+        )
+        page_filter = PageFilter()
+        for index, image in zip(pages, handler.iter_images(pages)):
+            prepared = prepare_page(
+                image,
+                prompt,
+                encoding,
+                skip_blank=options.skip_blank_pages,
+                dedupe=options.dedupe_pages,
+                cache_prompt=provider in PROMPT_CACHE_PROVIDERS,
+                reference=references.get(index + 1),
+                has_text=index in text_pages,
+            )
+            shortcut = page_filter(index, prepared)
+            if shortcut is not None:
+                document.shortcuts[str(index)] = {
+                    "skipped": shortcut.skipped,
+                    "duplicate_of": shortcut.duplicate_of,
+                }
+                continue
+            jobs.add(backend.build_request(f"{number}-{index}", prepared.messages))
+        logging.info(f"Prepared {len(pages)} pages of {file_path}")
+
+    jobs.flush()
+    manifest.save(job_dir)
+    logging.info(f"Submitted {jobs.submitted} requests in {len(manifest.jobs)} jobs")
+    return manifest
+
+
+def batch_status(job_dir: str, backend: Optional[BatchBackend] = None) -> Dict[str, str]:
+    """Return the status of each job recorded in ``job_dir``."""
+    manifest = BatchManifest.load(job_dir)
+    backend = _backend(manifest.provider, manifest.model, job_dir, backend)
+    return {job_id: backend.status(job_id) for job_id in manifest.jobs}
+
+
+def collect_batch(
+    job_dir: str,
+    wait: bool = False,
+    poll_interval: float = 60,
+    backend: Optional[BatchBackend] = None,
+) -> Optional[List[GPTParseOutput]]:
+    """Assemble one ``GPTParseOutput`` per document once all jobs have finished.
+
+    Returns None while jobs are still running, unless ``wait`` is set, in
+    which case the jobs are polled every ``poll_interval`` seconds. Pages
+    whose request failed are left empty, with the reason in ``Page.error``.
+    """
+    manifest = BatchManifest.load(job_dir)
+    backend = _backend(manifest.provider, manifest.model, job_dir, backend)
+
+    while True:
+        statuses = {job_id: backend.status(job_id) for job_id in manifest.jobs}
+        if "in_progress" not in statuses.values():
+            break
+        if not wait:
+            return None
+        time.sleep(poll_interval)
+
+    results = {}
+    for job_id, status in statuses.items():
+        if status == "failed":
+            # Its pages have no result and are reported as failed below
+            logging.error(f"Batch job {job_id} failed")
+            continue
+        results.update(backend.results(job_id))
+
+    completion_time = time.time() - manifest.created
+    outputs = []
+    for number, document in enumerate(manifest.documents):
+        assembler = PageAssembler(document.pages)
+        pages = []
+        for index in document.pages:
+            shortcut = document.shortcuts.get(str(index))
+            if shortcut is not None:
+                response = PageShortcut(**shortcut)
+            else:
+                result = results.get(f"{number}-{index}")
+                if result is None or result.error:
+                    response = PageFailure(result.error if result else "no result")
+                else:
+                    response = AIMessage(
+                        content=result.content,
+                        usage_metadata={
+                            "input_tokens": result.input_tokens,
+                            "output_tokens": result.output_tokens,
+                            "total_tokens": result.input_tokens + result.output_tokens,
+                            "input_token_details": {
+                                "cache_read": result.cached_input_tokens
+                            },
+                        },
+                    )
+            pages.extend(assembler.add(index, response))
+
+        output = GPTParseOutput(
+            file_path=document.file_path,
+            provider=manifest.provider,
+            model=manifest.model,
+            completion_time=completion_time,
+            input_tokens=sum(page.input_tokens for page in pages),
+            output_tokens=sum(page.output_tokens for page in pages),
+            cached_input_tokens=sum(page.cached_input_tokens for page in pages),
+            pages=pages,
+            error=failure_summary(pages),
+        )
+        if document.output_file:
+            os.makedirs(os.path.dirname(document.output_file) or ".", exist_ok=True)
+            write_markdown(output.pages, document.output_file)
+        outputs.append(output)
+    return outputs
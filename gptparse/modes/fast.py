@@ -1,9 +1,12 @@
+import asyncio
 import os
 import time
 import logging
-from typing import Optional
+from functools import partial
+from typing import Iterator, Optional
+import pymupdf
 import pymupdf4llm
-from ..outputs import GPTParseOutput, Page
+from ..outputs import GPTParseOutput, MarkdownWriter, Page
 from ..config import setup_logging
 import re
 
@@ -24,6 +27,46 @@ def clean_markdown_content(content: str) -> str:
     return content.strip()
 
 
+def iter_fast(
+    file_path: str,
+    select_pages: Optional[str] = None,
+) -> Iterator[Page]:
+    """Convert PDF to Markdown using pymupdf4llm, yielding one page at a time."""
+    # Parse page selection if provided
+    pages = None
+    if select_pages:
+        pages = []
+        for part in select_pages.split(","):
+            if "-" in part:
+                start, end = map(int, part.split("-"))
+                pages.extend(range(start - 1, end))
+            else:
+                pages.append(int(part) - 1)
+
+    with pymupdf.open(file_path) as doc:
+        if pages is None:
+            pages = list(range(doc.page_count))
+
+        # Header levels come from font sizes across the selected pages, so
+        # scan them once instead of per page
+        hdr_info = pymupdf4llm.IdentifyHeaders(doc, pages=pages)
+        for page_number in pages:
+            page_data = pymupdf4llm.to_markdown(
+                doc,
+                pages=[page_number],
+                hdr_info=hdr_info,
+                page_chunks=True,
+                show_progress=False,
+            )[0]
+            yield Page(
+                content=clean_markdown_content(page_data["text"]),
+                input_tokens=0,  # Not applicable for fast mode
+                output_tokens=0,  # Not applicable for fast mode
+                page=page_number + 1,
+                engine="fast",
+            )
+
+
 def fast(
     file_path: str,
     output_file: Optional[str] = None,
@@ -33,41 +76,21 @@ def fast(
     try:
         start_time = time.time()
 
-        # Parse page selection if provided
-        pages = None
-        if select_pages:
-            pages = []
-            for part in select_pages.split(","):
-                if "-" in part:
-                    start, end = map(int, part.split("-"))
-                    pages.extend(range(start - 1, end))
-                else:
-                    pages.append(int(part) - 1)
-
-        # Convert PDF to markdown
-        markdown_text = pymupdf4llm.to_markdown(
-            file_path, pages=pages, page_chunks=True
-        )
-
-        # Process results
+        # Write each page as soon as it is converted
         processed_pages = []
-        for idx, page_data in enumerate(markdown_text):
-            page_number = pages[idx] + 1 if pages else idx + 1
-            content = clean_markdown_content(page_data["text"])
-
-            # Create page object
-            processed_pages.append(
-                Page(
-                    content=content,
-                    input_tokens=0,  # Not applicable for fast mode
-                    output_tokens=0,  # Not applicable for fast mode
-                    page=page_number,
-                )
-            )
+        writer = MarkdownWriter(output_file) if output_file else None
+        try:
+            for page in iter_fast(file_path, select_pages=select_pages):
+                processed_pages.append(page)
+                if writer:
+                    writer.write(page)
+        finally:
+            if writer:
+                writer.close()
 
         completion_time = time.time() - start_time
 
-        result = GPTParseOutput(
+        return GPTParseOutput(
             file_path=os.path.abspath(file_path),
             provider="local",
             model="pymupdf4llm",
@@ -77,18 +100,6 @@ def fast(
             pages=processed_pages,
         )
 
-        if output_file:
-            with open(output_file, "w", encoding="utf-8") as f:
-                multiple_pages = len(result.pages) > 1
-                for page in result.pages:
-                    if multiple_pages:
-                        f.write(f"---Page {page.page} Start---\n\n")
-                    f.write(f"{page.content}\n\n")
-                    if multiple_pages:
-                        f.write(f"---Page {page.page} End---\n\n")
-
-        return result
-
     except Exception as e:
         logging.error(f"Error in fast mode: {str(e)}")
         return GPTParseOutput(
@@ -101,3 +112,15 @@ def fast(
             pages=[],
             error=str(e),
         )
+
+
+async def afast(
+    file_path: str,
+    output_file: Optional[str] = None,
+    select_pages: Optional[str] = None,
+) -> GPTParseOutput:
+    """Async counterpart of ``fast()``, run on the event loop's default executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, partial(fast, file_path, output_file=output_file, select_pages=select_pages)
+    )
@@ -1,13 +1,104 @@
 import logging
-from typing import Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from ..config import setup_logging
-from ..outputs import GPTParseOutput
-from .fast import fast
-from .vision import vision
+from ..outputs import GPTParseOutput, Page
+from .fast import afast, fast
+from .vision import (
+    VisionOptions,
+    avision,
+    iter_vision,
+    resolve_model,
+    supports_prediction,
+    vision,
+    vision_options,
+)
 
 setup_logging()
 
 
+HYBRID_PROMPT = (
+    "Convert the content of the image into markdown format, using the provided OCR text as a reference. It has been extracted using pymupdf. Consider that any text it extracted may be incomplete but the text it does extract is accurate. "
+    "You will not add any of your own commentary to your response. Consider the following:\n\n"
+    "- **Tables:** Verify and correct tables in markdown format. Ensure all columns and rows match the image exactly.\n"
+    "- **Lists:** Verify and correct markdown lists, maintaining the original structure (ordered or unordered).\n"
+    "- **Images:** If the image contains other images, verify their descriptions within `<image></image>` tags.\n\n"
+    "# Steps\n\n"
+    "1. **Compare OCR and Image:**\n"
+    "   - Review the provided OCR text against the image\n"
+    "   - Identify any discrepancies or errors\n"
+    "   - Pay special attention to numbers, special characters, and formatting\n\n"
+    "2. **Enhance and Correct:**\n"
+    "   - Fix any OCR errors found\n"
+    "   - Ensure proper markdown syntax\n"
+    "   - Maintain table structure and alignment\n"
+    "   - Preserve list formatting and hierarchy\n\n"
+    "3. **Verify Final Output:**\n"
+    "   - Ensure all content matches the image\n"
+    "   - Confirm proper markdown formatting\n"
+    "   - Check structural elements (tables, lists, etc.)\n"
+    "   - Use JSON instead of tables if the table columns are hard to format\n\n"
+    "The OCR text of the page follows the image."
+)
+
+
+def reference_inputs(
+    fast_pages: List[Page],
+    custom_system_prompt: Optional[str] = None,
+    provider: str = "openai",
+    model: Optional[str] = None,
+) -> Tuple[str, Dict[int, str], Optional[Dict[int, str]]]:
+    """Build the vision prompt and per-page references from fast mode output.
+
+    Returns the prompt, each page's fast mode text keyed by page number, and
+    the same text as each page's predicted output where the model supports
+    predictions (GPT-4o). Every request carries only its own page's text, so
+    input tokens grow linearly with the page count.
+    """
+    references = {page.page: page.content for page in fast_pages}
+    predictions = references if supports_prediction(provider, model) else None
+    return custom_system_prompt or HYBRID_PROMPT, references, predictions
+
+
+def iter_hybrid(
+    concurrency: int,
+    file_path: str,
+    model: Optional[str] = None,
+    custom_system_prompt: Optional[str] = None,
+    select_pages: Optional[str] = None,
+    provider: str = "openai",
+    ordered: bool = True,
+    options: Optional[VisionOptions] = None,
+    **overrides: Any,
+) -> Iterator[Page]:
+    """Like ``hybrid()``, but yields vision-enhanced pages as they complete.
+
+    Fast mode runs over the whole selection first, and each page's text is
+    sent with that page's image. Errors are raised rather than returned.
+    """
+    options = vision_options(options, **overrides)
+    fast_result = fast(file_path=file_path, select_pages=select_pages)
+    if fast_result.error:
+        raise Exception(f"Fast mode error: {fast_result.error}")
+
+    provider, model = resolve_model(provider, model)
+    prompt, references, predictions = reference_inputs(
+        fast_result.pages, custom_system_prompt, provider, model
+    )
+
+    yield from iter_vision(
+        concurrency=concurrency,
+        file_path=file_path,
+        model=model,
+        custom_system_prompt=prompt,
+        select_pages=select_pages,
+        provider=provider,
+        page_references=references,
+        page_predictions=predictions,
+        ordered=ordered,
+        options=options,
+    )
+
+
 def hybrid(
     concurrency: int,
     file_path: str,
@@ -16,8 +107,11 @@ def hybrid(
     custom_system_prompt: Optional[str] = None,
     select_pages: Optional[str] = None,
     provider: str = "openai",
+    options: Optional[VisionOptions] = None,
+    **overrides: Any,
 ) -> GPTParseOutput:
     """Convert PDF to Markdown using fast mode first, then vision mode for enhancement."""
+    options = vision_options(options, **overrides)
     try:
         # Step 1: Run fast mode
         fast_result = fast(
@@ -28,53 +122,83 @@ def hybrid(
         if fast_result.error:
             raise Exception(f"Fast mode error: {fast_result.error}")
 
-        # Step 2: Prepare enhanced system prompt with fast mode results
-        enhanced_prompt = custom_system_prompt or (
-            "Convert the content of the image into markdown format, using the provided OCR text as a reference. It has been extracted using pymupdf. Consider that any text it extracted may be incomplete but the text it does extract is accurate."
-            "You will not add any of your own commentary to your response. Consider the following:\n\n"
-            "- **Tables:** Verify and correct tables in markdown format. Ensure all columns and rows match the image exactly.\n"
-            "- **Lists:** Verify and correct markdown lists, maintaining the original structure (ordered or unordered).\n"
-            "- **Images:** If the image contains other images, verify their descriptions within `<image></image>` tags.\n\n"
-            "# Steps\n\n"
-            "1. **Compare OCR and Image:**\n"
-            "   - Review the provided OCR text against the image\n"
-            "   - Identify any discrepancies or errors\n"
-            "   - Pay special attention to numbers, special characters, and formatting\n\n"
-            "2. **Enhance and Correct:**\n"
-            "   - Fix any OCR errors found\n"
-            "   - Ensure proper markdown syntax\n"
-            "   - Maintain table structure and alignment\n"
-            "   - Preserve list formatting and hierarchy\n\n"
-            "3. **Verify Final Output:**\n"
-            "   - Ensure all content matches the image\n"
-            "   - Confirm proper markdown formatting\n"
-            "   - Check structural elements (tables, lists, etc.)\n\n"
-            "   - Use JSON instead of tables if the table columns are hard to format"
-            "# Reference OCR Text\n\n"
+        # Steps 2-3: Send each page's fast mode text as its reference and
+        # prediction
+        provider, model = resolve_model(provider, model)
+        prompt, references, predictions = reference_inputs(
+            fast_result.pages, custom_system_prompt, provider, model
         )
 
-        # Add OCR text to prompt for each page
-        for page in fast_result.pages:
-            enhanced_prompt += f"\n---Page {page.page}---\n{page.content}\n"
+        vision_result = vision(
+            concurrency=concurrency,
+            file_path=file_path,
+            model=model,
+            output_file=output_file,
+            custom_system_prompt=prompt,
+            select_pages=select_pages,
+            provider=provider,
+            page_references=references,
+            page_predictions=predictions,
+            options=options,
+        )
 
-        # Step 3: Run vision mode with enhanced prompt and prediction if using GPT-4o
-        prediction = None
-        if provider == "openai" and model and model.startswith("gpt-4o"):
-            # Use the fast mode results as prediction for GPT-4o
-            prediction = {
-                "type": "content",
-                "content": "\n".join(page.content for page in fast_result.pages),
-            }
+        return vision_result
 
-        vision_result = vision(
+    except Exception as e:
+        logging.error(f"Error in hybrid mode: {str(e)}")
+        return GPTParseOutput(
+            file_path=file_path,
+            provider=provider,
+            model=model,
+            completion_time=0,
+            input_tokens=0,
+            output_tokens=0,
+            pages=[],
+            error=str(e),
+        )
+
+
+async def ahybrid(
+    concurrency: int,
+    file_path: str,
+    model: Optional[str] = None,
+    output_file: Optional[str] = None,
+    custom_system_prompt: Optional[str] = None,
+    select_pages: Optional[str] = None,
+    provider: str = "openai",
+    options: Optional[VisionOptions] = None,
+    **overrides: Any,
+) -> GPTParseOutput:
+    """Async counterpart of ``hybrid()``."""
+    options = vision_options(options, **overrides)
+    try:
+        # Step 1: Run fast mode
+        fast_result = await afast(
+            file_path=file_path,
+            select_pages=select_pages,
+        )
+
+        if fast_result.error:
+            raise Exception(f"Fast mode error: {fast_result.error}")
+
+        # Steps 2-3: Send each page's fast mode text as its reference and
+        # prediction
+        provider, model = resolve_model(provider, model)
+        prompt, references, predictions = reference_inputs(
+            fast_result.pages, custom_system_prompt, provider, model
+        )
+
+        vision_result = await avision(
             concurrency=concurrency,
             file_path=file_path,
             model=model,
             output_file=output_file,
-            custom_system_prompt=enhanced_prompt,
+            custom_system_prompt=prompt,
             select_pages=select_pages,
             provider=provider,
-            prediction=prediction,  # Pass prediction to vision mode
+            page_references=references,
+            page_predictions=predictions,
+            options=options,
         )
 
         return vision_result
@@ -1,29 +1,106 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import os
-import io
+import random
 import time
-import base64
 import json
 import re
 import logging
 import warnings
-from typing import Optional, List
-from tqdm import tqdm
+from collections import deque
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    TimeoutError as FutureTimeoutError,
+    as_completed,
+)
+from dataclasses import dataclass, field, replace
+from typing import (
+    AsyncIterator,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 from PIL import Image
-from pdf2image import convert_from_bytes
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
+from functools import partial
 from ..config import get_config, setup_logging
-from ..outputs import GPTParseOutput, Page
-from ..models import model_interface
+from ..outputs import GPTParseOutput, MarkdownWriter, Page
 from ..utils.callbacks import BatchCallback
-from ..utils.image_utils import resize_image
-from ..utils.pdf_utils import split_pdf_into_chunks
+from ..utils.image_utils import (
+    EncodeConfig,
+    PageFingerprint,
+    encode_image,
+    is_blank,
+    page_fingerprint,
+    resize_image,
+    MAX_IMAGE_SIZE,
+)
+from ..utils.cache import CachedResponse, ResponseCache, make_key
+from ..utils.journal import PageJournal
+from ..utils.parallel import process_context
+from ..utils.pdf_utils import profile_pages, text_layer_pages
+from ..utils.pipeline import PagePipeline
+from ..utils.ratelimit import (
+    estimate_image_tokens,
+    is_rate_limit_error,
+    retry_after,
+)
 from ..models.model_interface import PROVIDER_MODELS
-from ..handlers import get_handler
+from ..models.router import (
+    ROUTER_PROVIDER,
+    ModelRouter,
+    RouteTarget,
+    format_targets,
+    get_router,
+    is_failover_error,
+    parse_targets,
+)
+from ..handlers import get_handler, RenderConfig
+from ..handlers.base import FileHandler
 
 setup_logging()
 
+# Attempts per page when the provider keeps answering with rate limit errors
+MAX_RATE_LIMIT_RETRIES = 6
+
+# Base delay before retrying a failed page request, doubled per failure
+RETRY_BACKOFF_SECONDS = 1.0
+
+# Providers that only cache a prompt prefix marked with a cache_control
+# breakpoint; OpenAI and Gemini cache repeated prefixes automatically
+PROMPT_CACHE_PROVIDERS = {"anthropic"}
+
+# Latencies a run must have seen before it starts hedging slow requests
+HEDGE_MIN_SAMPLES = 5
+
+# Heads a page's reference text (e.g. from fast mode) in the user message
+REFERENCE_HEADER = "# Reference OCR Text\n\n"
+
+# Limits for packing several pages into one request: estimated image tokens,
+# and expected output, which must fit within the models' 4096 max_tokens
+PACK_MAX_IMAGE_TOKENS = 16000
+PACK_MAX_OUTPUT_TOKENS = 3000
+
+# Marks where each page of a packed request starts, in the request and response
+PAGE_MARKER = "<<<PAGE {}>>>"
+PAGE_MARKER_PATTERN = re.compile(r"^[ \t]*<<<PAGE (\d+)>>>[ \t]*$", re.MULTILINE)
+PACK_INSTRUCTIONS = (
+    "The following {count} images are separate pages, each preceded by a marker "
+    "line such as `<<<PAGE 1>>>`. Convert every page on its own, following the "
+    "instructions above, and start the output for each page with its marker "
+    "line, exactly as given, on a line of its own."
+)
+
+VISION_PROMPT = "Convert the content of the image into markdown format, ensuring the appropriate structure for various components including tables, lists, and other images. You will not add any of your own commentary to your response. Consider the following:\n\n- **Tables:** If the image contains tables, convert them into markdown tables. Ensure that all columns and rows from the table are accurately captured. Do not convert tables into JSON unless every column and row, with all data, can be properly represented.\n- **Lists:** If the image contains lists, convert them into markdown lists.\n- **Images:** If the image contains other images, summarize each image into text and wrap it with `<image></image>` tags.\n\n# Steps\n\n1. **Image Analysis:** Identify the various elements in the image such as tables, lists, and other images.\n   \n2. **Markdown Conversion:**\n   - For tables, use the markdown format for tables. Make sure all columns and rows are preserved, including headers and any blank cells.\n   - For lists, use markdown list conventions (ordered or unordered as per the original).\n   - For images, write a brief descriptive summary of the image content and wrap it using `<image></image>` tags.\n\n3. **Compile:** Assemble all converted elements into cohesive markdown-formatted text.\n\n# Output Format\n\n- The output should be in markdown format, accurately representing each element from the image with appropriate markdown syntax. Pay close attention to the structure of tables, ensuring that no columns or rows are omitted.\n\n# Examples\n\n**Input Example 1:**\n\nAn image containing a table with five columns and three rows, a list, and another image.\n\n**Output Example 1:**\n\n```\n| Column 1 | Column 2 | Column 3 | Column 4 | Column 5 |\n| -------- | -------- | -------- | -------- | -------- |\n| Row 1    | Data 2   | Data 3   | Data 4   | Data 5   |\n| Row 2    | Data 2   | Data 3   | Data 4   |          |\n| Row 3    | Data 2   |          | Data 4   | Data 5   |\n\n- List Item 1\n- List Item 2\n- List Item 3\n\n<image></image>\nImage description with as much detail as possible here.\n</image>\n```\n\n# Notes\n\n- Ensure that the markdown syntax is correct and renders well when processed.\n- Preserve column and row structure for tables, ensuring no data is lost or misrepresented.\n- Be attentive to the layout and order of elements as they appear in the image."
+
 
 def parse_page_selection(select_pages: str, total_pages: int) -> List[int]:
     if not select_pages:
@@ -35,184 +112,1715 @@ def parse_page_selection(select_pages: str, total_pages: int) -> List[int]:
             pages.extend(range(start, end + 1))
         else:
             pages.append(int(part))
-    return [p - 1 for p in pages if p < total_pages]
+    return [p - 1 for p in pages if 0 < p <= total_pages]
 
 
-def vision(
-    concurrency: int,
+def supports_prediction(provider: str, model: Optional[str]) -> bool:
+    """Return True for models that accept a predicted output (GPT-4o).
+
+    For the router provider, True if any of its targets does.
+    """
+    if provider == ROUTER_PROVIDER:
+        return any(
+            supports_prediction(target_provider, target_model)
+            for target_provider, target_model, _ in parse_targets(model)
+        )
+    return provider == "openai" and bool(model) and model.startswith("gpt-4o")
+
+
+def caches_prompt(provider: str, model: Optional[str]) -> bool:
+    """Return True if requests should mark the prompt as a cache breakpoint.
+
+    For the router provider, True if any of its targets needs the breakpoint;
+    it is removed again for the others, see ``target_messages()``.
+    """
+    if provider == ROUTER_PROVIDER:
+        return any(
+            target_provider in PROMPT_CACHE_PROVIDERS
+            for target_provider, _, _ in parse_targets(model)
+        )
+    return provider in PROMPT_CACHE_PROVIDERS
+
+
+def prompt_message(prompt: str, cache_prompt: bool = False) -> SystemMessage:
+    """Build the system message holding the conversion prompt.
+
+    The prompt is the same for every page, so sending it as a leading system
+    message lets providers serve it from their prompt cache. ``cache_prompt``
+    marks it as a cache breakpoint, for providers in PROMPT_CACHE_PROVIDERS.
+    """
+    if not cache_prompt:
+        return SystemMessage(content=prompt)
+    return SystemMessage(
+        content=[
+            {"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}
+        ]
+    )
+
+
+def target_messages(messages: List[BaseMessage], provider: str) -> List[BaseMessage]:
+    """Adapt prepared messages to the provider they are sent to.
+
+    Providers outside PROMPT_CACHE_PROVIDERS get the prompt without its
+    cache_control breakpoint, which they don't accept.
+    """
+    system = messages[0]
+    if provider in PROMPT_CACHE_PROVIDERS or isinstance(system.content, str):
+        return messages
+    return [prompt_message(system.content[0]["text"]), *messages[1:]]
+
+
+def prepare_messages(
+    image: Image.Image,
+    prompt: str = VISION_PROMPT,
+    encoding: Optional[EncodeConfig] = None,
+    cache_prompt: bool = False,
+    reference: Optional[str] = None,
+) -> List[BaseMessage]:
+    """Resize and encode a page image into the messages sent to the model.
+
+    ``reference`` is text already known for this page, such as its fast mode
+    output, sent after the image for the model to check and correct.
+    """
+    # Resize the image; a no-op for pages rendered at MAX_IMAGE_SIZE
+    resized_image = resize_image(image, max_size=MAX_IMAGE_SIZE)
+    encoded_image, media_type = encode_image(resized_image, encoding)
+
+    content = [
+        {
+            "type": "image_url",
+            "image_url": {"url": f"data:{media_type};base64,{encoded_image}"},
+        },
+    ]
+    if reference is not None:
+        content.append({"type": "text", "text": REFERENCE_HEADER + reference})
+    return [prompt_message(prompt, cache_prompt), HumanMessage(content=content)]
+
+
+@dataclass
+class PreparedPage:
+    """A page ready to be sent to the model, plus cheap content checks."""
+
+    messages: Optional[List[BaseMessage]]  # None for blank pages
+    blank: bool = False
+    fingerprint: Optional[PageFingerprint] = None
+    cache_key: Optional[str] = None  # set once the response cache is consulted
+    image_size: Optional[Tuple[int, int]] = None  # for token estimates
+    prompt_chars: int = 0
+    prediction: Optional[dict] = None  # predicted output, for supporting models
+    hedges: int = 0  # duplicate requests sent for this request so far
+
+
+@dataclass
+class PageFailure:
+    """Stands in for a model response for a page whose request kept failing."""
+
+    error: str
+    input_tokens: int = 0  # spent on responses that were discarded
+    output_tokens: int = 0
+
+
+@dataclass
+class PageShortcut:
+    """Stands in for a model response for pages that are never sent."""
+
+    skipped: bool = False
+    duplicate_of: Optional[int] = None  # 0-based index of the original page
+    cached: Optional[CachedResponse] = None  # response found in the cache
+
+
+def prepare_page(
+    image: Image.Image,
+    prompt: str = VISION_PROMPT,
+    encoding: Optional[EncodeConfig] = None,
+    skip_blank: bool = True,
+    dedupe: bool = False,
+    cache_prompt: bool = False,
+    reference: Optional[str] = None,
+    prediction: Optional[dict] = None,
+    has_text: bool = False,
+) -> PreparedPage:
+    """Run blank/duplicate checks on a page and encode it unless it is blank.
+
+    Pages known to have a text layer (``has_text``) are never skipped.
+    """
+    resized_image = resize_image(image, max_size=MAX_IMAGE_SIZE)
+    if skip_blank and not has_text and is_blank(resized_image):
+        return PreparedPage(messages=None, blank=True)
+
+    return PreparedPage(
+        messages=prepare_messages(
+            resized_image, prompt, encoding, cache_prompt, reference
+        ),
+        fingerprint=page_fingerprint(resized_image) if dedupe else None,
+        image_size=resized_image.size,
+        prompt_chars=len(prompt) + len(reference or ""),
+        prediction=prediction,
+    )
+
+
+def prepare_page_input(
+    prepare: Callable[..., PreparedPage],
+    page_input: Tuple[Image.Image, Optional[str], Optional[dict], bool],
+) -> PreparedPage:
+    """Run ``prepare`` on an ``(image, reference, prediction, has_text)`` input."""
+    image, reference, prediction, has_text = page_input
+    return prepare(
+        image, reference=reference, prediction=prediction, has_text=has_text
+    )
+
+
+def pack_pages(pages: List[PreparedPage]) -> PreparedPage:
+    """Combine prepared pages into one request, each introduced by its marker.
+
+    The pages share the first page's system prompt. A prediction is only kept
+    when every page has one, joined in the marked format of the response.
+    """
+    content = [{"type": "text", "text": PACK_INSTRUCTIONS.format(count=len(pages))}]
+    for position, page in enumerate(pages, 1):
+        content.append({"type": "text", "text": PAGE_MARKER.format(position)})
+        content.extend(page.messages[-1].content)
+
+    prediction = None
+    if all(page.prediction for page in pages):
+        prediction = {
+            "type": "content",
+            "content": "\n\n".join(
+                f"{PAGE_MARKER.format(position)}\n{page.prediction['content']}"
+                for position, page in enumerate(pages, 1)
+            ),
+        }
+    return PreparedPage(
+        messages=[pages[0].messages[0], HumanMessage(content=content)],
+        prompt_chars=sum(page.prompt_chars for page in pages),
+        prediction=prediction,
+    )
+
+
+def _shares(total: int, count: int) -> List[int]:
+    """Split ``total`` into ``count`` near-equal integer parts."""
+    return [total // count + (position < total % count) for position in range(count)]
+
+
+def split_packed_response(
+    response: BaseMessage, count: int
+) -> Optional[List[AIMessage]]:
+    """Split a packed response into one response per page at its markers.
+
+    Token usage is divided evenly between the pages. Returns None unless the
+    markers for pages 1 to ``count`` all appear, in order.
+    """
+    content = response.content if isinstance(response.content, str) else ""
+    markers = list(PAGE_MARKER_PATTERN.finditer(content))
+    if [int(marker.group(1)) for marker in markers] != list(range(1, count + 1)):
+        return None
+
+    return [
+        AIMessage(
+            content=content[marker.end() : end].strip(),
+            usage_metadata=share.usage_metadata,
+            response_metadata=share.response_metadata,
+        )
+        for share, marker, end in zip(
+            split_usage(response, count),
+            markers,
+            [marker.start() for marker in markers[1:]] + [len(content)],
+        )
+    ]
+
+
+def split_usage(response: BaseMessage, count: int) -> List[AIMessage]:
+    """Divide a response's token usage evenly into ``count`` empty responses."""
+    usage = response.usage_metadata or {}
+    accepted, rejected = prediction_tokens(response)
+    shares = {
+        name: _shares(value, count)
+        for name, value in (
+            ("input_tokens", usage.get("input_tokens", 0)),
+            ("output_tokens", usage.get("output_tokens", 0)),
+            ("cache_read", cached_input_tokens(response)),
+            ("accepted", accepted),
+            ("rejected", rejected),
+            ("hedges", (response.response_metadata or {}).get("hedges", 0)),
+        )
+    }
+
+    responses = []
+    for position in range(count):
+        input_tokens = shares["input_tokens"][position]
+        output_tokens = shares["output_tokens"][position]
+        responses.append(
+            AIMessage(
+                content="",
+                usage_metadata={
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "total_tokens": input_tokens + output_tokens,
+                    "input_token_details": {
+                        "cache_read": shares["cache_read"][position]
+                    },
+                },
+                response_metadata={
+                    "token_usage": {
+                        "completion_tokens_details": {
+                            "accepted_prediction_tokens": shares["accepted"][position],
+                            "rejected_prediction_tokens": shares["rejected"][position],
+                        }
+                    },
+                    "served_by": (response.response_metadata or {}).get("served_by"),
+                    "hedges": shares["hedges"][position],
+                },
+            )
+        )
+    return responses
+
+
+def add_spent_usage(
+    result: Union[BaseMessage, PageFailure], spent: BaseMessage
+) -> Union[BaseMessage, PageFailure]:
+    """Charge the tokens of a discarded response ``spent`` to a page's result."""
+    usage = spent.usage_metadata or {}
+    input_tokens = usage.get("input_tokens", 0)
+    output_tokens = usage.get("output_tokens", 0)
+    if isinstance(result, PageFailure):
+        return replace(
+            result,
+            input_tokens=result.input_tokens + input_tokens,
+            output_tokens=result.output_tokens + output_tokens,
+        )
+
+    total = dict(result.usage_metadata or {})
+    total["input_tokens"] = total.get("input_tokens", 0) + input_tokens
+    total["output_tokens"] = total.get("output_tokens", 0) + output_tokens
+    total["total_tokens"] = total["input_tokens"] + total["output_tokens"]
+    total["input_token_details"] = {
+        "cache_read": cached_input_tokens(result) + cached_input_tokens(spent)
+    }
+    return result.model_copy(update={"usage_metadata": total})
+
+
+def response_cache_key(
+    messages: List[BaseMessage], namespace: str, prediction: Optional[dict] = None
+) -> str:
+    """Hash a request's messages (prompt and encoded image) with model settings.
+
+    The page's predicted output is sent alongside the messages, so it is part
+    of the key too.
+    """
+    return make_key(
+        namespace,
+        json.dumps([message.content for message in messages], sort_keys=True),
+        json.dumps(prediction, sort_keys=True),
+    )
+
+
+class PageFilter:
+    """Decides, before dispatch, which pages don't need a model call.
+
+    Blank pages are skipped, pages matching the fingerprint of an earlier
+    dispatched page reuse that page's output, and pages whose request is in
+    the response cache reuse the cached response. Pages must be fed in
+    dispatch order, as the pipeline's lookup hook does: the first copy fed
+    is the one sent. That is document order unless pages are reordered by
+    ``longest_first``, where ``duplicate_of`` can name a later page.
+    """
+
+    def __init__(
+        self,
+        callback: Optional[BatchCallback] = None,
+        response_cache: Optional[ResponseCache] = None,
+        cache_namespace: str = "",
+    ):
+        self.callback = callback
+        self.response_cache = response_cache
+        self.cache_namespace = cache_namespace
+        self._originals: List[Tuple[int, PageFingerprint]] = []
+
+    def __call__(self, index: int, prepared: PreparedPage) -> Optional[PageShortcut]:
+        shortcut = None
+        if prepared.blank:
+            shortcut = PageShortcut(skipped=True)
+        elif prepared.fingerprint is not None:
+            for original, fingerprint in self._originals:
+                if fingerprint.matches(prepared.fingerprint):
+                    shortcut = PageShortcut(duplicate_of=original)
+                    break
+            else:
+                self._originals.append((index, prepared.fingerprint))
+
+        if shortcut is None and self.response_cache is not None:
+            prepared.cache_key = response_cache_key(
+                prepared.messages, self.cache_namespace, prepared.prediction
+            )
+            cached = self.response_cache.get(prepared.cache_key)
+            if cached is not None:
+                shortcut = PageShortcut(cached=cached)
+
+        if shortcut is not None and self.callback:
+            self.callback.advance()
+        return shortcut
+
+
+def cached_input_tokens(response: BaseMessage) -> int:
+    """Return the input tokens a response read from the provider's prompt cache."""
+    details = (response.usage_metadata or {}).get("input_token_details") or {}
+    if details.get("cache_read") is not None:
+        return details["cache_read"]
+    # Older Anthropic integrations only report it in the raw usage
+    usage = (response.response_metadata or {}).get("usage") or {}
+    return usage.get("cache_read_input_tokens") or 0
+
+
+def prediction_tokens(response: BaseMessage) -> Tuple[int, int]:
+    """Return the (accepted, rejected) predicted output tokens of a response."""
+    usage = (response.response_metadata or {}).get("token_usage") or {}
+    details = usage.get("completion_tokens_details") or {}
+    return (
+        details.get("accepted_prediction_tokens") or 0,
+        details.get("rejected_prediction_tokens") or 0,
+    )
+
+
+def is_authentication_error(error: Exception) -> bool:
+    """Return True for invalid API key errors, which retrying cannot fix."""
+    error_msg = str(error).lower()
+    return any(
+        keyword in error_msg
+        for keyword in [
+            "authentication_error",
+            "invalid_api_key",
+            "api key not valid",
+        ]
+    )
+
+
+def raise_for_authentication_error(error: Exception, provider: str):
+    """Re-raise provider authentication failures as a readable ValueError."""
+    error_msg = str(error)
+    if is_authentication_error(error):
+        if provider == "openai":
+            error_dict = json.loads(error_msg.split(" - ", 1)[1])
+            error_message = error_dict["error"]["message"]
+        elif provider == "google":
+            error_message = re.search(
+                r"Invalid argument provided to Gemini: (.+)", error_msg
+            ).group(1)
+        else:  # For other providers like Anthropic
+            error_dict = json.loads(error_msg.split(" - ", 1)[1])
+            error_message = error_dict["error"]["message"]
+        raise ValueError(f"Authentication error for {provider}: {error_message}")
+
+
+def failure_summary(pages: List[Page]) -> Optional[str]:
+    """Return an error for the whole output when no page could be converted."""
+    failed = [page for page in pages if page.error]
+    if failed and all(page.error or page.skipped for page in pages):
+        return f"All {len(failed)} pages failed: {failed[0].error}"
+    return None
+
+
+def resolve_model(provider: Optional[str], model: Optional[str]) -> Tuple[str, str]:
+    """Fill in the provider and model from the config and provider defaults.
+
+    For the router provider the model is its list of targets, normalized by
+    ``parse_targets()``.
+    """
+    config = get_config()
+    provider = provider or config.get("provider", "openai")
+    if provider == ROUTER_PROVIDER:
+        if not model and config.get("provider") == ROUTER_PROVIDER:
+            model = config.get("model")
+        return provider, format_targets(parse_targets(model))
+    model = model or config.get("model") or PROVIDER_MODELS[provider]["default"]
+    return provider, model
+
+
+@dataclass
+class VisionOptions:
+    """Rendering, encoding and request options shared by the vision-based modes"""
+
+    render_workers: Optional[int] = None  # None uses one worker per CPU core
+    render_executor: str = "thread"  # thread, or process for a shared process pool
+    rasterizer: str = "auto"  # auto, pymupdf or pdf2image
+    cache_dir: Optional[str] = None  # page image and response cache; None disables it
+    queue_depth: Optional[int] = None  # prepared pages waiting for a model slot
+    encode_workers: Optional[int] = None  # None uses one worker per CPU core
+    encode_executor: str = "thread"  # thread or process
+    image_format: str = "png"  # png, jpeg or webp
+    image_quality: int = 85  # used by lossy formats
+    grayscale: str = "auto"  # auto, always or never
+    max_image_bytes: Optional[int] = None  # per-page budget for the encoded image
+    skip_blank_pages: bool = True
+    dedupe_pages: bool = False
+    response_cache: bool = True  # reuse responses for identical requests
+    requests_per_minute: Optional[int] = None  # None learns it from the provider
+    tokens_per_minute: Optional[int] = None  # None learns it from the provider
+    page_retries: int = 2  # extra attempts for pages whose request fails
+    fail_fast: bool = False  # raise the first page failure instead
+    resume: bool = False  # reuse pages journaled by an interrupted run
+    journal_dir: Optional[str] = None  # journal the run here even without resume
+    pages_per_request: int = 1  # pack up to this many pages into one request
+    hedge_percentile: Optional[float] = None  # hedge calls slower than this
+    hedge_model: Optional[str] = None  # provider[/model] that hedges go to
+    longest_first: bool = False  # dispatch the most expensive pages first
+
+    def render_config(self, concurrency: Optional[int] = None) -> RenderConfig:
+        """Render pages directly at the size the model receives.
+
+        With ``concurrency``, rendering runs no further ahead of the pipeline
+        than its queue of prepared pages.
+        """
+        return RenderConfig(
+            workers=self.render_workers,
+            executor=self.render_executor,
+            rasterizer=self.rasterizer,
+            max_size=MAX_IMAGE_SIZE,
+            cache_dir=self.cache_dir,
+            render_ahead=self.queue_depth or concurrency,
+        )
+
+    def encode_config(self) -> EncodeConfig:
+        return EncodeConfig(
+            format=self.image_format,
+            quality=self.image_quality,
+            grayscale=self.grayscale,
+            max_bytes=self.max_image_bytes,
+        )
+
+
+def vision_options(
+    options: Optional[VisionOptions] = None, **overrides
+) -> VisionOptions:
+    """Return ``options`` (or the defaults) with the given fields replaced.
+
+    Lets the entry points accept options as keyword arguments too; unknown
+    names raise a TypeError.
+    """
+    return replace(options or VisionOptions(), **overrides)
+
+
+@dataclass
+class VisionRun:
+    """Per-document state shared by the sync and async vision pipelines."""
+
+    handler: FileHandler
+    pages: List[int]  # 0-based pages to convert, in document order
+    provider: str
+    model: str
+    router: ModelRouter  # the provider/model targets requests are sent to
+    run_config: RunnableConfig
+    prepare: Callable[[Image.Image], PreparedPage]
+    page_filter: PageFilter
+    response_cache: Optional[ResponseCache] = None
+    callback: Optional[BatchCallback] = None
+    page_retries: int = 2  # extra attempts for pages whose request fails
+    fail_fast: bool = False  # raise the first page failure instead
+    journal: Optional[PageJournal] = None
+    completed: Dict[int, Page] = field(default_factory=dict)  # resumed pages
+    references: Dict[int, str] = field(default_factory=dict)  # by 0-based page
+    predictions: Dict[int, dict] = field(default_factory=dict)  # by 0-based page
+    pages_per_request: int = 1  # pack up to this many pages into one request
+    hedge_percentile: Optional[float] = None  # hedge calls slower than this
+    hedge_target: Optional[RouteTarget] = None  # where hedges go, if not routed
+    hedge_pool: Optional[ThreadPoolExecutor] = None  # runs hedged sync calls
+    latencies: List[float] = field(default_factory=list)  # of successful calls
+    costs: Dict[int, float] = field(default_factory=dict)  # to dispatch by
+    text_pages: Set[int] = field(default_factory=set)  # never skipped as blank
+
+    def page_input(
+        self, index: int, image: Image.Image
+    ) -> Tuple[Image.Image, Optional[str], Optional[dict], bool]:
+        """Pair a rendered page with its reference, prediction and text flag."""
+        return (
+            image,
+            self.references.get(index),
+            self.predictions.get(index),
+            index in self.text_pages,
+        )
+
+    @property
+    def pending(self) -> List[int]:
+        """Pages still to convert, in the order to dispatch them.
+
+        Pages resumed from the journal are excluded. With expected ``costs``
+        the most expensive pages go first, so that a slow page started last
+        doesn't hold up the end of the run; ties keep document order.
+        """
+        pending = [index for index in self.pages if index not in self.completed]
+        if self.costs:
+            pending.sort(key=lambda index: -self.costs.get(index, 0.0))
+        return pending
+
+    def estimate_tokens(self, page: PreparedPage) -> int:
+        """Estimate the tokens a request will use, for the TPM budget."""
+        target = self.router.primary
+        input_tokens = page.prompt_chars // 4
+        if page.image_size:
+            input_tokens += estimate_image_tokens(*page.image_size, target.provider)
+        return target.rate_limiter.estimate(input_tokens)
+
+    def fits(self, group: List[PreparedPage], page: PreparedPage) -> bool:
+        """Return True if ``page`` can join ``group`` in one packed request.
+
+        Packs are bounded by ``pages_per_request``, by their estimated image
+        tokens and by the output expected for them, which must fit within the
+        models' output limit.
+        """
+        if not group:
+            return True
+        if len(group) >= self.pages_per_request:
+            return False
+        pages = group + [page]
+        target = self.router.primary
+        image_tokens = sum(
+            estimate_image_tokens(*member.image_size, target.provider)
+            for member in pages
+            if member.image_size
+        )
+        output_tokens = target.rate_limiter.output_tokens * len(pages)
+        return (
+            image_tokens <= PACK_MAX_IMAGE_TOKENS
+            and output_tokens <= PACK_MAX_OUTPUT_TOKENS
+        )
+
+    def _finish(
+        self,
+        target: RouteTarget,
+        page: PreparedPage,
+        estimated: int,
+        response: BaseMessage,
+        pages: int = 1,
+    ):
+        usage = response.usage_metadata or {}
+        target.rate_limiter.release(
+            estimated,
+            used=usage.get("total_tokens"),
+            headers=(response.response_metadata or {}).get("headers"),
+        )
+        if "output_tokens" in usage:
+            target.rate_limiter.record_output(usage["output_tokens"] / pages)
+        # Become Page.served_by and Page.hedges
+        response.response_metadata["served_by"] = target.name
+        response.response_metadata["hedges"] = page.hedges
+        self.remember(page, response)
+
+    @staticmethod
+    def _call_options(page: PreparedPage, target: RouteTarget) -> dict:
+        if page.prediction and supports_prediction(target.provider, target.model):
+            return {"prediction": page.prediction}
+        return {}
+
+    def _fail_over(
+        self,
+        error: Exception,
+        target: RouteTarget,
+        estimated: int,
+        tried: List[RouteTarget],
+    ) -> bool:
+        """Record a failed call and move it to another target if one is left.
+
+        Only rate limit, server and connection errors fail over, each time to
+        a target not yet tried; other errors are retried as usual.
+        """
+        self.router.record(target, error=error)
+        if not is_failover_error(error) or len(tried) + 1 >= len(self.router.targets):
+            return False
+        target.rate_limiter.release(
+            estimated,
+            rate_limited=is_rate_limit_error(error),
+            retry_after=retry_after(error),
+            failed=True,
+        )
+        tried.append(target)
+        logging.warning(f"Request to {target.name} failed, failing over: {error}")
+        return True
+
+    def _retry_delay(
+        self,
+        error: Exception,
+        target: RouteTarget,
+        estimated: int,
+        attempt: int,
+        failures: int,
+    ) -> Optional[float]:
+        """Release the call's rate limit slot and decide whether to retry.
+
+        Returns the seconds to wait before the next attempt, or None to give
+        up on the page. Rate limit errors are paced by the limiter and do not
+        count as failures.
+        """
+        if is_rate_limit_error(error) and attempt < MAX_RATE_LIMIT_RETRIES:
+            target.rate_limiter.release(
+                estimated, rate_limited=True, retry_after=retry_after(error)
+            )
+            logging.warning(f"Rate limited by {target.name}, slowing down: {error}")
+            return 0.0
+
+        target.rate_limiter.release(estimated, failed=True)
+        if (
+            self.fail_fast
+            or is_authentication_error(error)
+            or is_rate_limit_error(error)
+            or failures > self.page_retries
+        ):
+            return None
+        delay = RETRY_BACKOFF_SECONDS * 2 ** (failures - 1) * (0.5 + random.random())
+        logging.warning(f"Page request failed, retrying in {delay:.1f}s: {error}")
+        return delay
+
+    def _give_up(self, error: Exception) -> PageFailure:
+        if self.fail_fast or is_authentication_error(error):
+            raise error
+        logging.error(f"Page request failed after retries: {error}")
+        return PageFailure(error=str(error))
+
+    def _advance(self, pages: int = 1):
+        if self.callback:
+            self.callback.advance(pages)
+
+    def _invoke(self, target: RouteTarget, page: PreparedPage) -> BaseMessage:
+        return target.ai_model.invoke(
+            target_messages(page.messages, target.provider),
+            config=self.run_config,
+            **self._call_options(page, target),
+        )
+
+    async def _ainvoke(self, target: RouteTarget, page: PreparedPage) -> BaseMessage:
+        return await target.ai_model.ainvoke(
+            target_messages(page.messages, target.provider),
+            config=self.run_config,
+            **self._call_options(page, target),
+        )
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Seconds after which a call is hedged, or None not to hedge.
+
+        This is the ``hedge_percentile`` of the call latencies seen so far in
+        the run, once there are at least HEDGE_MIN_SAMPLES of them.
+        """
+        if self.hedge_percentile is None or len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self.latencies)
+        position = round(self.hedge_percentile / 100 * (len(latencies) - 1))
+        return latencies[min(max(position, 0), len(latencies) - 1)]
+
+    def _hedge(
+        self, target: RouteTarget, page: PreparedPage, estimated: int
+    ) -> Optional[RouteTarget]:
+        """Pick the target for a hedge of a slow call to ``target``.
+
+        Hedges go to ``hedge_target`` if set, otherwise to another router
+        target if there is one. They are only sent when the target's rate
+        limits have room right away, so hedging never holds up other pages.
+        Returns None if no hedge should be sent.
+        """
+        hedge = self.hedge_target or self.router.choose(exclude=[target])
+        if not hedge.rate_limiter.try_acquire(estimated):
+            return None
+        page.hedges += 1
+        logging.info(f"Request to {target.name} is slow, hedging with {hedge.name}")
+        return hedge
+
+    def _settle(
+        self,
+        calls: Dict[Any, RouteTarget],
+        winner: Any,
+        errors: Dict[Any, Exception],
+        estimated: int,
+    ):
+        """Release the rate limit slots of the calls that lost a hedge race."""
+        for call, target in calls.items():
+            if call is winner:
+                continue
+            if call in errors:
+                self.router.record(target, error=errors[call])
+                target.rate_limiter.release(estimated, failed=True)
+            elif isinstance(call, asyncio.Future):
+                call.cancel()
+                target.rate_limiter.release(estimated, failed=True)
+            else:
+                # Sync calls can't be stopped; free the slot once it ends
+                call.add_done_callback(
+                    lambda _, limiter=target.rate_limiter: limiter.release(
+                        estimated, failed=True
+                    )
+                )
+
+    def _invoke_hedged(
+        self, target: RouteTarget, page: PreparedPage, estimated: int
+    ) -> Tuple[BaseMessage, RouteTarget]:
+        """Call ``target``, hedging the call if it is slower than usual.
+
+        A hedge is a duplicate request, sent once the call has been in flight
+        for longer than the run's ``hedge_percentile`` latency. Returns the
+        first successful response and the target that gave it. If both calls
+        fail the original call's error is raised. Losing sync calls can't be
+        stopped, so they finish in the background and are discarded.
+        """
+        delay = self._hedge_delay()
+        if delay is None or self.hedge_pool is None:
+            return self._invoke(target, page), target
+        primary = self.hedge_pool.submit(self._invoke, target, page)
+        try:
+            return primary.result(timeout=delay), target
+        except FutureTimeoutError:
+            pass
+        hedge_target = self._hedge(target, page, estimated)
+        if hedge_target is None:
+            return primary.result(), target
+
+        calls = {
+            primary: target,
+            self.hedge_pool.submit(self._invoke, hedge_target, page): hedge_target,
+        }
+        errors = {}
+        for call in as_completed(calls):
+            try:
+                response = call.result()
+            except Exception as e:
+                errors[call] = e
+                continue
+            self._settle(calls, call, errors, estimated)
+            return response, calls[call]
+        self._settle(calls, primary, errors, estimated)
+        raise errors[primary]
+
+    async def _ainvoke_hedged(
+        self, target: RouteTarget, page: PreparedPage, estimated: int
+    ) -> Tuple[BaseMessage, RouteTarget]:
+        """Async counterpart of ``_invoke_hedged()``; losing calls are cancelled."""
+        delay = self._hedge_delay()
+        if delay is None:
+            return await self._ainvoke(target, page), target
+        primary = asyncio.ensure_future(self._ainvoke(target, page))
+        calls = {primary: target}
+        errors = {}
+        try:
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            hedge_target = None if done else self._hedge(target, page, estimated)
+            if hedge_target is None:
+                return await primary, target
+
+            calls[asyncio.ensure_future(self._ainvoke(hedge_target, page))] = (
+                hedge_target
+            )
+            pending = set(calls)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for call in done:
+                    if call.exception() is not None:
+                        errors[call] = call.exception()
+                for call in done:
+                    if call not in errors:
+                        self._settle(calls, call, errors, estimated)
+                        return call.result(), calls[call]
+            self._settle(calls, primary, errors, estimated)
+            raise errors[primary]
+        finally:
+            for call in calls:
+                call.cancel()
+
+    def _call(
+        self, page: PreparedPage, estimated: int, pages: int = 1
+    ) -> Union[BaseMessage, PageFailure]:
+        attempt = failures = 0
+        tried: List[RouteTarget] = []
+        while True:
+            target = self.router.choose(tried)
+            target.rate_limiter.acquire(estimated)
+            started = time.monotonic()
+            try:
+                response, target = self._invoke_hedged(target, page, estimated)
+            except Exception as e:
+                if self._fail_over(e, target, estimated, tried):
+                    continue
+                attempt += 1
+                failures += not is_rate_limit_error(e)
+                tried = []
+                delay = self._retry_delay(e, target, estimated, attempt, failures)
+                if delay is None:
+                    return self._give_up(e)
+                time.sleep(delay)
+                continue
+            self._record_latency(target, time.monotonic() - started)
+            self._finish(target, page, estimated, response, pages)
+            return response
+
+    async def _acall(
+        self, page: PreparedPage, estimated: int, pages: int = 1
+    ) -> Union[BaseMessage, PageFailure]:
+        attempt = failures = 0
+        tried: List[RouteTarget] = []
+        while True:
+            target = self.router.choose(tried)
+            await target.rate_limiter.aacquire(estimated)
+            started = time.monotonic()
+            try:
+                response, target = await self._ainvoke_hedged(
+                    target, page, estimated
+                )
+            except Exception as e:
+                if self._fail_over(e, target, estimated, tried):
+                    continue
+                attempt += 1
+                failures += not is_rate_limit_error(e)
+                tried = []
+                delay = self._retry_delay(e, target, estimated, attempt, failures)
+                if delay is None:
+                    return self._give_up(e)
+                await asyncio.sleep(delay)
+                continue
+            self._record_latency(target, time.monotonic() - started)
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._finish, target, page, estimated, response, pages
+            )
+            return response
+
+    def _record_latency(self, target: RouteTarget, latency: float):
+        self.router.record(target, latency=latency)
+        self.latencies.append(latency)
+
+    def invoke(self, page: PreparedPage) -> Union[BaseMessage, PageFailure]:
+        """Call the model within the rate limits, retrying failed requests.
+
+        A page that still fails after ``page_retries`` retries is returned as a
+        PageFailure, so one bad page doesn't abort the document.
+        """
+        response = self._call(page, self.estimate_tokens(page))
+        self._advance()
+        return response
+
+    async def ainvoke(self, page: PreparedPage) -> Union[BaseMessage, PageFailure]:
+        """Async counterpart of ``invoke()``."""
+        response = await self._acall(page, self.estimate_tokens(page))
+        self._advance()
+        return response
+
+    def invoke_pack(
+        self, pages: List[PreparedPage]
+    ) -> List[Union[BaseMessage, PageFailure]]:
+        """Convert several pages with one request, see ``pack_pages()``.
+
+        The response is split back into one response per page. If it can't
+        be split, the pages are converted again one request at a time, and
+        the discarded response's tokens are charged to them.
+        """
+        if len(pages) == 1:
+            return [self.invoke(pages[0])]
+        estimated = sum(self.estimate_tokens(page) for page in pages)
+        response = self._call(pack_pages(pages), estimated, len(pages))
+        if isinstance(response, PageFailure):
+            self._advance(len(pages))
+            return [response] * len(pages)
+        responses = self._unpack(pages, response)
+        if responses is None:
+            return [
+                add_spent_usage(self.invoke(page), spent)
+                for page, spent in zip(pages, split_usage(response, len(pages)))
+            ]
+        self._advance(len(pages))
+        return responses
+
+    async def ainvoke_pack(
+        self, pages: List[PreparedPage]
+    ) -> List[Union[BaseMessage, PageFailure]]:
+        """Async counterpart of ``invoke_pack()``."""
+        if len(pages) == 1:
+            return [await self.ainvoke(pages[0])]
+        estimated = sum(self.estimate_tokens(page) for page in pages)
+        response = await self._acall(pack_pages(pages), estimated, len(pages))
+        if isinstance(response, PageFailure):
+            self._advance(len(pages))
+            return [response] * len(pages)
+        responses = await asyncio.get_running_loop().run_in_executor(
+            None, self._unpack, pages, response
+        )
+        if responses is None:
+            retried = await asyncio.gather(*(self.ainvoke(page) for page in pages))
+            return [
+                add_spent_usage(result, spent)
+                for result, spent in zip(retried, split_usage(response, len(pages)))
+            ]
+        self._advance(len(pages))
+        return responses
+
+    def _unpack(
+        self, pages: List[PreparedPage], response: BaseMessage
+    ) -> Optional[List[BaseMessage]]:
+        """Split a packed response into per-page responses and cache them."""
+        responses = split_packed_response(response, len(pages))
+        if responses is None:
+            logging.warning(
+                f"Could not split the response for {len(pages)} packed pages, "
+                "converting them one at a time"
+            )
+            return None
+        for page, page_response in zip(pages, responses):
+            self.remember(page, page_response)
+        return responses
+
+    def remember(self, page: PreparedPage, response: BaseMessage):
+        """Store a fresh model response in the response cache, if enabled."""
+        if self.response_cache is None or not page.cache_key:
+            return
+        usage = response.usage_metadata or {}
+        self.response_cache.put(
+            page.cache_key,
+            CachedResponse(
+                content=response.content,
+                input_tokens=usage.get("input_tokens", 0),
+                output_tokens=usage.get("output_tokens", 0),
+            ),
+        )
+
+    def record(self, page: Page):
+        """Journal a completed page, if the run keeps a journal."""
+        if self.journal is not None:
+            self.journal.record(page)
+
+    def close(self, finished: bool = False):
+        if self.hedge_pool is not None:
+            self.hedge_pool.shutdown(wait=False)
+        if self.journal is not None:
+            self.journal.close(finished)
+        if self.response_cache is not None:
+            self.response_cache.close()
+
+
+def setup_vision(
     file_path: str,
     model: Optional[str] = None,
-    output_file: Optional[str] = None,
     custom_system_prompt: Optional[str] = None,
     select_pages: Optional[str] = None,
     provider: str = "openai",
     prediction: Optional[dict] = None,
-) -> GPTParseOutput:
-    try:
-        start_time = time.time()
+    options: Optional[VisionOptions] = None,
+    page_references: Optional[Dict[int, str]] = None,
+    page_predictions: Optional[Dict[int, str]] = None,
+    concurrency: Optional[int] = None,
+    event_loop: Optional[asyncio.AbstractEventLoop] = None,
+) -> VisionRun:
+    """Open the document, resolve the model and build the per-page steps.
 
-        # Get the appropriate handler for the file
-        handler = get_handler(file_path)
+    The model clients come from a process-wide registry, with connection
+    pools sized for ``concurrency``; pass the ``event_loop`` that async
+    model calls will run on.
+    """
+    options = options or VisionOptions()
+    hedge_percentile = options.hedge_percentile
+    if hedge_percentile is not None and not 0 < hedge_percentile < 100:
+        raise ValueError("hedge_percentile must be between 0 and 100")
+    # Get the appropriate handler for the file, rendering pages directly
+    # at the size the model receives
+    handler = get_handler(file_path, options.render_config(concurrency))
 
-        # Get images from the file
-        images = handler.get_images()
+    # Count pages without rendering them; only selected pages get rasterized
+    total_pages = handler.page_count
 
-        # Warn about page selection for non-PDF files
-        if select_pages and not handler.is_multi_page:
-            logging.warning("Page selection is only supported for PDF files. Ignoring.")
-            select_pages = None
+    # Warn about page selection for non-PDF files
+    if select_pages and not handler.is_multi_page:
+        logging.warning("Page selection is only supported for PDF files. Ignoring.")
+        select_pages = None
 
-        # Process pages/images
-        pages_to_process = (
-            parse_page_selection(select_pages, len(images))
-            if select_pages
-            else range(len(images))
-        )
+    # Process pages/images
+    pages_to_process = (
+        parse_page_selection(select_pages, total_pages) if select_pages else []
+    )
 
-        config = get_config()
-        provider = provider or config.get("provider", "openai")
-        model = model or config.get("model") or PROVIDER_MODELS[provider]["default"]
+    provider, model = resolve_model(provider, model)
 
-        ai_model = model_interface.get_model(provider, model)
-        warnings.filterwarnings("ignore", category=Image.DecompressionBombWarning)
+    # Connection pools are capped at the concurrency; hedging to the run's own
+    # targets can put a duplicate in flight next to every call
+    pool_size = (
+        concurrency * 2
+        if hedge_percentile is not None and not options.hedge_model
+        else concurrency
+    )
+    router = get_router(
+        provider,
+        model,
+        options.requests_per_minute,
+        options.tokens_per_minute,
+        pool_size=pool_size,
+        event_loop=event_loop,
+    )
+    # Hedges go to their own provider/model if one is given, e.g. a faster
+    # model, otherwise to the run's targets
+    hedge_target = None
+    if hedge_percentile is not None and options.hedge_model:
+        hedge_target = get_router(
+            ROUTER_PROVIDER,
+            options.hedge_model,
+            options.requests_per_minute,
+            options.tokens_per_minute,
+            pool_size=concurrency,
+            event_loop=event_loop,
+        ).primary
+    warnings.filterwarnings("ignore", category=Image.DecompressionBombWarning)
 
-        total_pages = len(images)
+    if not pages_to_process:
+        pages_to_process = list(range(total_pages))
 
-        if not pages_to_process:
-            pages_to_process = range(total_pages)
-        else:
-            pages_to_process = [p for p in pages_to_process if p < total_pages]
+    cb = BatchCallback(len(pages_to_process), f"{provider}/{model}")
+    run_config = RunnableConfig(callbacks=[cb])
+
+    # Per-page references and predictions are keyed by 1-based page number;
+    # a document-wide prediction applies to pages without their own
+    references = {
+        page - 1: text for page, text in (page_references or {}).items()
+    }
+    predictions = {}
+    if supports_prediction(provider, model):
+        for index in pages_to_process:
+            text = (page_predictions or {}).get(index + 1)
+            if text is not None:
+                predictions[index] = {"type": "content", "content": text}
+            elif prediction:
+                predictions[index] = prediction
+
+    # Reuse earlier responses for identical requests; the key covers the
+    # encoded image, prompt and the page's prediction (its own or the
+    # document-wide one), and the namespace the model settings
+    responses_cache = (
+        ResponseCache(options.cache_dir)
+        if options.cache_dir and options.response_cache
+        else None
+    )
+    cache_namespace = json.dumps(
+        [
+            provider,
+            model,
+            *[
+                getattr(target.ai_model, "_identifying_params", {})
+                for target in router.targets
+            ],
+        ],
+        default=str,
+        sort_keys=True,
+    )
+
+    encoding = options.encode_config()
+
+    # With resume or a journal directory, record completed pages so an
+    # interrupted run can pick up where it stopped; the journal is keyed by
+    # everything that shapes a page's output
+    journal = None
+    journaled = {}
+    if options.resume or options.journal_dir:
+        try:
+            journal = PageJournal(
+                file_path,
+                json.dumps(
+                    [
+                        cache_namespace,
+                        custom_system_prompt,
+                        vars(encoding),
+                        options.skip_blank_pages,
+                        options.dedupe_pages,
+                        references,
+                        options.pages_per_request,
+                    ],
+                    default=str,
+                    sort_keys=True,
+                ),
+                options.journal_dir,
+            )
+            journaled = journal.start(options.resume)
+        except OSError as e:
+            logging.warning(f"Continuing without a journal, it cannot be written: {e}")
+            journal = None
+    completed = {
+        index: journaled[index] for index in pages_to_process if index in journaled
+    }
+    if completed:
+        logging.info(f"Resuming: {len(completed)} pages already converted")
+        cb.advance(len(completed))
 
-        batch_messages = []
-        for i in tqdm(
-            pages_to_process, desc="Preparing pages for vision input", unit="page"
+    # Estimate each page's cost from the PDF structure, without rendering
+    costs = {}
+    if options.longest_first and handler.is_multi_page:
+        remaining = [index for index in pages_to_process if index not in completed]
+        costs = {
+            profile.page: profile.expected_cost()
+            for profile in profile_pages(file_path, remaining)
+        }
+
+    # Pages with a text layer have content, however little ink they show
+    text_pages = set()
+    if options.skip_blank_pages and handler.is_multi_page:
+        text_pages = text_layer_pages(file_path, pages_to_process)
+
+    return VisionRun(
+        handler=handler,
+        pages=pages_to_process,
+        provider=provider,
+        model=model,
+        router=router,
+        run_config=run_config,
+        prepare=partial(
+            prepare_page,
+            prompt=custom_system_prompt or VISION_PROMPT,
+            encoding=encoding,
+            skip_blank=options.skip_blank_pages,
+            dedupe=options.dedupe_pages,
+            cache_prompt=caches_prompt(provider, model),
+        ),
+        page_filter=PageFilter(cb, responses_cache, cache_namespace),
+        response_cache=responses_cache,
+        callback=cb,
+        page_retries=options.page_retries,
+        fail_fast=options.fail_fast,
+        journal=journal,
+        completed=completed,
+        references=references,
+        predictions=predictions,
+        pages_per_request=max(1, options.pages_per_request),
+        hedge_percentile=hedge_percentile,
+        hedge_target=hedge_target,
+        costs=costs,
+        text_pages=text_pages,
+        # Room for every page's call plus a hedge; threads start on demand
+        hedge_pool=(
+            ThreadPoolExecutor(max_workers=2 * max(1, concurrency or 1))
+            if hedge_percentile is not None
+            else None
+        ),
+    )
+
+
+class PageAssembler:
+    """Turns model responses into Pages and decides when each can be emitted.
+
+    With ``ordered`` pages are released in document order, holding back pages
+    that finish before an earlier one; otherwise as soon as they are complete.
+    Duplicates are always held until the page they copy has finished.
+    ``on_complete`` is called with every page as soon as it is complete,
+    before any reordering. Responses may also be ready-made Pages.
+    """
+
+    def __init__(
+        self,
+        pages: List[int],
+        ordered: bool = True,
+        on_complete: Optional[Callable[[Page], None]] = None,
+    ):
+        self.pages = pages
+        self.ordered = ordered
+        self.on_complete = on_complete
+        self.responses = {}
+        self._next_position = 0
+        self._waiting: List[int] = []
+        self._done: Dict[int, Page] = {}
+
+    def add(self, index: int, response) -> List[Page]:
+        """Record the response for page ``index`` and return the pages now ready."""
+        self.responses[index] = response
+        self._waiting.append(index)
+        completed = []
+        for pending in [pending for pending in self._waiting if self._ready(pending)]:
+            self._waiting.remove(pending)
+            page = self._make_page(pending)
+            if self.on_complete:
+                self.on_complete(page)
+            completed.append(page)
+        if not self.ordered:
+            return completed
+
+        for page in completed:
+            self._done[page.page - 1] = page
+        ready = []
+        while (
+            self._next_position < len(self.pages)
+            and self.pages[self._next_position] in self._done
         ):
-            # Resize the image
-            resized_image = resize_image(images[i])
-
-            # Convert resized image to base64
-            buffered = io.BytesIO()
-            resized_image.save(buffered, format="PNG")
-            encoded_image = base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-            # Prepare the message for the AI model
-            message = HumanMessage(
-                content=[
-                    {
-                        "type": "text",
-                        "text": "Convert the content of the image into markdown format, ensuring the appropriate structure for various components including tables, lists, and other images. You will not add any of your own commentary to your response. Consider the following:\n\n- **Tables:** If the image contains tables, convert them into markdown tables. Ensure that all columns and rows from the table are accurately captured. Do not convert tables into JSON unless every column and row, with all data, can be properly represented.\n- **Lists:** If the image contains lists, convert them into markdown lists.\n- **Images:** If the image contains other images, summarize each image into text and wrap it with `<image></image>` tags.\n\n# Steps\n\n1. **Image Analysis:** Identify the various elements in the image such as tables, lists, and other images.\n   \n2. **Markdown Conversion:**\n   - For tables, use the markdown format for tables. Make sure all columns and rows are preserved, including headers and any blank cells.\n   - For lists, use markdown list conventions (ordered or unordered as per the original).\n   - For images, write a brief descriptive summary of the image content and wrap it using `<image></image>` tags.\n\n3. **Compile:** Assemble all converted elements into cohesive markdown-formatted text.\n\n# Output Format\n\n- The output should be in markdown format, accurately representing each element from the image with appropriate markdown syntax. Pay close attention to the structure of tables, ensuring that no columns or rows are omitted.\n\n# Examples\n\n**Input Example 1:**\n\nAn image containing a table with five columns and three rows, a list, and another image.\n\n**Output Example 1:**\n\n```\n| Column 1 | Column 2 | Column 3 | Column 4 | Column 5 |\n| -------- | -------- | -------- | -------- | -------- |\n| Row 1    | Data 2   | Data 3   | Data 4   | Data 5   |\n| Row 2    | Data 2   | Data 3   | Data 4   |          |\n| Row 3    | Data 2   |          | Data 4   | Data 5   |\n\n- List Item 1\n- List Item 2\n- List Item 3\n\n<image></image>\nImage description with as much detail as possible here.\n</image>\n```\n\n# Notes\n\n- Ensure that the markdown syntax is correct and renders well when processed.\n- Preserve column and row structure for tables, ensuring no data is lost or misrepresented.\n- Be attentive to the layout and order of elements as they appear in the image.",
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/png;base64,{encoded_image}"},
-                    },
-                ]
+            ready.append(self._done.pop(self.pages[self._next_position]))
+            self._next_position += 1
+        return ready
+
+    def _ready(self, index: int) -> bool:
+        result = self.responses.get(index)
+        if isinstance(result, PageShortcut) and result.duplicate_of is not None:
+            return result.duplicate_of in self.responses
+        return result is not None
+
+    @staticmethod
+    def _content(result) -> str:
+        if isinstance(result, PageShortcut):
+            return result.cached.content if result.cached else ""
+        if isinstance(result, PageFailure):
+            return ""
+        return result.content
+
+    def _make_page(self, index: int) -> Page:
+        result = self.responses[index]
+        if isinstance(result, Page):
+            return result
+        if isinstance(result, PageFailure):
+            return Page(
+                content="",
+                input_tokens=result.input_tokens,
+                output_tokens=result.output_tokens,
+                page=index + 1,
+                error=result.error,
+                engine="vision",
+            )
+        if isinstance(result, PageShortcut):
+            # Blank, duplicate or cached page: no model call, no tokens spent
+            duplicate_of = result.duplicate_of
+            original = (
+                self.responses[duplicate_of] if duplicate_of is not None else None
+            )
+            return Page(
+                content=self._content(
+                    self.responses[duplicate_of] if duplicate_of is not None else result
+                ),
+                input_tokens=0,
+                output_tokens=0,
+                page=index + 1,
+                skipped=result.skipped,
+                duplicate_of=duplicate_of + 1 if duplicate_of is not None else None,
+                cached=result.cached is not None,
+                error=original.error if isinstance(original, PageFailure) else None,
+                engine="vision",
             )
-            batch_messages.append([message])
 
-        cb = BatchCallback(len(batch_messages), f"{provider}/{model}")
+        usage = result.usage_metadata or {}
+        accepted, rejected = prediction_tokens(result)
+        return Page(
+            content=result.content,
+            input_tokens=usage.get("input_tokens", 0),
+            output_tokens=usage.get("output_tokens", 0),
+            cached_input_tokens=cached_input_tokens(result),
+            accepted_prediction_tokens=accepted,
+            rejected_prediction_tokens=rejected,
+            page=index + 1,
+            served_by=(result.response_metadata or {}).get("served_by"),
+            hedges=(result.response_metadata or {}).get("hedges", 0),
+            engine="vision",
+        )
+
+
+def iter_vision(
+    concurrency: int,
+    file_path: str,
+    model: Optional[str] = None,
+    custom_system_prompt: Optional[str] = None,
+    select_pages: Optional[str] = None,
+    provider: str = "openai",
+    prediction: Optional[dict] = None,
+    page_references: Optional[Dict[int, str]] = None,
+    page_predictions: Optional[Dict[int, str]] = None,
+    ordered: bool = True,
+    options: Optional[VisionOptions] = None,
+    **overrides: Any,
+) -> Iterator[Page]:
+    """Convert PDF or image files to Markdown, yielding pages as they complete.
+
+    With ``ordered`` pages are yielded in document order, holding back pages
+    that finish before an earlier one; otherwise they are yielded in completion
+    order. With ``resume`` or a ``journal_dir``, completed pages are journaled
+    as they finish; with ``resume``, pages journaled by an earlier,
+    interrupted run with the same settings are reused instead of converted
+    again. Errors are raised rather than returned.
+
+    ``page_references`` maps 1-based page numbers to text sent alongside that
+    page's image, and ``page_predictions`` to the page's predicted output on
+    models that support it; ``prediction`` applies to pages without one.
+
+    With ``pages_per_request`` above one, consecutive pages are packed into
+    a single request while their image tokens and expected output fit (see
+    ``VisionRun.fits()``), and the response is split back into pages.
+
+    With ``hedge_percentile`` (e.g. 95), a request still in flight after that
+    percentile of the run's latencies so far gets a duplicate request, sent
+    to ``hedge_model`` ("provider[/model]") if given, and the first answer
+    wins. ``Page.hedges`` counts the duplicates sent for each page.
+
+    With ``longest_first``, PDF pages are sent in order of their expected
+    cost, estimated from the text layer and drawings, most expensive first,
+    to shorten the run as a whole (see ``VisionRun.pending``).
+
+    These and the other rendering, encoding and request settings come from
+    ``options``; any ``VisionOptions`` field can also be passed as a keyword
+    argument, overriding ``options``.
+    """
+    options = vision_options(options, **overrides)
+    run = setup_vision(
+        file_path,
+        model=model,
+        custom_system_prompt=custom_system_prompt,
+        select_pages=select_pages,
+        provider=provider,
+        prediction=prediction,
+        options=options,
+        page_references=page_references,
+        page_predictions=page_predictions,
+        concurrency=concurrency,
+    )
+
+    # Render and encode upcoming pages while earlier pages are with the model
+    packing = run.pages_per_request > 1
+    pipeline = PagePipeline(
+        prepare=partial(prepare_page_input, run.prepare),
+        dispatch=run.invoke_pack if packing else run.invoke,
+        concurrency=concurrency,
+        queue_depth=options.queue_depth,
+        prepare_workers=options.encode_workers or os.cpu_count() or 1,
+        prepare_executor=options.encode_executor,
+        lookup=run.page_filter,
+        pack=run.fits if packing else None,
+    )
+    pending = run.pending
+    pages = (
+        (index, run.page_input(index, image))
+        for index, image in zip(pending, run.handler.iter_images(pending))
+    )
+    assembler = PageAssembler(run.pages, ordered, on_complete=run.record)
+
+    finished = False
+    try:
+        for index, page in run.completed.items():
+            yield from assembler.add(index, page)
+        for index, response in pipeline.run(pages):
+            yield from assembler.add(index, response)
+        finished = True
+    except Exception as e:
+        raise_for_authentication_error(e, run.provider)
+        raise e
+    finally:
+        run.close(finished)
+
+
+async def aiter_vision(
+    concurrency: int,
+    file_path: str,
+    model: Optional[str] = None,
+    custom_system_prompt: Optional[str] = None,
+    select_pages: Optional[str] = None,
+    provider: str = "openai",
+    prediction: Optional[dict] = None,
+    page_references: Optional[Dict[int, str]] = None,
+    page_predictions: Optional[Dict[int, str]] = None,
+    ordered: bool = True,
+    options: Optional[VisionOptions] = None,
+    **overrides: Any,
+) -> AsyncIterator[Page]:
+    """Async counterpart of ``iter_vision()``.
+
+    Model calls use the provider's async client on the running event loop.
+    Opening the document, rendering and encoding run on the loop's default
+    executor (or a process pool with ``encode_executor="process"``), so many
+    documents can share one loop without a thread pool per document.
+    """
+    options = vision_options(options, **overrides)
+    loop = asyncio.get_running_loop()
+    run = await loop.run_in_executor(
+        None,
+        partial(
+            setup_vision,
+            file_path,
+            model=model,
+            custom_system_prompt=custom_system_prompt,
+            select_pages=select_pages,
+            provider=provider,
+            prediction=prediction,
+            options=options,
+            page_references=page_references,
+            page_predictions=page_predictions,
+            concurrency=concurrency,
+            event_loop=loop,
+        ),
+    )
+
+    pending = run.pending
+    concurrency = max(1, concurrency)
+    prepare_workers = max(1, options.encode_workers or os.cpu_count() or 1)
+    prepare_pool = (
+        ProcessPoolExecutor(max_workers=prepare_workers, mp_context=process_context())
+        if options.encode_executor == "process"
+        else None
+    )
+    prepared: asyncio.Queue = asyncio.Queue(
+        maxsize=max(1, options.queue_depth or concurrency)
+    )
+    results: asyncio.Queue = asyncio.Queue()
+    slots = asyncio.Semaphore(concurrency)
+    tasks: Set[asyncio.Task] = set()
+
+    async def produce():
+        # Render pages one at a time off-loop and keep up to prepare_workers
+        # encodes in flight, queueing prepared pages in document order
+        images = run.handler.iter_images(pending)
+        in_flight = deque()
         try:
-            # Process batch messages
-            if (
-                provider == "openai"
-                and model
-                and model.startswith("gpt-4o")
-                and prediction
-            ):
-                results = ai_model.batch(
-                    batch_messages,
-                    config=RunnableConfig(
-                        max_concurrency=concurrency,
-                        callbacks=[cb],
-                        prediction=prediction,
-                    ),
-                )
-            else:
-                results = ai_model.batch(
-                    batch_messages,
-                    config=RunnableConfig(max_concurrency=concurrency, callbacks=[cb]),
+            for index in pending:
+                image = await loop.run_in_executor(None, next, images)
+                in_flight.append(
+                    (
+                        index,
+                        loop.run_in_executor(
+                            prepare_pool,
+                            partial(prepare_page_input, run.prepare),
+                            run.page_input(index, image),
+                        ),
+                    )
                 )
+                if len(in_flight) >= prepare_workers:
+                    head, future = in_flight.popleft()
+                    await prepared.put((head, await future))
+            while in_flight:
+                head, future = in_flight.popleft()
+                await prepared.put((head, await future))
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+            try:
+                await loop.run_in_executor(None, images.close)
+            except ValueError:
+                # Still rendering on an executor thread after cancellation;
+                # the generator is closed when it is garbage collected
+                pass
+
+    async def call_model(group: List[Tuple[int, PreparedPage]]):
+        try:
+            responses = await run.ainvoke_pack([page for _, page in group])
+            for (index, _), response in zip(group, responses):
+                await results.put((index, response))
         except Exception as e:
-            error_msg = str(e)
-            if any(
-                keyword in error_msg.lower()
-                for keyword in [
-                    "authentication_error",
-                    "invalid_api_key",
-                    "api key not valid",
-                ]
-            ):
-                if provider == "openai":
-                    error_dict = json.loads(error_msg.split(" - ", 1)[1])
-                    error_message = error_dict["error"]["message"]
-                elif provider == "google":
-                    error_message = re.search(
-                        r"Invalid argument provided to Gemini: (.+)", error_msg
-                    ).group(1)
-                else:  # For other providers like Anthropic
-                    error_dict = json.loads(error_msg.split(" - ", 1)[1])
-                    error_message = error_dict["error"]["message"]
-                raise ValueError(
-                    f"Authentication error for {provider}: {error_message}"
-                )
-            raise e
+            await results.put(_AsyncFailure(e))
+        finally:
+            slots.release()
+
+    async def dispatch(group: List[Tuple[int, PreparedPage]]):
+        await slots.acquire()
+        task = asyncio.ensure_future(call_model(list(group)))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        group.clear()
+
+    async def consume():
+        # Consecutive pages are packed into one request while they fit
+        group = []
+        for _ in pending:
+            index, page = await prepared.get()
+            shortcut = await loop.run_in_executor(None, run.page_filter, index, page)
+            if shortcut is not None:
+                await results.put((index, shortcut))
+                continue
+            if group and not run.fits([page for _, page in group], page):
+                await dispatch(group)
+            group.append((index, page))
+            if len(group) >= run.pages_per_request:
+                await dispatch(group)
+        if group:
+            await dispatch(group)
 
-        # Process results
+    async def feed():
+        try:
+            await asyncio.gather(produce(), consume())
+        except Exception as e:
+            await results.put(_AsyncFailure(e))
+
+    feeder = asyncio.ensure_future(feed())
+    assembler = PageAssembler(run.pages, ordered, on_complete=run.record)
+    finished = False
+    try:
+        for index, page in run.completed.items():
+            for ready in assembler.add(index, page):
+                yield ready
+        for _ in pending:
+            entry = await results.get()
+            if isinstance(entry, _AsyncFailure):
+                raise entry.error
+            for page in assembler.add(*entry):
+                yield page
+        finished = True
+    except Exception as e:
+        raise_for_authentication_error(e, run.provider)
+        raise e
+    finally:
+        feeder.cancel()
+        for task in list(tasks):
+            task.cancel()
+        await asyncio.gather(feeder, *tasks, return_exceptions=True)
+        if prepare_pool is not None:
+            prepare_pool.shutdown(wait=False, cancel_futures=True)
+        run.close(finished)
+
+
+class _AsyncFailure:
+    """Wraps an exception raised by a task of the async vision pipeline."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def vision(
+    concurrency: int,
+    file_path: str,
+    model: Optional[str] = None,
+    output_file: Optional[str] = None,
+    custom_system_prompt: Optional[str] = None,
+    select_pages: Optional[str] = None,
+    provider: str = "openai",
+    prediction: Optional[dict] = None,
+    page_references: Optional[Dict[int, str]] = None,
+    page_predictions: Optional[Dict[int, str]] = None,
+    options: Optional[VisionOptions] = None,
+    **overrides: Any,
+) -> GPTParseOutput:
+    options = vision_options(options, **overrides)
+    try:
+        start_time = time.time()
+
+        if output_file and not output_file.lower().endswith((".md", ".txt")):
+            raise ValueError("Output file must have a .md or .txt extension")
+
+        provider, model = resolve_model(provider, model)
+
+        # Write each page as soon as it is ready so partial output survives
+        # interruptions
         processed_pages = []
-        total_input_tokens = 0
-        total_output_tokens = 0
-
-        for i, result in enumerate(results):
-            markdown_content = result.content
-            input_tokens = result.usage_metadata.get("input_tokens", 0)
-            output_tokens = result.usage_metadata.get("output_tokens", 0)
-
-            total_input_tokens += input_tokens
-            total_output_tokens += output_tokens
-
-            processed_pages.append(
-                Page(
-                    content=markdown_content,
-                    input_tokens=input_tokens,
-                    output_tokens=output_tokens,
-                    page=pages_to_process[i] + 1,
-                )
-            )
+        writer = MarkdownWriter(output_file) if output_file else None
+        try:
+            for page in iter_vision(
+                concurrency=concurrency,
+                file_path=file_path,
+                model=model,
+                custom_system_prompt=custom_system_prompt,
+                select_pages=select_pages,
+                provider=provider,
+                prediction=prediction,
+                page_references=page_references,
+                page_predictions=page_predictions,
+                options=options,
+            ):
+                processed_pages.append(page)
+                if writer:
+                    writer.write(page)
+        finally:
+            if writer:
+                writer.close()
 
         completion_time = time.time() - start_time
 
-        result = GPTParseOutput(
+        return GPTParseOutput(
             file_path=os.path.abspath(file_path),
             provider=provider,
             model=model,
             completion_time=completion_time,
-            input_tokens=total_input_tokens,
-            output_tokens=total_output_tokens,
+            input_tokens=sum(page.input_tokens for page in processed_pages),
+            output_tokens=sum(page.output_tokens for page in processed_pages),
+            cached_input_tokens=sum(
+                page.cached_input_tokens for page in processed_pages
+            ),
+            accepted_prediction_tokens=sum(
+                page.accepted_prediction_tokens for page in processed_pages
+            ),
+            rejected_prediction_tokens=sum(
+                page.rejected_prediction_tokens for page in processed_pages
+            ),
+            hedged_requests=sum(page.hedges for page in processed_pages),
             pages=processed_pages,
+            error=failure_summary(processed_pages),
+        )
+    except ValueError as e:
+        return GPTParseOutput(
+            file_path=os.path.abspath(file_path),
+            provider=provider,
+            model=model,
+            completion_time=0,
+            input_tokens=0,
+            output_tokens=0,
+            pages=[],
+            error=str(e),
         )
+    except Exception as e:
+        logging.error(f"Unexpected error: {str(e)}")
+        return GPTParseOutput(
+            file_path=os.path.abspath(file_path),
+            provider=provider,
+            model=model,
+            completion_time=0,
+            input_tokens=0,
+            output_tokens=0,
+            pages=[],
+            error=f"An unexpected error occurred: {str(e)}",
+        )
+
 
-        if output_file:
-            if not output_file.lower().endswith((".md", ".txt")):
-                raise ValueError("Output file must have a .md or .txt extension")
-
-            with open(output_file, "w", encoding="utf-8") as f:
-                multiple_pages = len(result.pages) > 1
-                for page in result.pages:
-                    if multiple_pages:
-                        f.write(f"---Page {page.page} Start---\n\n")
-                    # Remove any surrounding backticks and 'markdown' language identifier
-                    content = page.content.strip()
-                    if content.startswith("```markdown"):
-                        content = content[len("```markdown") :].strip()
-                    elif content.startswith("```"):
-                        content = content[3:].strip()
-                    if content.endswith("```"):
-                        content = content[:-3].strip()
-                    f.write(f"{content}\n\n")
-                    if multiple_pages:
-                        f.write(f"---Page {page.page} End---\n\n")
-
-        return result
+async def avision(
+    concurrency: int,
+    file_path: str,
+    model: Optional[str] = None,
+    output_file: Optional[str] = None,
+    custom_system_prompt: Optional[str] = None,
+    select_pages: Optional[str] = None,
+    provider: str = "openai",
+    prediction: Optional[dict] = None,
+    page_references: Optional[Dict[int, str]] = None,
+    page_predictions: Optional[Dict[int, str]] = None,
+    options: Optional[VisionOptions] = None,
+    **overrides: Any,
+) -> GPTParseOutput:
+    """Async counterpart of ``vision()``; see ``aiter_vision()``."""
+    options = vision_options(options, **overrides)
+    try:
+        start_time = time.time()
+
+        if output_file and not output_file.lower().endswith((".md", ".txt")):
+            raise ValueError("Output file must have a .md or .txt extension")
+
+        provider, model = resolve_model(provider, model)
+
+        # Write each page as soon as it is ready so partial output survives
+        # interruptions
+        processed_pages = []
+        writer = MarkdownWriter(output_file) if output_file else None
+        try:
+            async for page in aiter_vision(
+                concurrency=concurrency,
+                file_path=file_path,
+                model=model,
+                custom_system_prompt=custom_system_prompt,
+                select_pages=select_pages,
+                provider=provider,
+                prediction=prediction,
+                page_references=page_references,
+                page_predictions=page_predictions,
+                options=options,
+            ):
+                processed_pages.append(page)
+                if writer:
+                    writer.write(page)
+        finally:
+            if writer:
+                writer.close()
+
+        completion_time = time.time() - start_time
+
+        return GPTParseOutput(
+            file_path=os.path.abspath(file_path),
+            provider=provider,
+            model=model,
+            completion_time=completion_time,
+            input_tokens=sum(page.input_tokens for page in processed_pages),
+            output_tokens=sum(page.output_tokens for page in processed_pages),
+            cached_input_tokens=sum(
+                page.cached_input_tokens for page in processed_pages
+            ),
+            accepted_prediction_tokens=sum(
+                page.accepted_prediction_tokens for page in processed_pages
+            ),
+            rejected_prediction_tokens=sum(
+                page.rejected_prediction_tokens for page in processed_pages
+            ),
+            hedged_requests=sum(page.hedges for page in processed_pages),
+            pages=processed_pages,
+            error=failure_summary(processed_pages),
+        )
     except ValueError as e:
         return GPTParseOutput(
             file_path=os.path.abspath(file_path),
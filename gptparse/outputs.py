@@ -7,6 +7,16 @@ class Page(BaseModel):
     input_tokens: int
     output_tokens: int
     page: int
+    cached_input_tokens: int = 0  # input tokens read from the prompt cache
+    accepted_prediction_tokens: int = 0  # predicted output tokens used as is
+    rejected_prediction_tokens: int = 0  # predicted output tokens discarded
+    skipped: bool = False  # blank page, not sent to the model
+    duplicate_of: Optional[int] = None  # page whose model output was reused
+    cached: bool = False  # model output reused from the response cache
+    error: Optional[str] = None  # why the page could not be converted
+    served_by: Optional[str] = None  # "provider/model" that converted the page
+    hedges: int = 0  # duplicate requests sent to cut the page's latency
+    engine: Optional[str] = None  # "fast" (text layer) or "vision" (VLM)
 
 
 class GPTParseOutput(BaseModel):
@@ -16,6 +26,10 @@ class GPTParseOutput(BaseModel):
     completion_time: float
     input_tokens: int
     output_tokens: int
+    cached_input_tokens: int = 0
+    accepted_prediction_tokens: int = 0
+    rejected_prediction_tokens: int = 0
+    hedged_requests: int = 0
     pages: List[Page]
     error: Optional[str] = None
 
@@ -25,3 +39,69 @@ class GPTParseOutput(BaseModel):
         return (
             f"Processed {len(self.pages)} pages in {self.completion_time:.2f} seconds"
         )
+
+
+def strip_code_fences(content: str) -> str:
+    """Remove any surrounding backticks and 'markdown' language identifier."""
+    content = content.strip()
+    if content.startswith("```markdown"):
+        content = content[len("```markdown") :].strip()
+    elif content.startswith("```"):
+        content = content[3:].strip()
+    if content.endswith("```"):
+        content = content[:-3].strip()
+    return content
+
+
+class MarkdownWriter:
+    """Append pages to a markdown file as they become available.
+
+    Page markers are only written for multi-page output, so the first page is
+    held back until a second page arrives or the writer is closed.
+    """
+
+    def __init__(self, output_file: str):
+        self._file = open(output_file, "w", encoding="utf-8")
+        self._first: Optional[Page] = None
+        self._multiple_pages = False
+
+    def write(self, page: Page):
+        if self._first is None and not self._multiple_pages:
+            self._first = page
+            return
+        if self._first is not None:
+            self._multiple_pages = True
+            self._write(self._first)
+            self._first = None
+        self._write(page)
+
+    def close(self):
+        if self._first is not None:
+            self._write(self._first)
+            self._first = None
+        self._file.close()
+
+    def _write(self, page: Page):
+        if self._multiple_pages:
+            self._file.write(f"---Page {page.page} Start---\n\n")
+        # Vision models sometimes wrap their answer in a code block
+        content = (
+            strip_code_fences(page.content) if page.engine == "vision" else page.content
+        )
+        self._file.write(f"{content}\n\n")
+        if self._multiple_pages:
+            self._file.write(f"---Page {page.page} End---\n\n")
+        self._file.flush()
+
+    def __enter__(self) -> "MarkdownWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_markdown(pages: List[Page], output_file: str):
+    """Write pages to a markdown file, with page markers for multi-page output."""
+    with MarkdownWriter(output_file) as writer:
+        for page in pages:
+            writer.write(page)
@@ -0,0 +1,229 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+from PIL import Image
+
+# Default size cap for the on-disk page image cache (1 GiB)
+DEFAULT_CACHE_MAX_BYTES = 1 << 30
+
+
+def file_digest(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(*parts) -> str:
+    """Build a cache key by hashing the given parts."""
+    return hashlib.sha256("\x1f".join(map(str, parts)).encode("utf-8")).hexdigest()
+
+
+class PageImageCache:
+    """Content-addressed on-disk cache of rendered page images.
+
+    Entries are PNG files named by key. Reads refresh an entry's modification
+    time and, once the cache grows past ``max_bytes``, the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.directory = os.path.join(os.path.expanduser(directory), "pages")
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def contains(self, key: str) -> bool:
+        """Return True if an entry exists for ``key``."""
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        """Return the cached image for ``key``, or None on a miss."""
+        path = self._path(key)
+        try:
+            with Image.open(path) as image:
+                image.load()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.warning(f"Discarding unreadable cache entry {path}: {e}")
+            self._remove(path)
+            return None
+        return image
+
+    def put(self, key: str, image: Image.Image):
+        """Store ``image`` under ``key`` and evict old entries if over the cap."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see partial images
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                image.save(f, format="PNG", compress_level=1)
+            os.replace(tmp_path, path)
+        except Exception:
+            self._remove(tmp_path)
+            raise
+
+        self._size = self.size() + os.path.getsize(path)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def size(self) -> int:
+        """Total bytes currently used by cache entries."""
+        if self._size is None:
+            self._size = sum(os.path.getsize(path) for path in self._entries())
+        return self._size
+
+    def evict(self, target_bytes: Optional[int] = None):
+        """Remove least recently used entries until the cache fits ``target_bytes``."""
+        if target_bytes is None:
+            # Leave some headroom so we don't evict on every subsequent put
+            target_bytes = int(self.max_bytes * 0.9)
+
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= target_bytes:
+                break
+            self._remove(path)
+            total -= size
+        self._size = total
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        self.evict(target_bytes=0)
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".png"):
+                    yield os.path.join(root, name)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# Default size cap for the model response cache (256 MiB)
+DEFAULT_RESPONSE_CACHE_MAX_BYTES = 256 << 20
+
+
+@dataclass
+class CachedResponse:
+    """A model response as stored in the response cache."""
+
+    content: str
+    input_tokens: int
+    output_tokens: int
+
+
+class ResponseCache:
+    """SQLite-backed cache of model responses keyed by request content.
+
+    Keys should hash everything that influences the response: the encoded
+    image, prompt, provider, model and generation parameters. Once the stored
+    content exceeds ``max_bytes`` the least recently used responses are evicted.
+    Safe to share between threads.
+    """
+
+    def __init__(
+        self, directory: str, max_bytes: int = DEFAULT_RESPONSE_CACHE_MAX_BYTES
+    ):
+        directory = os.path.expanduser(directory)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "responses.sqlite")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    input_tokens INTEGER NOT NULL,
+                    output_tokens INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed REAL NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Return the cached response for ``key``, or None on a miss."""
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT content, input_tokens, output_tokens FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+        return CachedResponse(*row)
+
+    def put(self, key: str, response: CachedResponse):
+        """Store ``response`` under ``key`` and evict old entries if over the cap."""
+        size = len(response.content.encode("utf-8"))
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    response.content,
+                    response.input_tokens,
+                    response.output_tokens,
+                    size,
+                    time.time(),
+                ),
+            )
+            total = self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(total, int(self.max_bytes * 0.9))
+
+    def _evict(self, total: int, target_bytes: int):
+        rows = self._connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed"
+        )
+        expired = []
+        for key, size in rows:
+            if total <= target_bytes:
+                break
+            expired.append((key,))
+            total -= size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", expired)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
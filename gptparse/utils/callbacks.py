@@ -17,7 +17,9 @@ class BatchCallback(BaseCallbackHandler):
     def on_llm_error(
         self, error: Union[Exception, KeyboardInterrupt], **kwargs: Any
     ) -> Any:
-        self.progress_bar.close()
+        # Failed requests are retried; pages that give up are counted through
+        # advance(), so keep the bar going
+        pass
 
     def on_llm_end(
         self,
@@ -27,7 +29,13 @@ class BatchCallback(BaseCallbackHandler):
         parent_run_id: UUID | None = None,
         **kwargs,
     ) -> None:
-        self.count += 1
-        self.progress_bar.update(1)
+        # One request may cover several packed pages, so pages are counted
+        # through advance() once their responses are in
+        pass
+
+    def advance(self, n: int = 1) -> None:
+        """Count pages as done, including pages that never reach the model."""
+        self.count += n
+        self.progress_bar.update(n)
         if self.count == self.total:
             self.progress_bar.close()
@@ -1,9 +1,49 @@
-from PIL import Image
+from PIL import Image, ImageChops, ImageStat
+from dataclasses import dataclass
+from typing import Optional, Tuple
 import io
 import base64
 
+# Longest edge, in pixels, of page images sent to vision models
+MAX_IMAGE_SIZE = 1024
 
-def resize_image(image: Image.Image, max_size: int = 1024) -> Image.Image:
+# Supported payload encodings: format name -> (PIL format, media type)
+IMAGE_FORMATS = {
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+# Lossy quality steps tried, in order, to fit a payload into its byte budget
+_QUALITY_STEPS = (85, 70, 55, 40)
+
+
+@dataclass
+class EncodeConfig:
+    """Configuration for encoding page images sent to vision models"""
+
+    format: str = "png"  # png, jpeg or webp
+    quality: int = 85  # used by lossy formats
+    grayscale: str = "auto"  # auto, always or never
+    max_bytes: Optional[int] = None  # per-page budget for the encoded image
+    min_size: int = 512  # never downscale below this longest edge to fit the budget
+
+
+def fit_dpi(
+    width_pt: float, height_pt: float, max_size: Optional[int], max_dpi: float
+) -> float:
+    """Return the DPI at which a page's longest edge renders at ``max_size`` pixels.
+
+    Page dimensions are in PDF points (1/72 inch). The result never exceeds
+    ``max_dpi``, so small pages are not upscaled beyond the configured resolution.
+    """
+    long_edge = max(width_pt, height_pt)
+    if not max_size or long_edge <= 0:
+        return max_dpi
+    return min(max_dpi, max_size * 72 / long_edge)
+
+
+def resize_image(image: Image.Image, max_size: int = MAX_IMAGE_SIZE) -> Image.Image:
     """Resize the image to fit within max_size x max_size while maintaining aspect ratio."""
     original_width, original_height = image.size
 
@@ -25,3 +65,129 @@ def image_to_base64(image: Image.Image) -> str:
     buffered = io.BytesIO()
     image.save(buffered, format="PNG")
     return base64.b64encode(buffered.getvalue()).decode("utf-8")
+
+
+def is_grayscale(image: Image.Image, tolerance: int = 8) -> bool:
+    """Return True if the image has no meaningful color.
+
+    The check runs on a small thumbnail, so it is cheap even for large pages.
+    """
+    if image.mode in ("1", "L", "LA", "I", "F"):
+        return True
+
+    thumbnail = image.convert("RGB")
+    thumbnail.thumbnail((128, 128))
+    red, green, blue = thumbnail.split()
+    for a, b in ((red, green), (green, blue), (red, blue)):
+        if ImageChops.difference(a, b).getextrema()[1] > tolerance:
+            return False
+    return True
+
+
+def _save(image: Image.Image, pil_format: str, quality: int) -> bytes:
+    buffered = io.BytesIO()
+    if pil_format == "PNG":
+        image.save(buffered, format=pil_format)
+    else:
+        image.save(buffered, format=pil_format, quality=quality)
+    return buffered.getvalue()
+
+
+def encode_image(
+    image: Image.Image, config: Optional[EncodeConfig] = None
+) -> Tuple[str, str]:
+    """Encode an image for a vision model payload.
+
+    Returns the base64-encoded data and its media type. Monochrome images are
+    sent as single-channel grayscale when ``config.grayscale`` is ``auto``. If
+    ``config.max_bytes`` is set, lossy formats first step down in quality and
+    then the image is downscaled (never below ``config.min_size``) until the
+    encoded image fits the budget.
+    """
+    config = config or EncodeConfig()
+    if config.format not in IMAGE_FORMATS:
+        raise ValueError(
+            f"Unsupported image format: {config.format}. "
+            f"Choose from: {', '.join(IMAGE_FORMATS)}"
+        )
+    pil_format, media_type = IMAGE_FORMATS[config.format]
+
+    if config.grayscale == "always" or (
+        config.grayscale == "auto" and is_grayscale(image)
+    ):
+        image = image.convert("L")
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    lossy = pil_format != "PNG"
+    qualities = [config.quality]
+    if lossy and config.max_bytes:
+        qualities += [q for q in _QUALITY_STEPS if q < config.quality]
+
+    while True:
+        for quality in qualities:
+            data = _save(image, pil_format, quality)
+            if not config.max_bytes or len(data) <= config.max_bytes:
+                return base64.b64encode(data).decode("utf-8"), media_type
+
+        # Still over budget at the lowest quality: shrink and try again
+        long_edge = max(image.size)
+        if long_edge <= config.min_size:
+            return base64.b64encode(data).decode("utf-8"), media_type
+        image = resize_image(image, max(config.min_size, int(long_edge * 0.75)))
+
+
+def is_blank(image: Image.Image, threshold: int = 64, max_ink: float = 0.0001) -> bool:
+    """Return True if the page carries (almost) no content.
+
+    Pixels that differ from the dominant background shade by more than
+    ``threshold`` count as ink; the page is blank if under ``max_ink`` of a
+    small thumbnail is ink. Scanner noise and faint speckles are tolerated,
+    while a single line of small text (about 0.0005) is not.
+    """
+    thumbnail = image.convert("L")
+    thumbnail.thumbnail((256, 256))
+    histogram = thumbnail.histogram()
+    background = histogram.index(max(histogram))
+
+    ink = sum(
+        count
+        for shade, count in enumerate(histogram)
+        if abs(shade - background) > threshold
+    )
+    return ink <= max_ink * thumbnail.width * thumbnail.height
+
+
+@dataclass
+class PageFingerprint:
+    """Perceptual fingerprint used to spot near-identical pages."""
+
+    hash: int  # 256-bit difference hash
+    thumbnail: bytes  # 64x64 grayscale pixels, used to confirm hash matches
+
+    def matches(self, other: "PageFingerprint", max_distance: int = 4, max_diff: float = 2.0) -> bool:
+        """Return True if both pages look the same."""
+        if bin(self.hash ^ other.hash).count("1") > max_distance:
+            return False
+        # Hash collisions are possible on pages with the same layout, so
+        # confirm with the mean pixel difference of the thumbnails
+        a = Image.frombytes("L", (64, 64), self.thumbnail)
+        b = Image.frombytes("L", (64, 64), other.thumbnail)
+        return ImageStat.Stat(ImageChops.difference(a, b)).mean[0] <= max_diff
+
+
+def page_fingerprint(image: Image.Image) -> PageFingerprint:
+    """Compute a difference hash and thumbnail for near-duplicate detection."""
+    grayscale = image.convert("L")
+
+    small = grayscale.resize((17, 16), Image.LANCZOS)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(16):
+        for col in range(16):
+            left = pixels[row * 17 + col]
+            right = pixels[row * 17 + col + 1]
+            value = (value << 1) | (left > right)
+
+    thumbnail = grayscale.resize((64, 64), Image.LANCZOS).tobytes()
+    return PageFingerprint(hash=value, thumbnail=thumbnail)
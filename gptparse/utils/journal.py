@@ -0,0 +1,91 @@
+import logging
+import os
+import threading
+from typing import Dict, Optional, Set
+from pydantic import ValidationError
+from ..outputs import Page
+from .cache import file_digest, make_key
+
+DEFAULT_JOURNAL_DIR = os.path.join("~", ".gptparse", "journals")
+
+
+class PageJournal:
+    """Append-only on-disk record of the pages a document run has completed.
+
+    Each completed page is appended as a JSON line and synced to disk, so a
+    run that is killed part way can be resumed without repeating those pages.
+    The journal's name hashes the document's contents and the run settings,
+    so only pages produced with the same settings are reused. Pages that
+    failed are not recorded and are retried on resume.
+    """
+
+    def __init__(
+        self, file_path: str, settings: str, directory: Optional[str] = None
+    ):
+        directory = os.path.expanduser(directory or DEFAULT_JOURNAL_DIR)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(
+            directory, f"{make_key(file_digest(file_path), settings)}.jsonl"
+        )
+        self.failed = 0
+        self._recorded: Set[int] = set()
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[int, Page]:
+        """Return the recorded pages, keyed by 0-based page index."""
+        pages = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        page = Page.model_validate_json(line)
+                    except ValidationError:
+                        # A torn final line from a run killed mid-write
+                        logging.warning(f"Ignoring incomplete journal entry in {self.path}")
+                        break
+                    pages[page.page - 1] = page
+        except FileNotFoundError:
+            pass
+        return pages
+
+    def start(self, resume: bool = False) -> Dict[int, Page]:
+        """Open the journal for writing and return the pages to resume from.
+
+        Without ``resume`` any earlier journal for the same run is discarded.
+        """
+        pages = self.load() if resume else {}
+        # Rewrite the valid entries so appends never follow a torn line
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for page in pages.values():
+                f.write(page.model_dump_json() + "\n")
+        os.replace(tmp_path, self.path)
+        self._recorded = set(pages)
+        self._file = open(self.path, "a", encoding="utf-8")
+        return pages
+
+    def record(self, page: Page):
+        """Append a completed page, unless it failed or is already recorded."""
+        with self._lock:
+            if page.error:
+                self.failed += 1
+                return
+            if self._file is None or page.page - 1 in self._recorded:
+                return
+            self._file.write(page.model_dump_json() + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._recorded.add(page.page - 1)
+
+    def close(self, finished: bool = False):
+        """Close the journal, deleting it once every page has been converted."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if finished and not self.failed:
+                try:
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,70 @@
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+import multiprocessing
+import os
+import threading
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_shared_pool: Optional[ProcessPoolExecutor] = None
+_shared_pool_lock = threading.Lock()
+
+
+def process_context():
+    """Start method for worker processes.
+
+    Forking a process that is already running threads (event loops, HTTP
+    clients, pipeline workers) can deadlock the child on a lock some other
+    thread held, so workers are started from a clean forkserver (or spawned
+    where forkserver is unavailable) rather than forked.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+
+
+def shared_process_pool() -> ProcessPoolExecutor:
+    """Return the process pool shared by everything in this process.
+
+    The pool has one worker per CPU and is created on first use, so converting
+    many documents at once (e.g. under ``asyncio.gather``) shares the CPUs
+    instead of starting a pool per document. Callers bound their own share of
+    it by the number of tasks they keep in flight.
+
+    Workers import the caller's ``__main__`` module, so scripts that use the
+    pool must guard their entry point with ``if __name__ == "__main__":``.
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1, mp_context=process_context()
+            )
+        return _shared_pool
+
+
+def ordered_map(
+    executor: Executor,
+    fn: Callable[..., R],
+    iterable: Iterable[T],
+    window: Optional[int] = None,
+) -> Iterator[R]:
+    """Map ``fn`` over ``iterable`` on ``executor``, yielding results in input order.
+
+    Unlike ``Executor.map`` at most ``window`` tasks are in flight at once, so
+    results that have not been consumed yet cannot pile up in memory.
+    """
+    pending = deque()
+    try:
+        for item in iterable:
+            pending.append(executor.submit(fn, item))
+            if window and len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
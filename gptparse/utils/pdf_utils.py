@@ -1,6 +1,8 @@
 from PyPDF2 import PdfReader, PdfWriter
-from typing import List
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
 import io
+import pymupdf
 
 
 def split_pdf_into_chunks(pdf_path: str, chunk_size: int = 10) -> List[bytes]:
@@ -15,3 +17,119 @@ def split_pdf_into_chunks(pdf_path: str, chunk_size: int = 10) -> List[bytes]:
             writer.write(bytes_stream)
             chunks.append(bytes_stream.getvalue())
     return chunks
+
+
+def group_page_runs(pages: Iterable[int], max_run: int = 10) -> List[Tuple[int, int]]:
+    """Group page indices into inclusive (first, last) runs of consecutive pages.
+
+    Runs never exceed ``max_run`` pages and the original page order is preserved,
+    so rendering the runs in sequence yields the pages in the order requested.
+    """
+    runs = []
+    for page in pages:
+        if runs:
+            first, last = runs[-1]
+            if page == last + 1 and last - first + 1 < max_run:
+                runs[-1] = (first, page)
+                continue
+        runs.append((page, page))
+    return runs
+
+
+# Expected output characters for a page fully covered by images (a scan has
+# no text layer to measure), and per vector path segment (table rules, chart
+# lines), capped since large charts come back as a short description
+SCANNED_PAGE_CHARS = 2000
+DRAWING_ITEM_CHARS = 10
+MAX_DRAWING_ITEMS = 500
+
+
+@dataclass
+class PageProfile:
+    """Cheap content statistics for one PDF page, taken from its structure."""
+
+    page: int  # 0-based index
+    text_chars: int  # non-whitespace characters in the text layer
+    text_coverage: float  # fraction of the page covered by text blocks
+    image_coverage: float  # fraction of the page covered by raster images
+    drawing_items: int  # vector path segments (rules, table grids, charts)
+    garbled_ratio: float  # fraction of text that failed to map to Unicode
+
+    def needs_vision(
+        self,
+        min_text_chars: int = 50,
+        max_image_coverage: float = 0.25,
+        max_drawing_items: int = 40,
+        max_garbled_ratio: float = 0.05,
+    ) -> bool:
+        """Return True if the text layer alone is unlikely to capture the page."""
+        return (
+            self.text_chars < min_text_chars
+            or self.image_coverage > max_image_coverage
+            or self.drawing_items > max_drawing_items
+            or self.garbled_ratio > max_garbled_ratio
+        )
+
+    def expected_cost(self) -> float:
+        """Rough relative time to convert the page with a vision model.
+
+        A call's latency is dominated by its output, which grows with the
+        page's text and with the markup of tables and other drawings.
+        """
+        return (
+            self.text_chars
+            + SCANNED_PAGE_CHARS * self.image_coverage
+            + DRAWING_ITEM_CHARS * min(self.drawing_items, MAX_DRAWING_ITEMS)
+        )
+
+
+def profile_pages(
+    pdf_path: str, pages: Optional[Sequence[int]] = None
+) -> List[PageProfile]:
+    """Profile the given 0-based pages (all pages if None) without rendering."""
+    profiles = []
+    with pymupdf.open(pdf_path) as doc:
+        for index in pages if pages is not None else range(doc.page_count):
+            page = doc[index]
+            page_rect = page.rect
+            page_area = abs(page_rect) or 1.0
+
+            text = page.get_text("text")
+            text_chars = sum(not ch.isspace() for ch in text)
+            garbled = text.count("\ufffd")
+
+            text_area = 0.0
+            for block in page.get_text_blocks():
+                text_area += abs(pymupdf.Rect(block[:4]) & page_rect)
+
+            image_area = 0.0
+            for info in page.get_image_info():
+                image_area += abs(pymupdf.Rect(info["bbox"]) & page_rect)
+
+            drawing_items = sum(len(path["items"]) for path in page.get_drawings())
+
+            profiles.append(
+                PageProfile(
+                    page=index,
+                    text_chars=text_chars,
+                    text_coverage=min(1.0, text_area / page_area),
+                    image_coverage=min(1.0, image_area / page_area),
+                    drawing_items=drawing_items,
+                    garbled_ratio=garbled / text_chars if text_chars else 0.0,
+                )
+            )
+    return profiles
+
+
+def text_layer_pages(pdf_path: str, pages: Optional[Sequence[int]] = None) -> Set[int]:
+    """Return the given 0-based pages (all pages if None) that have any text.
+
+    A page with text in its text layer is never blank, however little ink it
+    puts on the page (a lone page number or signature line).
+    """
+    with pymupdf.open(pdf_path) as doc:
+        return {
+            index
+            for index in (pages if pages is not None else range(doc.page_count))
+            if doc[index].get_text("text").strip()
+        }
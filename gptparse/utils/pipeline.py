@@ -0,0 +1,225 @@
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import (
+    Callable,
+    Generic,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+from .parallel import ordered_map, process_context
+
+T = TypeVar("T")
+P = TypeVar("P")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+def _prepare_pair(prepare: Callable, pair: Tuple[Hashable, T]):
+    key, item = pair
+    return key, prepare(item)
+
+
+class _Packed:
+    """Keys of the items dispatched together in one packed call."""
+
+    def __init__(self, keys: Tuple[Hashable, ...]):
+        self.keys = keys
+
+
+class _Failure:
+    """Wraps an exception raised on a pipeline thread."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class PagePipeline(Generic[T, P, R]):
+    """Bounded producer/consumer pipeline for page processing.
+
+    A producer thread runs ``prepare`` (render, resize, encode) on each item and
+    feeds a queue holding at most ``queue_depth`` prepared items. A dispatcher
+    thread takes prepared items off the queue and runs ``dispatch`` (the model
+    call) with at most ``concurrency`` calls in flight. Preparation of later
+    pages therefore overlaps with network time for earlier ones. The pipeline
+    holds at most ``queue_depth + concurrency`` prepared pages, plus up to
+    ``2 * prepare_workers`` being prepared, rather than the page count; pages
+    buffered by ``items`` itself (such as a renderer working ahead) come on
+    top, so bound those at the source (see ``RenderConfig.render_ahead``).
+
+    With ``prepare_workers`` above one, ``prepare`` runs on a thread or process
+    pool (``prepare_executor``) and prepared items still enter the queue in
+    input order. A process pool requires ``prepare`` and the items to be
+    picklable.
+
+    ``lookup`` is called on the dispatcher thread, in input order, for every
+    prepared item before it is dispatched. Returning anything but None uses
+    that value as the item's result and skips ``dispatch`` for it.
+
+    With ``pack``, consecutive items that need dispatching are grouped while
+    ``pack(group, item)`` returns True, and ``dispatch`` is called with each
+    group (a list) and must return a list of results in the same order.
+    """
+
+    def __init__(
+        self,
+        prepare: Callable[[T], P],
+        dispatch: Callable[[P], R],
+        concurrency: int,
+        queue_depth: Optional[int] = None,
+        prepare_workers: int = 1,
+        prepare_executor: str = "thread",
+        lookup: Optional[Callable[[Hashable, P], Optional[R]]] = None,
+        pack: Optional[Callable[[List[P], P], bool]] = None,
+    ):
+        if prepare_executor not in ("thread", "process"):
+            raise ValueError(f"Unsupported prepare executor: {prepare_executor}")
+        self.prepare = prepare
+        self.dispatch = dispatch
+        self.concurrency = max(1, concurrency)
+        self.queue_depth = max(1, queue_depth or self.concurrency)
+        self.prepare_workers = max(1, prepare_workers or 1)
+        self.prepare_executor = prepare_executor
+        self.lookup = lookup
+        self.pack = pack
+
+    def _prepared(self, items: Iterable[Tuple[Hashable, T]]) -> Iterator[Tuple[Hashable, P]]:
+        """Run ``prepare`` over the items, on a pool if configured, in input order."""
+        if self.prepare_workers <= 1:
+            for key, item in items:
+                yield key, self.prepare(item)
+            return
+
+        executor = (
+            ProcessPoolExecutor(
+                max_workers=self.prepare_workers, mp_context=process_context()
+            )
+            if self.prepare_executor == "process"
+            else ThreadPoolExecutor(max_workers=self.prepare_workers)
+        )
+        try:
+            yield from ordered_map(
+                executor,
+                partial(_prepare_pair, self.prepare),
+                items,
+                window=self.prepare_workers * 2,
+            )
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, items: Iterable[Tuple[Hashable, T]]) -> Iterator[Tuple[Hashable, R]]:
+        """Process ``(key, item)`` pairs, yielding ``(key, result)`` as they complete.
+
+        The first exception raised by ``prepare`` or ``dispatch`` stops the
+        pipeline and is re-raised to the caller.
+        """
+        prepared = queue.Queue(maxsize=self.queue_depth)
+        results = queue.Queue()
+        stop = threading.Event()
+
+        def put(target: queue.Queue, item) -> bool:
+            # Block while the queue is full, but give up promptly once stopped
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for entry in self._prepared(items):
+                    if stop.is_set() or not put(prepared, entry):
+                        return
+            except BaseException as e:
+                results.put(_Failure(e))
+            finally:
+                put(prepared, _DONE)
+
+        def consume():
+            slots = threading.BoundedSemaphore(self.concurrency)
+            executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+            group_keys, group = [], []
+
+            def on_done(key, future: Future):
+                slots.release()
+                results.put((key, future))
+
+            def submit(key, item) -> bool:
+                slots.acquire()
+                if stop.is_set():
+                    return False
+                future = executor.submit(self.dispatch, item)
+                future.add_done_callback(lambda f, key=key: on_done(key, f))
+                return True
+
+            def flush() -> bool:
+                if not group:
+                    return True
+                keys, items = _Packed(tuple(group_keys)), list(group)
+                group_keys.clear()
+                group.clear()
+                return submit(keys, items)
+
+            try:
+                while not stop.is_set():
+                    try:
+                        entry = prepared.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    if entry is _DONE:
+                        flush()
+                        break
+                    key, item = entry
+                    if self.lookup is not None:
+                        found = self.lookup(key, item)
+                        if found is not None:
+                            future = Future()
+                            future.set_result(found)
+                            results.put((key, future))
+                            continue
+                    if self.pack is None:
+                        if not submit(key, item):
+                            break
+                        continue
+                    if group and not self.pack(group, item) and not flush():
+                        break
+                    group_keys.append(key)
+                    group.append(item)
+            except BaseException as e:
+                results.put(_Failure(e))
+            finally:
+                # Let in-flight calls finish before signalling the end
+                executor.shutdown(wait=True)
+                results.put(_DONE)
+
+        threads = [
+            threading.Thread(target=produce, daemon=True),
+            threading.Thread(target=consume, daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                entry = results.get()
+                if entry is _DONE:
+                    break
+                if isinstance(entry, _Failure):
+                    raise entry.error
+                key, future = entry
+                if isinstance(key, _Packed):
+                    yield from zip(key.keys, future.result())
+                else:
+                    yield key, future.result()
+        finally:
+            stop.set()
@@ -0,0 +1,273 @@
+import asyncio
+import math
+import re
+import threading
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+# Output tokens assumed per page until real usage has been observed
+DEFAULT_OUTPUT_TOKENS = 1000
+
+# Rate limit headers as (limit, remaining) pairs for requests and tokens
+_HEADER_NAMES = {
+    "requests": [
+        ("x-ratelimit-limit-requests", "x-ratelimit-remaining-requests"),
+        ("anthropic-ratelimit-requests-limit", "anthropic-ratelimit-requests-remaining"),
+    ],
+    "tokens": [
+        ("x-ratelimit-limit-tokens", "x-ratelimit-remaining-tokens"),
+        ("anthropic-ratelimit-tokens-limit", "anthropic-ratelimit-tokens-remaining"),
+    ],
+}
+
+
+def estimate_image_tokens(width: int, height: int, provider: str) -> int:
+    """Estimate the input tokens a provider charges for an image."""
+    if provider == "anthropic":
+        return math.ceil(width * height / 750)
+    if provider == "google":
+        # 258 tokens per 768x768 tile; small images count as a single tile
+        if width <= 384 and height <= 384:
+            return 258
+        return 258 * math.ceil(width / 768) * math.ceil(height / 768)
+
+    # OpenAI high detail: fit within 2048x2048, then shortest side to 768,
+    # and charge 170 tokens per 512px tile plus a base of 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def parse_rate_limit_headers(
+    headers: Optional[Mapping[str, str]],
+) -> Dict[str, Tuple[int, int]]:
+    """Extract ``{"requests"|"tokens": (limit, remaining)}`` from response headers."""
+    if not headers:
+        return {}
+    headers = {key.lower(): value for key, value in headers.items()}
+    parsed = {}
+    for kind, names in _HEADER_NAMES.items():
+        for limit_name, remaining_name in names:
+            try:
+                parsed[kind] = (int(headers[limit_name]), int(headers[remaining_name]))
+                break
+            except (KeyError, ValueError):
+                continue
+    return parsed
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Return True for HTTP 429 / quota errors from any provider SDK."""
+    status = getattr(error, "status_code", None) or getattr(
+        getattr(error, "response", None), "status_code", None
+    )
+    return status == 429 or type(error).__name__ in (
+        "RateLimitError",
+        "ResourceExhausted",
+        "TooManyRequests",
+    )
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds to wait according to a rate limit error's Retry-After header."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after")
+    if value is None:
+        match = re.search(r"retry in ([\d.]+)s", str(error), re.IGNORECASE)
+        value = match.group(1) if match else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """Budget of ``per_minute`` units, refilled continuously over a minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self._updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / 60
+
+    def refill(self, now: float):
+        self.available = min(
+            self.capacity, self.available + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` units are available (after ``refill``)."""
+        # Requests larger than the whole budget only wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def consume(self, amount: float):
+        self.available -= min(amount, self.capacity)
+
+    def sync(self, limit: int, remaining: int):
+        """Align the bucket with limits reported by the provider."""
+        self.capacity = min(self.capacity, float(limit))
+        self.available = min(self.available, float(remaining))
+
+
+class RateLimiter:
+    """Paces model calls for one provider/model.
+
+    Calls wait for room in the requests-per-minute and tokens-per-minute
+    budgets, which come from the given limits and/or the provider's rate
+    limit response headers. Concurrency is left to the caller until the first
+    rate limit error; from then on in-flight calls are capped by a window that
+    halves once per burst of rate limit errors and grows by one slot per
+    window's worth of successes (AIMD), so concurrency settles just under the
+    real quota.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        min_concurrency: int = 1,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.min_concurrency = max(1, min_concurrency)
+        self.window: Optional[float] = None  # no cap until rate limited
+        self.in_flight = 0
+        self.output_tokens = float(DEFAULT_OUTPUT_TOKENS)
+        self._resume_at = 0.0
+        self._condition = threading.Condition()
+
+    def estimate(self, input_tokens: int) -> int:
+        """Estimate a call's total tokens from its input and typical output."""
+        return int(input_tokens + self.output_tokens)
+
+    def _try_acquire(self, tokens: float) -> Optional[float]:
+        """Take a slot and budget, or return how long to wait before retrying."""
+        now = time.monotonic()
+        if now < self._resume_at:
+            return self._resume_at - now
+        if self.window is not None and self.in_flight >= int(self.window):
+            return None
+
+        waits = []
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is not None:
+                bucket.refill(now)
+                waits.append(bucket.wait_time(amount))
+        if any(waits):
+            return max(waits)
+
+        if self.requests is not None:
+            self.requests.consume(1)
+        if self.tokens is not None:
+            self.tokens.consume(tokens)
+        self.in_flight += 1
+        return 0.0
+
+    def acquire(self, tokens: float = 0):
+        """Block until a call estimated at ``tokens`` may start."""
+        with self._condition:
+            while True:
+                wait = self._try_acquire(tokens)
+                if wait == 0.0:
+                    return
+                self._condition.wait(wait)
+
+    def try_acquire(self, tokens: float = 0) -> bool:
+        """Start a call estimated at ``tokens`` only if it needn't wait."""
+        with self._condition:
+            return self._try_acquire(tokens) == 0.0
+
+    async def aacquire(self, tokens: float = 0):
+        """Async counterpart of ``acquire()``; never blocks the event loop."""
+        while True:
+            with self._condition:
+                wait = self._try_acquire(tokens)
+            if wait == 0.0:
+                return
+            await asyncio.sleep(min(wait, 1.0) if wait is not None else 0.05)
+
+    def release(
+        self,
+        estimated: float = 0,
+        used: Optional[int] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        rate_limited: bool = False,
+        retry_after: Optional[float] = None,
+        failed: bool = False,
+    ):
+        """Finish a call, feeding back its real usage and outcome."""
+        with self._condition:
+            calls = self.in_flight
+            self.in_flight -= 1
+            if used is not None:
+                if self.tokens is not None:
+                    self.tokens.available -= used - estimated
+            for kind, (limit, remaining) in parse_rate_limit_headers(headers).items():
+                bucket = getattr(self, kind)
+                if bucket is None:
+                    bucket = TokenBucket(limit)
+                    setattr(self, kind, bucket)
+                bucket.refill(time.monotonic())
+                bucket.sync(limit, remaining)
+
+            if rate_limited:
+                # Calls in flight when the quota ran out all come back rate
+                # limited; no call starts during the pause, so errors before
+                # it ends belong to the same congestion event and halve once
+                if time.monotonic() >= self._resume_at:
+                    self.window = max(self.min_concurrency, (self.window or calls) / 2)
+                pause = retry_after if retry_after is not None else 60 / max(
+                    1, self.requests.capacity if self.requests else 60
+                )
+                self._resume_at = max(self._resume_at, time.monotonic() + pause)
+            elif not failed and self.window is not None:
+                self.window += 1 / self.window
+            self._condition.notify_all()
+
+    def record_output(self, output_tokens: int):
+        """Track typical output size to improve future estimates."""
+        with self._condition:
+            self.output_tokens = 0.8 * self.output_tokens + 0.2 * output_tokens
+
+
+_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    provider: str,
+    model: str,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+) -> RateLimiter:
+    """Return the process-wide limiter for a provider/model.
+
+    Documents converted at the same time share the limiter, and so the quota.
+    Limits that differ from the limiter's current ones replace them.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get((provider, model))
+        if limiter is None:
+            limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+            _limiters[(provider, model)] = limiter
+            return limiter
+
+    with limiter._condition:
+        if requests_per_minute and requests_per_minute != limiter.requests_per_minute:
+            limiter.requests_per_minute = requests_per_minute
+            limiter.requests = TokenBucket(requests_per_minute)
+        if tokens_per_minute and tokens_per_minute != limiter.tokens_per_minute:
+            limiter.tokens_per_minute = tokens_per_minute
+            limiter.tokens = TokenBucket(tokens_per_minute)
+    return limiter
@@ -1,4 +1,14 @@
+import asyncio
+from types import SimpleNamespace
+import httpx
 import pytest
+from gptparse.models import base
+from gptparse.models.base import (
+    LLMProvider,
+    SessionConfig,
+    close_http_client,
+    get_http_client,
+)
 from gptparse.models.providers.openai_provider import OpenAIProvider
 from gptparse.models.providers.anthropic_provider import AnthropicProvider
 from gptparse.models.types import LLMResponse
@@ -183,3 +193,128 @@ async def test_google_with_image_input(google_provider):
         key in response.usage
         for key in ["prompt_tokens", "completion_tokens", "total_tokens"]
     )
+
+
+class _SlowCompletions:
+    """Async stand-in for the OpenAI completions API."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+
+    async def create(self, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+            usage=SimpleNamespace(
+                prompt_tokens=1, completion_tokens=1, total_tokens=2
+            ),
+        )
+
+
+@pytest.mark.asyncio
+async def test_batch_complete_runs_requests_concurrently():
+    completions = _SlowCompletions(delay=0.1)
+
+    class FakeOpenAIProvider(OpenAIProvider):
+        def _create_client(self, http_client):
+            return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    provider = FakeOpenAIProvider(model="gpt-4o")
+    messages = [[{"role": "user", "content": f"Hello {i}"}] for i in range(8)]
+    responses = await provider.batch_complete(messages, max_concurrency=4)
+
+    assert [response.content for response in responses] == ["ok"] * 8
+    assert completions.max_active == 4
+
+
+@pytest.mark.asyncio
+async def test_anthropic_fetches_url_images_concurrently(monkeypatch):
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return httpx.Response(
+            200, content=b"png-bytes", headers={"content-type": "image/png"}
+        )
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(base, "get_http_client", lambda *args: http_client)
+
+    provider = AnthropicProvider(model="claude-3-5-sonnet-20241022")
+    messages = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "image", "source": {"type": "url", "data": f"https://x/{i}.png"}}
+                for i in range(3)
+            ],
+        }
+    ]
+    images = await provider._fetch_images(messages)
+    converted = provider._convert_messages(messages, images)
+
+    assert peak == 3
+    sources = [part["source"] for part in converted[0]["content"]]
+    assert {source["media_type"] for source in sources} == {"image/png"}
+    await http_client.aclose()
+
+
+def test_anthropic_converts_url_images_without_prefetch(monkeypatch):
+    fetched = []
+
+    def get(url, **kwargs):
+        fetched.append(url)
+        return httpx.Response(
+            200,
+            content=b"png-bytes",
+            headers={"content-type": "image/png"},
+            request=httpx.Request("GET", url),
+        )
+
+    monkeypatch.setattr(httpx, "get", get)
+    provider = AnthropicProvider(model="claude-3-5-sonnet-20241022")
+    messages = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "image", "source": {"type": "url", "data": "https://x/a.png"}}
+            ],
+        }
+    ]
+    (converted,) = provider._convert_messages(messages)
+    assert fetched == ["https://x/a.png"]
+    assert converted["content"][0]["source"]["media_type"] == "image/png"
+
+
+@pytest.mark.asyncio
+async def test_http_clients_are_shared_per_timeout():
+    default = get_http_client()
+    assert get_http_client(SessionConfig()) is default
+    slow = get_http_client(SessionConfig(timeout=300))
+    assert slow is not default
+    assert slow.timeout.read == 300
+
+    await close_http_client()
+    assert default.is_closed and slow.is_closed
+
+
+def test_providers_must_build_a_client():
+    class NoClientProvider(LLMProvider):
+        def _convert_messages(self, messages):
+            return messages
+
+        async def complete(self, messages, **kwargs):
+            return None
+
+    with pytest.raises(TypeError):
+        NoClientProvider(model="test")
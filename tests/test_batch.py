@@ -0,0 +1,187 @@
+import json
+import pymupdf
+import pytest
+from langchain_core.messages import HumanMessage
+from gptparse.models.batch import (
+    AnthropicBatchBackend,
+    BatchResult,
+    LocalBatchBackend,
+    OpenAIBatchBackend,
+)
+from gptparse.modes.batch import batch_status, collect_batch, submit_batch
+from gptparse.modes.vision import VisionOptions, prompt_message
+
+
+def make_pdf(path, texts):
+    doc = pymupdf.open()
+    for text in texts:
+        page = doc.new_page(width=612, height=792)
+        if text:
+            page.insert_textbox(pymupdf.Rect(72, 72, 540, 720), text, fontsize=14)
+    doc.save(str(path))
+    return str(path)
+
+
+def echo_page(request):
+    prompt = request["messages"][0]["content"][0]["text"]
+    return BatchResult(
+        content=f"# {request['custom_id']}", input_tokens=len(prompt), output_tokens=3
+    )
+
+
+def test_local_batch_round_trip(tmp_path):
+    boilerplate = "Disclaimer " + "boilerplate " * 40
+    first = make_pdf(tmp_path / "a.pdf", ["Alpha " * 60, "", boilerplate, boilerplate])
+    second = make_pdf(tmp_path / "b.pdf", ["Beta " * 60])
+    job_dir = str(tmp_path / "job")
+    backend = LocalBatchBackend(root=str(tmp_path / "jobs"), responder=echo_page)
+
+    manifest = submit_batch(
+        [first, second],
+        job_dir,
+        provider="local",
+        output_dir=str(tmp_path / "out"),
+        render_workers=1,
+        dedupe_pages=True,
+        backend=backend,
+    )
+    assert len(manifest.jobs) == 1
+    with open(tmp_path / "job" / "manifest.json") as f:
+        assert json.load(f)["jobs"] == manifest.jobs
+
+    outputs = collect_batch(job_dir, backend=backend)
+    assert batch_status(job_dir, backend=backend) == {manifest.jobs[0]: "completed"}
+    assert [len(output.pages) for output in outputs] == [4, 1]
+
+    pages = outputs[0].pages
+    assert [page.content for page in pages] == ["# 0-0", "", "# 0-2", "# 0-2"]
+    assert pages[1].skipped
+    assert pages[3].duplicate_of == 3
+    assert outputs[0].output_tokens == 6
+    assert outputs[1].pages[0].content == "# 1-0"
+    assert "# 1-0" in (tmp_path / "out" / "00001-b.md").read_text()
+
+
+def test_batch_reports_failed_pages(tmp_path):
+    path = make_pdf(tmp_path / "a.pdf", ["One " * 60, "Two " * 60])
+
+    def fail_second(request):
+        if request["custom_id"].endswith("-1"):
+            return BatchResult(error="overloaded")
+        return echo_page(request)
+
+    backend = LocalBatchBackend(root=str(tmp_path / "jobs"), responder=fail_second)
+    submit_batch([path], str(tmp_path / "job"), provider="local", backend=backend)
+    (output,) = collect_batch(str(tmp_path / "job"), backend=backend)
+    assert output.error is None
+    assert output.pages[0].content == "# 0-0"
+    assert output.pages[1].error == "overloaded"
+
+
+def test_batch_reports_pages_of_failed_jobs(tmp_path):
+    path = make_pdf(tmp_path / "a.pdf", ["One " * 60, "Two " * 60])
+    backend = LocalBatchBackend(root=str(tmp_path / "jobs"), responder=echo_page)
+    manifest = submit_batch(
+        [path], str(tmp_path / "job"), provider="local", backend=backend
+    )
+    (tmp_path / "jobs" / manifest.jobs[0] / "requests.jsonl").unlink()
+
+    (output,) = collect_batch(str(tmp_path / "job"), backend=backend)
+    assert [page.error for page in output.pages] == ["no result"] * 2
+
+
+@pytest.mark.parametrize("backend_class", [OpenAIBatchBackend, AnthropicBatchBackend])
+def test_provider_request_formats(monkeypatch, backend_class):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    backend = backend_class("model-x")
+    messages = [
+        prompt_message("Convert", cache_prompt=backend_class is AnthropicBatchBackend),
+        HumanMessage(
+            content=[
+                {"type": "image_url", "image_url": {"url": "data:image/png;base64,AAAA"}},
+            ]
+        ),
+    ]
+    request = backend.build_request("0-1", messages)
+    assert request["custom_id"] == "0-1"
+    if backend_class is OpenAIBatchBackend:
+        assert request["url"] == "/v1/chat/completions"
+        system, user = request["body"]["messages"]
+        assert system == {"role": "system", "content": [{"type": "text", "text": "Convert"}]}
+        assert user["content"][0]["image_url"]["url"].endswith("AAAA")
+    else:
+        assert request["params"]["system"] == [
+            {"type": "text", "text": "Convert", "cache_control": {"type": "ephemeral"}}
+        ]
+        (image,) = request["params"]["messages"][0]["content"]
+        assert image["source"] == {
+            "type": "base64",
+            "media_type": "image/png",
+            "data": "AAAA",
+        }
+
+
+def test_batch_submits_jobs_as_they_fill(tmp_path):
+    path = make_pdf(tmp_path / "a.pdf", [f"Page {i} " * 60 for i in range(5)])
+    job_dir = tmp_path / "job"
+    backend = LocalBatchBackend(root=str(tmp_path / "jobs"), responder=echo_page)
+    backend.max_requests = 2
+    submitted = []
+    submit = backend.submit
+
+    def record_submit(requests):
+        # Each job goes out as soon as it is full, before later pages exist
+        submitted.append([request["custom_id"] for request in requests])
+        return submit(requests)
+
+    backend.submit = record_submit
+    with pytest.raises(FileNotFoundError):
+        submit_batch(
+            [path, str(tmp_path / "missing.pdf")],
+            str(job_dir),
+            provider="local",
+            render_workers=1,
+            backend=backend,
+        )
+    assert submitted == [["0-0", "0-1"], ["0-2", "0-3"]]
+
+    # Jobs submitted before the failure are recorded; the rest of the pages
+    # come back as failed
+    with open(job_dir / "manifest.json") as f:
+        assert len(json.load(f)["jobs"]) == 2
+    (output,) = collect_batch(str(job_dir), backend=backend)
+    assert [page.content for page in output.pages[:4]] == [
+        "# 0-0",
+        "# 0-1",
+        "# 0-2",
+        "# 0-3",
+    ]
+    assert output.pages[4].error == "no result"
+
+
+def test_batch_submit_takes_vision_options(tmp_path):
+    path = make_pdf(tmp_path / "a.pdf", ["One " * 60, "One " * 60])
+    requests = []
+
+    def record(request):
+        requests.append(request)
+        return echo_page(request)
+
+    backend = LocalBatchBackend(root=str(tmp_path / "jobs"), responder=record)
+    options = VisionOptions(render_workers=1, dedupe_pages=True, image_format="jpeg")
+    submit_batch(
+        [path], str(tmp_path / "job"), provider="local", backend=backend, options=options
+    )
+    (output,) = collect_batch(str(tmp_path / "job"), backend=backend)
+    assert output.pages[1].duplicate_of == 1
+    assert len(requests) == 1
+    image = requests[0]["messages"][1]["content"][-1]
+    assert "image/jpeg" in json.dumps(image)
+
+
+def test_batch_submit_rejects_unknown_models(tmp_path):
+    path = make_pdf(tmp_path / "a.pdf", ["One " * 60])
+    with pytest.raises(ValueError, match="Unsupported model for openai"):
+        submit_batch([path], str(tmp_path / "job"), model="gpt-4-typo")
+    assert not (tmp_path / "job").exists()
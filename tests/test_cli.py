@@ -1,5 +1,7 @@
 from click.testing import CliRunner
 from gptparse.cli import main
+from gptparse.modes import auto as auto_mode
+from gptparse.outputs import GPTParseOutput
 
 
 def test_main_command():
@@ -16,3 +18,32 @@ def test_vision_command_help():
     assert (
         "Convert PDF to Markdown using OCR and vision language models" in result.output
     )
+
+
+def test_auto_command_passes_vision_options(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_auto(**kwargs):
+        calls.append(kwargs)
+        return GPTParseOutput(
+            file_path=kwargs["file_path"],
+            provider="openai",
+            model="gpt-4o",
+            completion_time=0,
+            input_tokens=0,
+            output_tokens=0,
+            pages=[],
+        )
+
+    monkeypatch.setattr(auto_mode, "auto", fake_auto)
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1.4")
+    runner = CliRunner()
+    result = runner.invoke(
+        main,
+        ["auto", str(path), "--image_format", "jpeg", "--pages_per_request", "3"],
+    )
+    assert result.exit_code == 0, result.output
+    (kwargs,) = calls
+    assert kwargs["options"].image_format == "jpeg"
+    assert kwargs["options"].pages_per_request == 3
@@ -0,0 +1,175 @@
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from PyPDF2 import PdfWriter
+from gptparse.handlers import get_handler, PDFHandler, RenderConfig
+from gptparse.handlers.rasterizers import get_rasterizer
+from gptparse.utils.cache import PageImageCache
+from gptparse.utils.image_utils import fit_dpi
+from gptparse.utils.parallel import ordered_map
+from gptparse.utils.pdf_utils import group_page_runs
+
+
+def make_pdf(path, pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=612, height=792)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def test_group_page_runs():
+    assert group_page_runs([0, 1, 2, 5, 6, 9], max_run=10) == [(0, 2), (5, 6), (9, 9)]
+    assert group_page_runs(range(5), max_run=2) == [(0, 1), (2, 3), (4, 4)]
+    assert group_page_runs([3, 2, 1]) == [(3, 3), (2, 2), (1, 1)]
+
+
+def test_pdf_page_count_does_not_render(tmp_path, monkeypatch):
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 12)
+    handler = get_handler(pdf_path)
+    assert isinstance(handler, PDFHandler)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("page_count must not render pages")
+
+    monkeypatch.setattr(handler, "_render_range", fail)
+    assert handler.page_count == 12
+
+
+def test_pdf_renders_only_selected_pages(tmp_path, monkeypatch):
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 30)
+    handler = get_handler(pdf_path, RenderConfig(workers=1))
+    rendered = []
+
+    def fake_render(run):
+        first, last = run
+        rendered.append(run)
+        return list(range(first, last + 1))
+
+    monkeypatch.setattr(handler, "_render_range", fake_render)
+    assert list(handler.iter_images([0, 1, 2, 20])) == [0, 1, 2, 20]
+    assert rendered == [(0, 2), (20, 20)]
+    assert handler.get_image(7) == 7
+
+
+def test_ordered_map_preserves_input_order():
+    def slow_square(x):
+        time.sleep(0.01 * (5 - x))
+        return x * x
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(ordered_map(executor, slow_square, range(5), window=2)) == [
+            0,
+            1,
+            4,
+            9,
+            16,
+        ]
+
+
+def test_get_rasterizer():
+    assert get_rasterizer("auto").name == "pymupdf"
+    assert get_rasterizer("pdf2image").name == "pdf2image"
+    with pytest.raises(ValueError):
+        get_rasterizer("ghostscript")
+
+
+def test_pymupdf_renders_requested_pages(tmp_path):
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 3)
+    handler = get_handler(pdf_path, RenderConfig(workers=1, dpi=72, rasterizer="pymupdf"))
+    images = list(handler.iter_images([2, 0]))
+    assert handler.page_count == 3
+    assert [image.size for image in images] == [(612, 792), (612, 792)]
+
+
+def test_pymupdf_renders_at_target_size(tmp_path):
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 1)
+    handler = get_handler(pdf_path, RenderConfig(workers=1, max_size=1024))
+    assert max(handler.get_image(0).size) == 1024
+
+
+def test_fit_dpi():
+    assert fit_dpi(612, 792, 1024, 300) == pytest.approx(1024 * 72 / 792)
+    # Small pages are never rendered above the configured resolution
+    assert fit_dpi(100, 100, 1024, 300) == 300
+    assert fit_dpi(612, 792, None, 300) == 300
+
+
+def test_page_cache_skips_rendering_on_repeat_runs(tmp_path, monkeypatch):
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 4)
+    config = RenderConfig(workers=1, dpi=36, cache_dir=str(tmp_path / "cache"))
+
+    first = list(get_handler(pdf_path, config).iter_images([0, 2, 2]))
+
+    handler = get_handler(pdf_path, config)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached pages must not be rendered")
+
+    monkeypatch.setattr(handler, "_render_range", fail)
+    second = list(handler.iter_images([0, 2, 2]))
+    assert [image.tobytes() for image in second] == [
+        image.tobytes() for image in first
+    ]
+
+
+def test_page_cache_evicts_least_recently_used(tmp_path):
+    cache = PageImageCache(str(tmp_path), max_bytes=10**9)
+    for key in ("aa", "bb", "cc"):
+        cache.put(key, Image.new("RGB", (64, 64), "white"))
+        time.sleep(0.01)
+    cache.get("aa")
+
+    entry_size = cache.size() // 3
+    cache.evict(target_bytes=entry_size * 2)
+    assert cache.contains("aa") and cache.contains("cc")
+    assert not cache.contains("bb")
+
+
+def test_render_ahead_bounds_buffered_pages(tmp_path, monkeypatch):
+    from gptparse.handlers import pdf_handler
+
+    calls = []
+
+    def recording_map(executor, fn, runs, window=None):
+        calls.append((list(runs), window))
+        return ordered_map(executor, fn, runs, window=window)
+
+    monkeypatch.setattr(pdf_handler, "ordered_map", recording_map)
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 40)
+    handler = get_handler(
+        pdf_path, RenderConfig(workers=4, max_size=64, render_ahead=8)
+    )
+    assert len(list(handler.iter_images())) == 40
+
+    ((runs, window),) = calls
+    chunk_size = max(last - first + 1 for first, last in runs)
+    assert chunk_size * window <= 8
+
+
+def test_documents_share_one_non_forking_render_pool():
+    from gptparse.utils.parallel import shared_process_pool
+
+    pool = shared_process_pool()
+    assert shared_process_pool() is pool
+    assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+
+
+def test_pdf_renders_on_threads_unless_process_pool_requested(tmp_path, monkeypatch):
+    from gptparse.handlers import pdf_handler
+
+    def no_process_pool():
+        raise AssertionError("rendered on the process pool")
+
+    monkeypatch.setattr(pdf_handler, "shared_process_pool", no_process_pool)
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 30)
+    handler = get_handler(pdf_path, RenderConfig(workers=4, max_size=64, chunk_size=5))
+    assert len(list(handler.iter_images())) == 30
+
+    handler = get_handler(
+        pdf_path, RenderConfig(workers=4, max_size=64, chunk_size=5, executor="process")
+    )
+    with pytest.raises(AssertionError, match="process pool"):
+        list(handler.iter_images())
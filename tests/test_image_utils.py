@@ -0,0 +1,77 @@
+import base64
+import io
+import random
+import pytest
+from PIL import Image, ImageDraw
+from gptparse.utils.image_utils import (
+    EncodeConfig,
+    encode_image,
+    is_blank,
+    is_grayscale,
+    page_fingerprint,
+)
+
+
+def text_page(color="black"):
+    image = Image.new("RGB", (800, 1000), "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(40, 960, 20):
+        draw.text((40, y), "Lorem ipsum dolor sit amet " * 4, fill=color)
+    return image
+
+
+def noisy_page():
+    rng = random.Random(0)
+    return Image.frombytes("RGB", (600, 600), bytes(rng.randrange(256) for _ in range(600 * 600 * 3)))
+
+
+def decode(data):
+    return Image.open(io.BytesIO(base64.b64decode(data)))
+
+
+def test_is_grayscale():
+    assert is_grayscale(text_page())
+    assert not is_grayscale(text_page(color="red"))
+
+
+def test_encode_image_formats_and_grayscale():
+    data, media_type = encode_image(text_page(), EncodeConfig(format="jpeg"))
+    assert media_type == "image/jpeg"
+    assert decode(data).mode == "L"
+
+    data, media_type = encode_image(
+        text_page(color="red"), EncodeConfig(format="webp")
+    )
+    assert media_type == "image/webp"
+    assert decode(data).mode == "RGB"
+
+    with pytest.raises(ValueError):
+        encode_image(text_page(), EncodeConfig(format="gif"))
+
+
+def test_encode_image_fits_byte_budget():
+    config = EncodeConfig(format="jpeg", max_bytes=60_000, min_size=128)
+    data, _ = encode_image(noisy_page(), config)
+    assert len(base64.b64decode(data)) <= 60_000
+
+
+def test_blank_and_fingerprint_detection():
+    blank = Image.new("RGB", (800, 1000), "white")
+    assert is_blank(blank)
+    assert not is_blank(text_page())
+
+    # A lone signature line is content; a few specks of scanner dust are not
+    signature = Image.new("RGB", (800, 1000), "white")
+    ImageDraw.Draw(signature).text(
+        (80, 900), "Signed: ____________  Date: ________", fill="black"
+    )
+    assert not is_blank(signature)
+    specks = Image.new("RGB", (800, 1000), (245, 245, 245))
+    for x, y in [(100, 200), (400, 650), (700, 90)]:
+        specks.putpixel((x, y), (40, 40, 40))
+    assert is_blank(specks)
+
+    assert page_fingerprint(text_page()).matches(page_fingerprint(text_page()))
+    other = text_page()
+    ImageDraw.Draw(other).rectangle((0, 0, 800, 300), fill="white")
+    assert not page_fingerprint(text_page()).matches(page_fingerprint(other))
@@ -0,0 +1,69 @@
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from gptparse.models import model_interface
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(model_interface, "_models", {})
+    monkeypatch.setattr(model_interface, "_loop_models", weakref.WeakKeyDictionary())
+    monkeypatch.setattr(model_interface, "_loop_closers", weakref.WeakKeyDictionary())
+    monkeypatch.setattr(model_interface, "_http_clients", {})
+
+
+def test_get_model_reuses_clients(monkeypatch):
+    model = model_interface.get_model("openai", "gpt-4o", pool_size=4)
+    with ThreadPoolExecutor(8) as pool:
+        models = list(
+            pool.map(
+                lambda _: model_interface.get_model("openai", "gpt-4o", pool_size=4),
+                range(32),
+            )
+        )
+    assert all(other is model for other in models)
+
+    # Other models and settings get their own client, sharing the HTTP pool
+    other = model_interface.get_model("openai", "gpt-4o-mini", pool_size=4)
+    assert other is not model and other.http_client is model.http_client
+    seeded = model_interface.get_model("openai", "gpt-4o", pool_size=4, seed=1)
+    assert seeded is not model
+    larger = model_interface.get_model("openai", "gpt-4o", pool_size=8)
+    assert larger.http_client is not model.http_client
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-rotated")
+    assert model_interface.get_model("openai", "gpt-4o", pool_size=4) is not model
+
+
+def test_get_model_keeps_async_clients_per_event_loop():
+    async def get_model():
+        loop = asyncio.get_running_loop()
+        model = model_interface.get_model("openai", "gpt-4o", event_loop=loop)
+        assert model_interface.get_model("openai", "gpt-4o", event_loop=loop) is model
+        return model
+
+    first, second = asyncio.run(get_model()), asyncio.run(get_model())
+    assert first is not second
+    assert first.http_async_client is not second.http_async_client
+    assert model_interface.get_model("openai", "gpt-4o") not in (first, second)
+
+
+def test_async_clients_are_closed_with_their_event_loop():
+    async def get_model():
+        loop = asyncio.get_running_loop()
+        # From a worker thread, as setup_vision() does
+        return await loop.run_in_executor(
+            None,
+            lambda: model_interface.get_model("openai", "gpt-4o", event_loop=loop),
+        )
+
+    model = asyncio.run(get_model())
+    assert model.http_async_client.is_closed
+
+
+def test_http_pool_is_capped_at_pool_size():
+    model = model_interface.get_model("openai", "gpt-4o", pool_size=4)
+    pool = model.http_client._transport._pool
+    assert pool._max_connections == 4
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from gptparse.utils.ratelimit import (
+    RateLimiter,
+    TokenBucket,
+    estimate_image_tokens,
+    is_rate_limit_error,
+    parse_rate_limit_headers,
+)
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(per_minute=600)  # 10 per second
+    now = time.monotonic()
+    bucket.refill(now)
+    bucket.consume(600)
+    assert bucket.wait_time(5) == 0.5
+    bucket.refill(now + 0.5)
+    assert bucket.wait_time(5) == 0.0
+    # Oversized requests only wait for a full bucket
+    assert bucket.wait_time(10_000) > 0
+
+
+def test_rate_limiter_paces_requests():
+    limiter = RateLimiter(requests_per_minute=1200)  # 20 per second
+    limiter.requests.available = 0
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release()
+    assert time.monotonic() - start >= 0.15
+
+
+def test_rate_limiter_aimd_window():
+    limiter = RateLimiter()
+    for _ in range(8):
+        limiter.acquire()
+    assert limiter.window is None
+
+    limiter.release(rate_limited=True, retry_after=0)
+    assert limiter.window == 4
+    for _ in range(7):
+        limiter.release(used=100)
+    assert 4 < limiter.window < 6
+
+    # Only window-many calls may be in flight now
+    for _ in range(int(limiter.window)):
+        assert limiter._try_acquire(0) == 0.0
+    assert limiter._try_acquire(0) is None
+
+
+def test_rate_limiter_halves_once_per_burst():
+    limiter = RateLimiter()
+    for _ in range(8):
+        limiter.acquire()
+
+    # Every call in flight hits the same exhausted quota
+    for _ in range(8):
+        limiter.release(rate_limited=True, retry_after=30)
+    assert limiter.window == 4
+
+    # A rate limit error after the pause is a new congestion event
+    limiter._resume_at = 0.0
+    limiter.acquire()
+    limiter.release(rate_limited=True, retry_after=30)
+    assert limiter.window == 2
+
+
+def test_rate_limiter_syncs_with_headers():
+    limiter = RateLimiter()
+    limiter.acquire(500)
+    limiter.release(
+        500,
+        used=450,
+        headers={
+            "x-ratelimit-limit-requests": "500",
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-limit-tokens": "30000",
+            "x-ratelimit-remaining-tokens": "29000",
+        },
+    )
+    assert limiter.requests.capacity == 500
+    assert limiter.tokens.available <= 29000
+
+    async def acquire():
+        await asyncio.wait_for(limiter.aacquire(), timeout=0.5)
+
+    # No requests left; the next one has to wait for the bucket to refill
+    start = time.monotonic()
+    asyncio.run(acquire())
+    assert time.monotonic() - start >= 0.1
+
+
+def test_helpers():
+    assert parse_rate_limit_headers(
+        {
+            "anthropic-ratelimit-tokens-limit": "80000",
+            "anthropic-ratelimit-tokens-remaining": "79000",
+        }
+    ) == {"tokens": (80000, 79000)}
+    assert is_rate_limit_error(RateLimited())
+    assert not is_rate_limit_error(ValueError())
+    assert estimate_image_tokens(791, 1024, "openai") == 85 + 170 * 4
+    assert estimate_image_tokens(791, 1024, "anthropic") == 1080
+    assert estimate_image_tokens(300, 300, "google") == 258
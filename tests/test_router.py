@@ -0,0 +1,68 @@
+from collections import Counter
+import pytest
+from gptparse.models.router import (
+    ModelRouter,
+    RouteTarget,
+    format_targets,
+    is_failover_error,
+    parse_targets,
+)
+from gptparse.utils.ratelimit import RateLimiter
+
+
+class ServerError(Exception):
+    status_code = 500
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+def make_router(*weights):
+    return ModelRouter(
+        [
+            RouteTarget(f"provider{i}", "model", None, RateLimiter(), weight=weight)
+            for i, weight in enumerate(weights)
+        ]
+    )
+
+
+def test_parse_targets():
+    targets = parse_targets("openai/gpt-4o-mini=2, anthropic,google=0.5")
+    assert targets == [
+        ("openai", "gpt-4o-mini", 2.0),
+        ("anthropic", "claude-3-5-sonnet-latest", 1.0),
+        ("google", "gemini-1.5-pro-002", 0.5),
+    ]
+    assert parse_targets(format_targets(targets)) == targets
+    for spec in ("", "mistral", "openai=-1", "openai=x"):
+        with pytest.raises(ValueError):
+            parse_targets(spec)
+
+
+def test_failover_errors():
+    assert is_failover_error(ServerError())
+    assert not is_failover_error(BadRequest())
+
+
+def test_router_balances_by_weight_and_latency():
+    router = make_router(3, 1)
+    counts = Counter(router.choose().provider for _ in range(4000))
+    assert 2600 < counts["provider0"] < 3400
+
+    # Equal weights, but the first target answers four times slower
+    router = make_router(1, 1)
+    router.record(router.targets[0], latency=4.0)
+    router.record(router.targets[1], latency=1.0)
+    counts = Counter(router.choose().provider for _ in range(4000))
+    assert counts["provider1"] > 2 * counts["provider0"]
+
+
+def test_router_avoids_failing_targets():
+    router = make_router(1, 1)
+    first, second = router.targets
+    router.record(first, error=ServerError())
+    assert all(router.choose() is second for _ in range(100))
+    # Excluded targets are only picked when nothing else is left
+    assert router.choose(exclude=[second]) is first
+    assert router.choose(exclude=[first, second]) in (first, second)
@@ -0,0 +1,773 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from langchain_core.messages import AIMessage
+import pymupdf
+from PIL import Image
+import pymupdf4llm
+from gptparse.models import model_interface
+from gptparse.modes.auto import auto
+from gptparse.modes.fast import clean_markdown_content, fast, iter_fast
+from gptparse.modes.hybrid import hybrid
+from gptparse.modes import hybrid as hybrid_mode
+from gptparse.modes import vision as vision_mode
+from gptparse.modes.vision import (
+    avision,
+    cached_input_tokens,
+    iter_vision,
+    parse_page_selection,
+    prepare_messages,
+    response_cache_key,
+    vision,
+)
+from gptparse.utils import journal, ratelimit
+from gptparse.utils.pipeline import PagePipeline
+
+
+class FakeModel:
+    """Stands in for a langchain chat model, echoing a counter per call."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def invoke(self, messages, config=None, **kwargs):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+            self.requests.append((messages, kwargs))
+        return self._response(config)
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            return self._response(config)
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.calls += 1
+
+    @staticmethod
+    def _response(config):
+        for callback in (config or {}).get("callbacks", []):
+            callback.on_llm_end(None, run_id=None)
+        return AIMessage(
+            content="# Page",
+            usage_metadata={"input_tokens": 10, "output_tokens": 5, "total_tokens": 15},
+        )
+
+
+def make_pdf(path, texts):
+    doc = pymupdf.open()
+    for text in texts:
+        page = doc.new_page(width=612, height=792)
+        if text:
+            page.insert_textbox(pymupdf.Rect(72, 72, 540, 720), text, fontsize=14)
+    doc.save(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    texts = [f"Page {i} " + "lorem ipsum dolor sit amet " * 40 for i in range(6)]
+    return make_pdf(tmp_path / "doc.pdf", texts)
+
+
+@pytest.fixture
+def fake_model(monkeypatch, tmp_path):
+    # Start every test with fresh rate limiters and an empty journal directory
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    monkeypatch.setattr(journal, "DEFAULT_JOURNAL_DIR", str(tmp_path / "journals"))
+    model = FakeModel()
+    monkeypatch.setattr(model_interface, "get_model", lambda *args, **kwargs: model)
+    return model
+
+
+def test_parse_page_selection():
+    assert parse_page_selection("1,3-5", 10) == [0, 2, 3, 4]
+    assert parse_page_selection("9-12", 10) == [8, 9]
+    assert parse_page_selection("", 10) == []
+
+
+def test_vision_processes_selected_pages_in_order(pdf_path, fake_model):
+    result = vision(
+        concurrency=3,
+        file_path=pdf_path,
+        select_pages="2,4-6",
+        render_workers=1,
+    )
+    assert result.error is None
+    assert [page.page for page in result.pages] == [2, 4, 5, 6]
+    assert result.input_tokens == 40
+    assert fake_model.calls == 4
+
+
+def test_vision_options_and_keyword_overrides(pdf_path, fake_model):
+    options = vision_mode.VisionOptions(render_workers=1, image_format="jpeg")
+    overridden = vision_mode.vision_options(options, image_quality=60)
+    assert (overridden.image_format, overridden.image_quality) == ("jpeg", 60)
+    assert options.image_quality == 85
+    with pytest.raises(TypeError):
+        vision(concurrency=1, file_path=pdf_path, image_fromat="jpeg")
+
+    result = hybrid(
+        concurrency=2, file_path=pdf_path, options=options, select_pages="1-2"
+    )
+    assert result.error is None
+    (messages, _), _ = fake_model.requests
+    assert messages[1].content[0]["image_url"]["url"].startswith(
+        "data:image/jpeg;base64,"
+    )
+
+
+def test_pipeline_bounds_pages_in_flight():
+    prepared = []
+    in_flight = []
+    lock = threading.Lock()
+    active = [0]
+
+    def prepare(item):
+        prepared.append(item)
+        return item
+
+    def dispatch(item):
+        with lock:
+            active[0] += 1
+            in_flight.append(active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return item * 2
+
+    pipeline = PagePipeline(prepare, dispatch, concurrency=2, queue_depth=1)
+    results = dict(pipeline.run((i, i) for i in range(8)))
+    assert results == {i: i * 2 for i in range(8)}
+    assert max(in_flight) <= 2
+
+
+def test_pipeline_propagates_errors():
+    def dispatch(item):
+        if item == 3:
+            raise RuntimeError("boom")
+        return item
+
+    pipeline = PagePipeline(lambda item: item, dispatch, concurrency=2)
+    with pytest.raises(RuntimeError, match="boom"):
+        list(pipeline.run((i, i) for i in range(6)))
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_pipeline_parallel_prepare_keeps_order(executor):
+    seen = []
+    pipeline = PagePipeline(
+        abs,
+        seen.append,
+        concurrency=1,
+        prepare_workers=3,
+        prepare_executor=executor,
+    )
+    list(pipeline.run((i, -i) for i in range(10)))
+    assert seen == list(range(10))
+
+
+def test_vision_skips_blank_and_duplicate_pages(tmp_path, fake_model):
+    boilerplate = "DISCLAIMER " + "this is boilerplate text " * 40
+    texts = [
+        "Intro " + "first page content " * 40,
+        "",
+        boilerplate,
+        "Body " + "different body text " * 40,
+        boilerplate,
+    ]
+    result = vision(
+        concurrency=2,
+        file_path=make_pdf(tmp_path / "doc.pdf", texts),
+        render_workers=1,
+        dedupe_pages=True,
+    )
+    assert result.error is None
+    assert fake_model.calls == 3
+    assert [page.skipped for page in result.pages] == [
+        False,
+        True,
+        False,
+        False,
+        False,
+    ]
+    assert result.pages[4].duplicate_of == 3
+    assert result.pages[4].content == result.pages[2].content
+    assert result.pages[4].input_tokens == 0
+
+
+def test_vision_keeps_sparse_pages_with_text(tmp_path, fake_model):
+    doc = pymupdf.open()
+    doc.new_page(width=612, height=792)
+    doc.new_page(width=612, height=792).insert_text((300, 760), "3", fontsize=10)
+    doc.new_page(width=612, height=792).insert_text(
+        (72, 700), "Signed: ____________  Date: ________", fontsize=10
+    )
+    path = str(tmp_path / "sparse.pdf")
+    doc.save(path)
+
+    result = vision(concurrency=2, file_path=path, render_workers=1)
+    assert result.error is None
+    assert [page.skipped for page in result.pages] == [True, False, False]
+    assert fake_model.calls == 2
+
+
+def test_vision_reuses_cached_responses(pdf_path, fake_model, tmp_path):
+    options = dict(
+        concurrency=2,
+        file_path=pdf_path,
+        select_pages="1-3",
+        render_workers=1,
+        cache_dir=str(tmp_path / "cache"),
+    )
+    first = vision(**options)
+    assert first.error is None
+    assert fake_model.calls == 3
+    assert not any(page.cached for page in first.pages)
+
+    second = vision(**options)
+    assert second.error is None
+    assert fake_model.calls == 3
+    assert all(page.cached for page in second.pages)
+    assert [page.content for page in second.pages] == ["# Page"] * 3
+    assert second.input_tokens == 0
+
+    vision(**options, response_cache=False)
+    assert fake_model.calls == 6
+
+
+def test_response_cache_key_covers_prediction():
+    image = Image.new("RGB", (8, 8), "white")
+    messages = prepare_messages(image, "Convert")
+    prediction = {"type": "content", "content": "# Page"}
+    keys = {
+        response_cache_key(messages, "ns"),
+        response_cache_key(messages, "ns", prediction),
+        response_cache_key(messages, "ns", {**prediction, "content": "# Other"}),
+    }
+    assert len(keys) == 3
+    assert response_cache_key(messages, "ns", prediction) == response_cache_key(
+        messages, "ns", dict(prediction)
+    )
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_iter_vision_streams_pages(pdf_path, fake_model, ordered):
+    pages = list(
+        iter_vision(
+            concurrency=3,
+            file_path=pdf_path,
+            render_workers=1,
+            ordered=ordered,
+        )
+    )
+    numbers = [page.page for page in pages]
+    assert sorted(numbers) == [1, 2, 3, 4, 5, 6]
+    if ordered:
+        assert numbers == [1, 2, 3, 4, 5, 6]
+
+
+def test_vision_writes_output_incrementally(pdf_path, fake_model, tmp_path):
+    # Abandoning a stream part way must not hang or leak the pipeline
+    stream = iter_vision(concurrency=1, file_path=pdf_path, render_workers=1)
+    next(stream)
+    stream.close()
+
+    output_file = tmp_path / "out.md"
+    invoke = fake_model.invoke
+    requests = []
+    written_before_last = []
+
+    def invoke_watching_output(messages, config=None, **kwargs):
+        requests.append(messages)
+        if len(requests) == 3:
+            # Page 3 can't finish until this call returns, but pages 1 and 2
+            # are done and should already be on disk
+            deadline = time.monotonic() + 5
+            while "---Page 2 End---" not in output_file.read_text():
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            written_before_last.append(output_file.read_text())
+        return invoke(messages, config=config, **kwargs)
+
+    fake_model.invoke = invoke_watching_output
+    result = vision(
+        concurrency=1,
+        file_path=pdf_path,
+        output_file=str(output_file),
+        select_pages="1-3",
+        render_workers=1,
+    )
+    assert result.error is None
+    (partial,) = written_before_last
+    assert "---Page 1 Start---" in partial
+    assert "---Page 3 Start---" not in partial
+    text = output_file.read_text()
+    assert text.index("---Page 1 Start---") < text.index("---Page 2 Start---")
+    assert text.index("---Page 2 Start---") < text.index("---Page 3 Start---")
+
+
+def test_avision_shares_one_event_loop(tmp_path, pdf_path, fake_model):
+    fake_model.delay = 0.2
+    other_path = make_pdf(tmp_path / "other.pdf", ["Other " * 60] * 3)
+
+    async def convert():
+        return await asyncio.gather(
+            avision(concurrency=2, file_path=pdf_path, render_workers=1),
+            avision(concurrency=2, file_path=other_path, render_workers=1),
+        )
+
+    first, second = asyncio.run(convert())
+    assert first.error is None and second.error is None
+    assert [page.page for page in first.pages] == [1, 2, 3, 4, 5, 6]
+    assert [page.page for page in second.pages] == [1, 2, 3]
+    assert first.input_tokens == 60
+    assert fake_model.calls == 9
+    assert 2 < fake_model.max_active <= 4
+
+
+def test_avision_reports_model_errors(pdf_path, fake_model, monkeypatch):
+    monkeypatch.setattr(vision_mode, "RETRY_BACKOFF_SECONDS", 0.01)
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("model down")
+
+    fake_model.ainvoke = fail
+    result = asyncio.run(avision(concurrency=2, file_path=pdf_path, render_workers=1))
+    assert "All 6 pages failed: model down" in result.error
+    assert all(page.error == "model down" for page in result.pages)
+
+    result = asyncio.run(
+        avision(concurrency=2, file_path=pdf_path, render_workers=1, fail_fast=True)
+    )
+    assert "model down" in result.error
+    assert result.pages == []
+
+
+def test_vision_isolates_failed_pages(pdf_path, fake_model, monkeypatch):
+    monkeypatch.setattr(vision_mode, "RETRY_BACKOFF_SECONDS", 0.01)
+    invoke = fake_model.invoke
+    order, attempts = {}, {}
+
+    def flaky_invoke(messages, config=None, **kwargs):
+        # Pages are told apart by their image data, in the order first seen
+        page = order.setdefault(messages[1].content[0]["image_url"]["url"], len(order))
+        attempts[page] = attempts.get(page, 0) + 1
+        if page == 1 or (page == 3 and attempts[page] == 1):
+            raise RuntimeError(f"timeout after {attempts[page]} attempts")
+        return invoke(messages, config=config, **kwargs)
+
+    fake_model.invoke = flaky_invoke
+    result = vision(concurrency=1, file_path=pdf_path, render_workers=1)
+    assert result.error is None
+    failed = [page for page in result.pages if page.error]
+    assert len(result.pages) == 6 and len(failed) == 1
+    # The second page failed for good after two retries; the fourth recovered
+    assert failed[0].page == 2 and failed[0].content == ""
+    assert failed[0].error == "timeout after 3 attempts"
+    assert attempts == {0: 1, 1: 3, 2: 1, 3: 2, 4: 1, 5: 1}
+
+
+def test_vision_retries_rate_limited_pages(pdf_path, fake_model):
+    class RateLimitError(Exception):
+        status_code = 429
+        response = SimpleNamespace(headers={"retry-after": "0.05"})
+
+    invoke = fake_model.invoke
+    failures = []
+
+    def flaky_invoke(messages, config=None, **kwargs):
+        if len(failures) < 2:
+            failures.append(1)
+            raise RateLimitError("Too many requests")
+        return invoke(messages, config=config, **kwargs)
+
+    fake_model.invoke = flaky_invoke
+    result = vision(concurrency=4, file_path=pdf_path, render_workers=1)
+    assert result.error is None
+    assert len(result.pages) == 6
+    assert fake_model.calls == 6
+    assert ratelimit._limiters["openai", "gpt-4o"].window is not None
+
+
+def test_vision_resumes_from_journal(pdf_path, fake_model, tmp_path):
+    journal_dir = tmp_path / "journals"
+    invoke = fake_model.invoke
+    attempts = []
+
+    def fail_fourth(messages, config=None, **kwargs):
+        attempts.append(1)
+        if len(attempts) == 4:
+            raise RuntimeError("worker killed")
+        return invoke(messages, config=config, **kwargs)
+
+    fake_model.invoke = fail_fourth
+    options = dict(concurrency=1, file_path=pdf_path, render_workers=1, resume=True)
+    first = vision(**options, page_retries=0)
+    assert [page.page for page in first.pages if page.error] == [4]
+    (journal_file,) = journal_dir.iterdir()
+    assert len(journal_file.read_text().splitlines()) == 5
+
+    # Other settings use a separate journal
+    fake_model.invoke = invoke
+    vision(**options, image_format="jpeg")
+    assert fake_model.calls == 5 + 6
+
+    second = vision(**options)
+    assert fake_model.calls == 5 + 6 + 1
+    assert second.error is None
+    assert [page.page for page in second.pages] == [1, 2, 3, 4, 5, 6]
+    assert second.input_tokens == 60
+    # Journals are removed once every page has been converted
+    assert list(journal_dir.iterdir()) == []
+
+
+def test_vision_journals_only_when_asked(pdf_path, fake_model, tmp_path, caplog):
+    vision(concurrency=2, file_path=pdf_path, render_workers=1)
+    assert not (tmp_path / "journals").exists()
+
+    # A journal that can't be written doesn't stop the conversion
+    not_a_dir = tmp_path / "file"
+    not_a_dir.write_text("")
+    result = vision(
+        concurrency=2,
+        file_path=pdf_path,
+        render_workers=1,
+        resume=True,
+        journal_dir=str(not_a_dir / "journals"),
+    )
+    assert result.error is None
+    assert len(result.pages) == 6
+    assert "without a journal" in caplog.text
+
+
+def test_prompt_is_a_cacheable_system_prefix():
+    image = Image.new("RGB", (64, 64), "white")
+    system, user = prepare_messages(image, "Convert", cache_prompt=True)
+    assert system.type == "system"
+    assert system.content == [
+        {"type": "text", "text": "Convert", "cache_control": {"type": "ephemeral"}}
+    ]
+    assert [part["type"] for part in user.content] == ["image_url"]
+    assert prepare_messages(image, "Convert")[0].content == "Convert"
+
+    openai_style = AIMessage(
+        content="",
+        usage_metadata={
+            "input_tokens": 900,
+            "output_tokens": 5,
+            "total_tokens": 905,
+            "input_token_details": {"cache_read": 768},
+        },
+    )
+    anthropic_style = AIMessage(
+        content="", response_metadata={"usage": {"cache_read_input_tokens": 512}}
+    )
+    assert cached_input_tokens(openai_style) == 768
+    assert cached_input_tokens(anthropic_style) == 512
+    assert cached_input_tokens(AIMessage(content="")) == 0
+
+
+def test_vision_sends_custom_prompt(pdf_path, fake_model):
+    vision(concurrency=2, file_path=pdf_path, select_pages="1", custom_system_prompt="Hi")
+    ((messages, _),) = fake_model.requests
+    assert messages[0].content == "Hi"
+
+
+def test_hybrid_sends_each_page_its_own_reference(tmp_path, fake_model):
+    path = make_pdf(tmp_path / "doc.pdf", [f"Section {i} " * 60 for i in range(3)])
+    fast_pages = fast(file_path=path).pages
+    result = hybrid(concurrency=1, file_path=path, render_workers=1)
+    assert result.error is None
+
+    for page, (messages, kwargs) in zip(fast_pages, fake_model.requests):
+        system, user = messages
+        assert system.content == hybrid_mode.HYBRID_PROMPT
+        reference = user.content[-1]["text"]
+        assert reference == vision_mode.REFERENCE_HEADER + page.content
+        # gpt-4o predicts the page's own text only
+        assert kwargs["prediction"] == {"type": "content", "content": page.content}
+
+
+def answer_packed(messages):
+    markers = [
+        part["text"]
+        for part in messages[-1].content
+        if part["type"] == "text" and part["text"].startswith("<<<PAGE")
+    ]
+    return AIMessage(
+        content="\n".join(f"{marker}\n# Page {marker[8:-3]}" for marker in markers),
+        usage_metadata={"input_tokens": 100, "output_tokens": 21, "total_tokens": 121},
+    )
+
+
+def test_vision_packs_pages_into_requests(pdf_path, fake_model):
+    requests = []
+
+    def invoke(messages, config=None, **kwargs):
+        requests.append(messages)
+        return answer_packed(messages)
+
+    async def ainvoke(messages, config=None, **kwargs):
+        return invoke(messages, config, **kwargs)
+
+    fake_model.invoke = invoke
+    fake_model.ainvoke = ainvoke
+    result = vision(concurrency=2, file_path=pdf_path, pages_per_request=3)
+    assert result.error is None
+    assert len(requests) == 2
+    contents = [page.content for page in result.pages]
+    assert contents == ["# Page 1", "# Page 2", "# Page 3"] * 2
+    assert [page.input_tokens for page in result.pages] == [34, 33, 33] * 2
+    assert result.output_tokens == 42
+
+    requests.clear()
+    result = asyncio.run(
+        avision(concurrency=2, file_path=pdf_path, pages_per_request=4)
+    )
+    assert len(requests) == 2
+    assert [page.content for page in result.pages][-2:] == ["# Page 1", "# Page 2"]
+
+
+def unmarked_response():
+    return AIMessage(
+        content="# Page 1 and 2, no markers",
+        usage_metadata={"input_tokens": 100, "output_tokens": 21, "total_tokens": 121},
+    )
+
+
+def test_vision_unpacks_unsplittable_responses_page_by_page(pdf_path, fake_model):
+    invoke = fake_model.invoke
+
+    def forgetful_invoke(messages, config=None, **kwargs):
+        if len(messages[-1].content) > 1:
+            return unmarked_response()
+        return invoke(messages, config=config, **kwargs)
+
+    fake_model.invoke = forgetful_invoke
+    result = vision(
+        concurrency=1, file_path=pdf_path, select_pages="1-2", pages_per_request=2
+    )
+    assert [page.content for page in result.pages] == ["# Page", "# Page"]
+    assert fake_model.calls == 2
+    # The discarded packed response was billed too
+    assert [page.input_tokens for page in result.pages] == [60, 60]
+    assert [page.output_tokens for page in result.pages] == [16, 15]
+    assert result.input_tokens == 120
+
+
+def test_avision_resends_unsplittable_packs_concurrently(pdf_path, fake_model):
+    fake_model.delay = 0.05
+    ainvoke = fake_model.ainvoke
+
+    async def forgetful_ainvoke(messages, config=None, **kwargs):
+        if len(messages[-1].content) > 1:
+            return unmarked_response()
+        return await ainvoke(messages, config=config, **kwargs)
+
+    fake_model.ainvoke = forgetful_ainvoke
+    result = asyncio.run(
+        avision(
+            concurrency=2, file_path=pdf_path, select_pages="1-4", pages_per_request=4
+        )
+    )
+    assert [page.content for page in result.pages] == ["# Page"] * 4
+    # The pack's pages are re-sent side by side, not one after another
+    assert fake_model.max_active > 1
+    assert result.input_tokens == 140
+
+
+def test_vision_router_fails_over_to_healthy_target(
+    pdf_path, fake_model, monkeypatch
+):
+    class ServiceUnavailable(Exception):
+        status_code = 503
+
+    down = FakeModel()
+
+    def fail(messages, config=None, **kwargs):
+        down.requests.append((messages, kwargs))
+        raise ServiceUnavailable("overloaded")
+
+    down.invoke = fail
+    models = {"openai": down, "anthropic": fake_model}
+    monkeypatch.setattr(
+        model_interface, "get_model", lambda provider, *args, **kwargs: models[provider]
+    )
+    result = vision(
+        concurrency=1, file_path=pdf_path, provider="router", model="openai=3,anthropic"
+    )
+    assert result.error is None
+    assert result.model == "openai/gpt-4o=3,anthropic/claude-3-5-sonnet-latest=1"
+    assert fake_model.calls == 6
+    assert {page.served_by for page in result.pages} == {
+        "anthropic/claude-3-5-sonnet-latest"
+    }
+    # The failing target is avoided after its first error, and only the
+    # Anthropic target gets the prompt's cache breakpoint
+    assert len(down.requests) == 1
+    assert isinstance(down.requests[0][0][0].content, str)
+    assert fake_model.requests[0][0][0].content[0]["cache_control"]
+
+
+def test_vision_hedges_slow_requests(pdf_path, fake_model):
+    invoke = fake_model.invoke
+    order = {}
+
+    def slow_last_page(messages, config=None, **kwargs):
+        url = messages[1].content[0]["image_url"]["url"]
+        with fake_model.lock:
+            attempt = order.setdefault(url, [len(order), 0])
+            attempt[1] += 1
+        # The last page's first request stalls; its hedge answers at once
+        if attempt == [5, 1]:
+            time.sleep(1.0)
+        return invoke(messages, config=config, **kwargs)
+
+    fake_model.invoke = slow_last_page
+    start = time.monotonic()
+    result = vision(concurrency=1, file_path=pdf_path, hedge_percentile=90)
+    assert time.monotonic() - start < 0.8
+    assert result.error is None
+    assert [page.hedges for page in result.pages] == [0, 0, 0, 0, 0, 1]
+    assert result.hedged_requests == 1
+
+
+def test_avision_cancels_losing_hedges(pdf_path, fake_model):
+    cancelled = []
+    seen = set()
+
+    async def slow_last_page(messages, config=None, **kwargs):
+        url = messages[1].content[0]["image_url"]["url"]
+        first = url not in seen
+        seen.add(url)
+        if first and len(seen) == 6:
+            try:
+                await asyncio.sleep(1.0)
+            except asyncio.CancelledError:
+                cancelled.append(url)
+                raise
+        return FakeModel._response(config)
+
+    fake_model.ainvoke = slow_last_page
+    result = asyncio.run(
+        avision(concurrency=1, file_path=pdf_path, hedge_percentile=90)
+    )
+    assert result.error is None
+    assert result.hedged_requests == 1 and result.pages[-1].hedges == 1
+    assert len(cancelled) == 1
+
+
+def test_vision_sends_longest_pages_first(tmp_path, fake_model):
+    texts = ["A short page.\n" * 3, "lorem ipsum " * 150, "", "lorem ipsum " * 40]
+    path = make_pdf(tmp_path / "mixed.pdf", texts)
+    run = vision_mode.setup_vision(
+        path, options=vision_mode.VisionOptions(longest_first=True)
+    )
+    try:
+        assert run.pending == [1, 3, 0, 2]
+    finally:
+        run.close()
+
+    result = vision(concurrency=2, file_path=path, longest_first=True)
+    assert [page.page for page in result.pages] == [1, 2, 3, 4]
+    assert fake_model.calls == 3
+
+
+def test_dedupe_with_longest_first_keeps_the_page_sent_first(tmp_path, fake_model):
+    boilerplate = "DISCLAIMER " + "this is boilerplate text " * 40
+    texts = [boilerplate, "Body " + "different body text " * 60, boilerplate + " ok"]
+    result = vision(
+        concurrency=1,
+        file_path=make_pdf(tmp_path / "doc.pdf", texts),
+        render_workers=1,
+        dedupe_pages=True,
+        longest_first=True,
+    )
+    assert result.error is None
+    assert fake_model.calls == 2
+    # The longer copy on page 3 is sent first, so page 1 reuses its output
+    assert result.pages[0].duplicate_of == 3
+    assert result.pages[2].duplicate_of is None
+    assert result.pages[0].content == result.pages[2].content
+
+
+def test_iter_fast_matches_whole_document_conversion(pdf_path):
+    chunks = pymupdf4llm.to_markdown(pdf_path, pages=[1, 2], page_chunks=True)
+    pages = list(iter_fast(pdf_path, select_pages="2-3"))
+    assert [page.page for page in pages] == [2, 3]
+    assert [page.content for page in pages] == [
+        clean_markdown_content(chunk["text"]) for chunk in chunks
+    ]
+    assert fast(file_path=pdf_path, select_pages="2-3").pages == pages
+
+
+def test_iter_fast_ranks_headers_within_selected_pages(tmp_path):
+    path = tmp_path / "doc.pdf"
+    doc = pymupdf.open()
+    for size in (36, 22, 22):
+        page = doc.new_page(width=612, height=792)
+        page.insert_text((72, 100), "Heading", fontsize=size)
+        page.insert_textbox(
+            pymupdf.Rect(72, 140, 540, 720), "Body text " * 200, fontsize=11
+        )
+    doc.save(str(path))
+    doc.close()
+
+    # The larger heading on the unselected first page doesn't demote these
+    pages = list(iter_fast(str(path), select_pages="2-3"))
+    assert [page.content.split("\n")[0] for page in pages] == ["# Heading"] * 2
+    assert list(iter_fast(str(path)))[1].content.startswith("## Heading")
+
+
+def test_auto_routes_only_pages_that_need_vision(tmp_path, fake_model):
+    path = make_pdf(tmp_path / "doc.pdf", ["Plain text " * 60, "", "More text " * 60])
+    doc = pymupdf.open(path)
+    page = doc[2]
+    for y in range(100, 700, 10):
+        page.draw_line((72, y), (540, y))
+    doc.saveIncr()
+    doc.close()
+
+    result = auto(concurrency=2, file_path=path, render_workers=1)
+    assert result.error is None
+    assert [page.page for page in result.pages] == [1, 2, 3]
+    assert [page.engine for page in result.pages] == ["fast", "vision", "vision"]
+    # The empty page is routed to vision but skipped there as blank
+    assert result.pages[1].skipped
+    assert fake_model.calls == 1
+
+
+def test_auto_reports_vision_usage(tmp_path, fake_model, monkeypatch):
+    from gptparse.modes import auto as auto_mode
+
+    def vision_with_usage(**kwargs):
+        return vision(**kwargs).model_copy(
+            update={
+                "cached_input_tokens": 4,
+                "accepted_prediction_tokens": 3,
+                "rejected_prediction_tokens": 2,
+                "hedged_requests": 1,
+            }
+        )
+
+    monkeypatch.setattr(auto_mode, "vision", vision_with_usage)
+    path = make_pdf(tmp_path / "doc.pdf", ["Plain text " * 60, ""])
+    result = auto(concurrency=2, file_path=path, render_workers=1)
+    assert result.error is None
+    assert result.cached_input_tokens == 4
+    assert result.accepted_prediction_tokens == 3
+    assert result.rejected_prediction_tokens == 2
+    assert result.hedged_requests == 1